@@ -0,0 +1,210 @@
+"""
+Cold-start cost per Lambda handler: deployment artifact size, module import
+time and first invocation time.
+
+Each function's artifact is built exactly as `sam build` does (see
+tools/package_handler.py) and the handler is imported from it in a fresh
+interpreter, so the numbers cover only what that function ships.
+
+AWS calls go to the boto3 stubs in tests/mocks (--stub-sdk, the default when
+boto3 is not installed) or to the real SDK pointed at a closed local port, so
+client construction is measured and every request fails fast without touching
+AWS. Google token validation is skipped by authenticating with x-user-id, and
+the generator reads its images and Gemini response from local file:// URLs.
+
+Usage: python backend/benchmarks/bench_cold_start.py [--runs 5] [--stub-sdk] [FunctionLogicalId ...]
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import BACKEND_DIR, MOCKS_DIR
+
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'tools'))
+from package_handler import package, template_handlers
+
+DRIVER = r'''
+import importlib, json, sys, time
+spec, event = sys.argv[1], json.loads(sys.argv[2])
+module_name, handler_name = spec.rsplit('.', 1)
+t0 = time.perf_counter()
+module = importlib.import_module(module_name)
+t1 = time.perf_counter()
+try:
+    response = getattr(module, handler_name)(event, None)
+    status = response.get('statusCode', response.get('status')) if isinstance(response, dict) else None
+except Exception as e:
+    # Step Functions tasks raise on failure; the timing is still valid
+    status = f"raised {type(e).__name__}"
+t2 = time.perf_counter()
+print(json.dumps({'import_ms': (t1 - t0) * 1000, 'first_call_ms': (t2 - t1) * 1000, 'status': status}))
+'''
+
+# 1x1 transparent PNG
+TINY_PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII='
+)
+
+SECRET = 'bench-secret'
+
+
+def sign(data):
+    payload = json.dumps(dict(sorted(data.items())), separators=(',', ':'), ensure_ascii=False)
+    payload = payload.replace('/', '\\/')
+    return hmac.new(SECRET.encode('utf-8'), payload.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def build_fixtures(workdir):
+    """Write local stand-ins for the images and the Gemini response."""
+    for name in ('item.jpg', 'selfie.jpg'):
+        with open(os.path.join(workdir, name), 'wb') as f:
+            f.write(TINY_PNG)
+    gemini = {'candidates': [{'content': {'parts': [
+        {'inlineData': {'mimeType': 'image/png', 'data': base64.b64encode(TINY_PNG).decode('ascii')}}
+    ]}}]}
+    with open(os.path.join(workdir, 'gemini.json'), 'w') as f:
+        json.dump(gemini, f)
+
+
+def handler_events(workdir):
+    user = {'x-user-id': 'bench-user'}
+    webhook = {'payment_status': 'success', 'customer_extra': 'bench-user', 'sku': 'starter', 'order_id': 'o-1'}
+    return {
+        'handlers.dispatcher.handler': {
+            'headers': user,
+            'body': json.dumps({'itemUrl': 'https://example.com/item.jpg', 'selfieId': 'selfie'})
+        },
+        'handlers.profile.handler': {
+            'rawPath': '/user/images', 'headers': user, 'requestContext': {'http': {'method': 'GET'}}
+        },
+        'handlers.status.handler': {'pathParameters': {'jobId': 'job-1'}},
+        'handlers.generator.handler': {
+            'jobId': 'job-1', 'userId': 'bench-user',
+            'itemUrl': f"file://{workdir}/item.jpg", 'selfieUrl': f"file://{workdir}/selfie.jpg"
+        },
+        'handlers.renditions.handler': {
+            'jobId': 'job-1', 'userId': 'bench-user', 'resultUrl': 'https://bucket.s3.amazonaws.com/r.png'
+        },
+        'handlers.selfie_processor.handler': {
+            'userId': 'bench-user',
+            'image': {'id': 'selfie', 's3Key': 'uploads/bench-user/selfie-me.jpg'}
+        },
+        'handlers.saver.handler': {
+            'jobId': 'job-1', 'userId': 'bench-user', 'resultUrl': 'https://bucket.s3.amazonaws.com/r.png'
+        },
+        'handlers.payment_link.handler': {
+            'headers': user, 'body': json.dumps({'tariffName': 'Starter', 'lang': 'en'})
+        },
+        'handlers.payment_webhook.handler': {
+            'headers': {'Sign': sign(webhook), 'content-type': 'application/json'},
+            'body': json.dumps(webhook)
+        },
+        'handlers.payment_consumer.handler': {
+            'Records': [{'messageId': 'm-1', 'body': json.dumps(webhook)}]
+        },
+        'handlers.batch.handler': {
+            'rawPath': '/try-on/batch', 'headers': user, 'requestContext': {'http': {'method': 'POST'}},
+            'body': json.dumps({'pairs': [{'selfieId': 'selfie', 'itemUrl': 'https://example.com/item.jpg'}]})
+        },
+        'handlers.prefetch.handler': {
+            'headers': user, 'body': json.dumps({'itemUrl': 'https://example.com/item.jpg'})
+        },
+        'handlers.scheduler.handler': {},
+        'handlers.lane_dead_letter.handler': {
+            'Records': [{'messageId': 'm-1', 'body': json.dumps({'jobId': 'job-1', 'userId': 'bench-user'})}]
+        },
+    }
+
+
+def artifact_size(artifact_dir):
+    """(file count, raw bytes, zipped bytes) of a built artifact."""
+    files, raw = 0, 0
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for root, _, names in os.walk(artifact_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                files += 1
+                raw += os.path.getsize(path)
+                archive.write(path, os.path.relpath(path, artifact_dir))
+    return files, raw, len(buffer.getvalue())
+
+
+def subprocess_env(workdir, artifact_dir, stub_sdk):
+    env = dict(os.environ)
+    paths = [MOCKS_DIR, artifact_dir] if stub_sdk else [artifact_dir]
+    env['PYTHONPATH'] = os.pathsep.join(paths)
+    env.update({
+        'USER_TABLE_NAME': 'Users',
+        'USER_SELFIES_TABLE_NAME': 'Selfies',
+        'TABLE_NAME': 'Jobs',
+        'USER_GENERATIONS_TABLE_NAME': 'Generations',
+        'BUCKET_NAME': 'bench-bucket',
+        'STATE_MACHINE_ARN': 'arn:aws:states:us-east-1:000000000000:stateMachine:bench',
+        'GEMINI_API_KEY': 'bench',
+        'GEMINI_API_URL': f"file://{workdir}/gemini.json",
+        'PRODAMUS_SECRET_KEY': SECRET,
+        # Real SDK: build clients normally, then fail every request immediately
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'AWS_ACCESS_KEY_ID': 'bench',
+        'AWS_SECRET_ACCESS_KEY': 'bench',
+        'AWS_EC2_METADATA_DISABLED': 'true',
+        'AWS_MAX_ATTEMPTS': '1',
+        'AWS_ENDPOINT_URL': 'http://127.0.0.1:9',
+    })
+    return env
+
+
+def measure(spec, event, env):
+    out = subprocess.run(
+        [sys.executable, '-c', DRIVER, spec, json.dumps(event)],
+        env=env, capture_output=True, text=True, check=True
+    )
+    # Handlers print progress; the driver's result is the last line
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('functions', nargs='*', help='function logical IDs from template.yaml (default: all)')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--stub-sdk', action='store_true', help='use the boto3 stubs from tests/mocks')
+    args = parser.parse_args()
+
+    try:
+        import boto3  # noqa: F401
+        stub_sdk = args.stub_sdk
+    except ImportError:
+        stub_sdk = True
+
+    functions = template_handlers()
+    with tempfile.TemporaryDirectory() as workdir:
+        build_fixtures(workdir)
+        events = handler_events(workdir)
+        print(f"SDK: {'stub' if stub_sdk else 'boto3'}; median of {args.runs} fresh interpreters")
+        print(f"{'function':<24} {'files':>5} {'bytes':>7} {'zipped':>7} {'import':>9} {'1st call':>9} {'total':>9}  status")
+        for function in args.functions or functions:
+            spec = functions[function]
+            artifact_dir = os.path.join(workdir, function)
+            package(spec, artifact_dir)
+            files, raw, zipped = artifact_size(artifact_dir)
+            env = subprocess_env(workdir, artifact_dir, stub_sdk)
+            runs = [measure(spec, events[spec], env) for _ in range(args.runs)]
+            imp = statistics.median(r['import_ms'] for r in runs)
+            call = statistics.median(r['first_call_ms'] for r in runs)
+            total = statistics.median(r['import_ms'] + r['first_call_ms'] for r in runs)
+            print(f"{function:<24} {files:5d} {raw:7d} {zipped:7d} {imp:8.1f}ms {call:8.1f}ms {total:8.1f}ms  {runs[-1]['status']}")
+
+
+if __name__ == '__main__':
+    main()
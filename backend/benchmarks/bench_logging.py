@@ -0,0 +1,100 @@
+"""
+Per-call cost of core.log versus the print(json.dumps(event)) it replaced.
+
+Cases, each written to os.devnull:
+- print of a whole webhook event, as payment_webhook used to do;
+- print of a Gemini error body carrying 2 MB of base64, as a failing
+  generator could;
+- log.info with a few fields, written;
+- log.debug of the webhook event below LOG_LEVEL (dropped before formatting);
+- log.info in an invocation that sampling left out (dropped likewise);
+- log.error with the 2 MB body, written truncated.
+
+Usage: python backend/benchmarks/bench_logging.py [--iterations 2000]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import use_stub_sdk
+
+use_stub_sdk()
+
+from core.log import get_logger  # noqa: E402
+
+WEBHOOK_EVENT = {
+    'version': '2.0',
+    'routeKey': 'POST /payment/webhook',
+    'headers': {
+        'content-type': 'application/x-www-form-urlencoded',
+        'sign': 'f' * 64,
+        'user-agent': 'Prodamus',
+        'x-forwarded-for': '185.71.76.1',
+    },
+    'requestContext': {'http': {'method': 'POST', 'path': '/payment/webhook'}, 'requestId': 'abc='},
+    'body': '&'.join(f"products[{n}][name]=Credits+pack&products[{n}][price]=490" for n in range(10))
+            + '&order_id=123&sum=490&customer_extra=108234567890123456789&payment_status=success',
+    'isBase64Encoded': False,
+}
+
+GEMINI_ERROR_BODY = json.dumps({
+    'candidates': [{'content': {'parts': [{'inlineData': {'mimeType': 'image/png', 'data': 'A' * 2_000_000}}]}}]
+})
+
+
+def cost_us(fn, iterations):
+    return timeit.timeit(fn, number=iterations) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    log = get_logger('payment_webhook')
+    sampled_out = get_logger('status')
+    context = SimpleNamespace(aws_request_id='bench')
+
+    def info():
+        log.info('Adding credits', userId='108234567890123456789', credits=50, amount=490.0)
+
+    def dropped_debug():
+        log.debug('Received webhook', headers=WEBHOOK_EVENT['headers'], body=WEBHOOK_EVENT['body'])
+
+    def sampled_info():
+        sampled_out.info('Served job', jobId='j1', status='COMPLETED')
+
+    cases = [
+        ('print(json.dumps(event))', lambda: print('Received webhook event:', json.dumps(WEBHOOK_EVENT)), 1),
+        ('print(2 MB error body)', lambda: print(f"Gemini error: {GEMINI_ERROR_BODY}"), 100),
+        ('log.info, 3 fields', info, 1),
+        ('log.debug, dropped', dropped_debug, 1),
+        ('log.info, sampled out', sampled_info, 1),
+        ('log.error, 2 MB body', lambda: log.error('Gemini error', body=GEMINI_ERROR_BODY), 100),
+    ]
+
+    stdout = sys.stdout
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = devnull
+        try:
+            log.start_invocation(context)
+            results = []
+            for name, fn, divisor in cases:
+                if fn is sampled_info:
+                    os.environ['LOG_SAMPLE_RATE_STATUS'] = '0'
+                    sampled_out.start_invocation(context)
+                results.append((name, cost_us(fn, max(1, args.iterations // divisor))))
+        finally:
+            sys.stdout = stdout
+            os.environ.pop('LOG_SAMPLE_RATE_STATUS', None)
+
+    for name, us in results:
+        print(f"{name:<26} {us:10.2f}us/call")
+
+
+if __name__ == '__main__':
+    main()
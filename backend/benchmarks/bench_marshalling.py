@@ -0,0 +1,104 @@
+"""
+Marshalling cost of core.dynamo versus boto3's resource-layer
+TypeSerializer/TypeDeserializer on realistic items.
+
+Items: a profile (contact fields, credits, image count, a payment history)
+and a page of 50 generations with renditions, as GET /user/generations
+reads them. Each is encoded to and decoded from AttributeValues, and the
+decoded result is passed to json.dumps the way the handlers respond: boto3's
+Decimals need default=str, core.dynamo's ints and floats do not.
+
+The boto3 column needs the real SDK (pip install boto3); without it only
+core.dynamo is timed.
+
+Usage: python backend/benchmarks/bench_marshalling.py [--iterations 2000]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import BACKEND_DIR, use_stub_sdk
+
+try:
+    from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+    sys.path.insert(0, BACKEND_DIR)
+except ImportError:
+    TypeDeserializer = TypeSerializer = None
+    use_stub_sdk()
+
+from core import dynamo  # noqa: E402
+
+PROFILE = {
+    'userId': '108234567890123456789',
+    'email': 'someone@example.com',
+    'name': 'Some One',
+    'picture': 'https://lh3.googleusercontent.com/a/ACg8ocJ-example=s96-c',
+    'credits': 37,
+    'imageCount': 4,
+    'processed_payments': [f"order-{n:06d}" for n in range(40)],
+}
+
+GENERATIONS = [
+    {
+        'userId': '108234567890123456789',
+        'timestamp': f"2026-03-{n % 28 + 1:02d}T10:{n % 60:02d}:00.000000",
+        'jobId': f"3f2b8c1e-0000-4000-8000-{n:012d}",
+        'resultUrl': f"https://bucket.s3.amazonaws.com/results/u/{n}.png",
+        'renditions': {
+            'primary': f"https://bucket.s3.amazonaws.com/results/u/{n}.primary.webp",
+            'thumb': f"https://bucket.s3.amazonaws.com/results/u/{n}.thumb.webp",
+        },
+        'itemUrl': f"https://shop.example.com/images/products/{n}.jpg",
+        'siteUrl': f"https://shop.example.com/p/{n}",
+        'siteTitle': 'Linen shirt - Example Shop',
+        'creditCost': 1,
+    }
+    for n in range(50)
+]
+
+
+def boto3_codec():
+    serializer, deserializer = TypeSerializer(), TypeDeserializer()
+    encode = lambda item: {k: serializer.serialize(v) for k, v in item.items()}  # noqa: E731
+    decode = lambda item: {k: deserializer.deserialize(v) for k, v in item.items()}  # noqa: E731
+    return encode, decode, lambda value: json.dumps(value, default=str)
+
+
+def dynamo_codec():
+    return dynamo.serialize_item, dynamo.deserialize_item, json.dumps
+
+
+def cost_us(codec, items, iterations):
+    """Microseconds to encode, decode and respond with `items`."""
+    encode, decode, dumps = codec
+    wire = [encode(item) for item in items]
+    timings = {
+        'encode': timeit.timeit(lambda: [encode(item) for item in items], number=iterations),
+        'decode+json': timeit.timeit(lambda: dumps([decode(item) for item in wire]), number=iterations),
+    }
+    return {name: seconds / iterations * 1e6 for name, seconds in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    codecs = [('core.dynamo', dynamo_codec())]
+    if TypeSerializer:
+        codecs.insert(0, ('boto3 resource', boto3_codec()))
+    else:
+        print('boto3 not installed: timing core.dynamo only')
+
+    for label, items in (('profile', [PROFILE]), ('generations x50', GENERATIONS)):
+        for name, codec in codecs:
+            result = cost_us(codec, items, args.iterations)
+            print(f"{label:<16} {name:<15} encode {result['encode']:8.1f}us  "
+                  f"decode+json {result['decode+json']:8.1f}us")
+
+
+if __name__ == '__main__':
+    main()
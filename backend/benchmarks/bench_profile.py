@@ -0,0 +1,139 @@
+"""
+Flame-graph-ready profiles of the generator and profile handlers.
+
+Runs each handler in-process with core.profiling switched on, against fakes:
+the generator downloads two images and streams a Gemini response carrying
+a --image-mb PNG into a discarding S3; the profile handler serves GET
+/user/profile through the real DynamoDB codec on a canned low-level client.
+For each handler it writes <request id>.prof, .folded and .txt under
+--out/<handler>/ and prints the paths.
+
+    flamegraph.pl out/generator/*.folded > generator.svg
+    speedscope out/profile/*.folded
+    snakeviz out/generator/*.prof
+
+Usage: python backend/benchmarks/bench_profile.py [--out /tmp/profiles] [--image-mb 4]
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import sys
+import urllib.request
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import use_stub_sdk
+
+use_stub_sdk()
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+from botocore.exceptions import ClientError  # noqa: E402
+from core import dynamo, storage, telemetry  # noqa: E402
+from core.telemetry import MemoryExporter  # noqa: E402
+from handlers import generator, profile  # noqa: E402
+
+
+class SinkS3:
+    def put_object(self, **kw):
+        return {}
+
+    def get_object(self, **kw):
+        # Nothing prefetched, so items are downloaded as before
+        raise ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+
+    def create_multipart_upload(self, **kw):
+        return {'UploadId': 'bench'}
+
+    def upload_part(self, Body, **kw):
+        return {'ETag': 'etag'}
+
+    def complete_multipart_upload(self, **kw):
+        return {}
+
+
+class CannedDynamoDBClient:
+    """Low-level client answering GetItem/Query/UpdateItem with fixed items."""
+
+    def __init__(self):
+        self.profile = dynamo.serialize_item({
+            'userId': 'bench-user', 'name': 'Some One', 'email': 'someone@example.com',
+            'picture': 'https://example.com/p.jpg', 'credits': 12,
+        })
+        self.selfies = [dynamo.serialize_item({
+            'userId': 'bench-user', 'imageId': f"img-{n}", 'name': f"selfie {n}",
+            's3Url': f"https://bucket.s3.amazonaws.com/users/bench-user/img-{n}.jpg",
+            'createdAt': f"2026-01-0{n + 1}T00:00:00",
+        }) for n in range(5)]
+
+    def get_item(self, **kw):
+        return {'Item': self.profile}
+
+    def query(self, **kw):
+        return {'Items': self.selfies}
+
+    def update_item(self, **kw):
+        return {}
+
+
+def gemini_response(image_mb):
+    image = base64.b64encode(os.urandom(image_mb * 2**20)).decode('ascii')
+    parts = [{'inlineData': {'mimeType': 'image/png', 'data': image}}]
+    return json.dumps({'candidates': [{'content': {'parts': parts}}]}).encode('utf-8')
+
+
+def fake_urlopen(gemini_body, download_bytes):
+    def urlopen(req, *args, **kwargs):
+        if req.get_method() == 'POST':
+            return io.BytesIO(gemini_body)
+        return io.BytesIO(download_bytes)
+    return urlopen
+
+
+def profile_generator(image_mb):
+    os.environ.update(GEMINI_API_KEY='bench', GEMINI_API_URL='https://gemini.example/generate', BUCKET_NAME='bench-bucket')
+    event = {
+        'jobId': 'bench-job', 'userId': 'bench-user',
+        'itemUrl': 'https://shop.example.com/item.jpg', 'selfieUrl': 'https://bucket.s3.amazonaws.com/selfie.jpg',
+    }
+    with patch.object(urllib.request, 'urlopen', fake_urlopen(gemini_response(image_mb), os.urandom(2**20))), \
+         patch.object(storage, 's3_client', SinkS3()):
+        generator.handler(event, SimpleNamespace(aws_request_id='generator-bench'))
+
+
+def profile_profile():
+    os.environ.update(USER_TABLE_NAME='Users', USER_SELFIES_TABLE_NAME='Selfies', BUCKET_NAME='bench-bucket')
+    event = {'rawPath': '/user/profile', 'headers': {}, 'requestContext': {'http': {'method': 'GET'}}}
+    user_info = {'name': 'Some One', 'picture': 'https://example.com/p.jpg', 'email': 'someone@example.com'}
+    with patch.object(storage, 'dynamodb', None), \
+         patch.object(storage, 'dynamodb_client', CannedDynamoDBClient()), \
+         patch.object(profile, 'get_user_id_from_token', lambda e: 'bench-user'), \
+         patch.object(profile, 'get_user_info_from_token', lambda e: user_info):
+        response = profile.handler(event, SimpleNamespace(aws_request_id='profile-bench'))
+    assert response['statusCode'] == 200, response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--out', default='/tmp/profiles')
+    parser.add_argument('--image-mb', type=int, default=4)
+    args = parser.parse_args()
+
+    os.environ.update(PROFILE_HANDLERS='generator,profile', PROFILE_DIR=args.out)
+    os.environ.pop('PROFILE_BUCKET', None)
+    with patch.object(telemetry, 'exporter', MemoryExporter()):
+        profile_generator(args.image_mb)
+        profile_profile()
+
+    for name, request_id in (('generator', 'generator-bench'), ('profile', 'profile-bench')):
+        base = os.path.join(args.out, name, request_id)
+        with open(f"{base}.txt") as f:
+            peak = f.readline().strip()
+        print(f"{name:<10} {peak}")
+        for ext in ('prof', 'folded', 'txt'):
+            print(f"           {base}.{ext}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Bytes served and encode time per job for the result renditions.
+
+Encodes a synthetic photo-like result (gradients plus noise, the size Gemini
+returns) with core.renditions in every format this Pillow build supports and
+compares what the overlay and a history page of N entries download before
+(the PNG everywhere) and after (primary rendition / thumbnails).
+
+Requires Pillow: pip install -r backend/requirements-renditions.txt
+
+Usage: python backend/benchmarks/bench_renditions.py [--history 20] [--runs 3]
+"""
+import argparse
+import io
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import use_stub_sdk
+
+use_stub_sdk()
+from core.renditions import FORMATS, pick_format, render  # noqa: E402
+
+
+def synthetic_result(width=768, height=1024, seed=7):
+    from PIL import Image, ImageFilter
+
+    rng = random.Random(seed)
+    noise = Image.frombytes('RGB', (width, height), bytes(rng.getrandbits(8) for _ in range(width * height * 3)))
+    base = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    image = Image.blend(base, noise.filter(ImageFilter.GaussianBlur(2)), 0.35)
+    out = io.BytesIO()
+    image.save(out, 'PNG')
+    return out.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--history', type=int, default=20, help='entries on a history page')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    if pick_format(list(FORMATS)) is None:
+        raise SystemExit("Pillow with WebP or AVIF support is required")
+
+    png = synthetic_result()
+    print(f"source PNG: {len(png) / 1024:.0f} KiB; history page of {args.history}")
+    print(f"{'format':<6} {'encode':>9} {'primary':>9} {'thumb':>8} {'overlay':>9} {'history page':>13}")
+    print(f"{'PNG':<6} {'-':>9} {'-':>9} {'-':>8} {len(png) / 1024:8.0f}K {args.history * len(png) / 1024:12.0f}K")
+    for fmt in FORMATS:
+        if pick_format([fmt]) is None:
+            print(f"{fmt:<6} encoder not available")
+            continue
+        timings = []
+        for _ in range(args.runs):
+            t0 = time.perf_counter()
+            out = render(png, fmt)
+            timings.append((time.perf_counter() - t0) * 1000)
+        primary, thumb = len(out['primary']), len(out['thumb'])
+        print(f"{fmt:<6} {statistics.median(timings):7.0f}ms {primary / 1024:8.0f}K {thumb / 1024:7.1f}K "
+              f"{primary / 1024:8.0f}K {args.history * thumb / 1024:12.0f}K")
+
+
+if __name__ == '__main__':
+    main()
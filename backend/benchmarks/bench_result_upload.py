@@ -0,0 +1,83 @@
+"""
+Peak memory and time to get the Gemini result image into S3.
+
+Compares the old path (read the whole response, json.loads, b64decode, one
+put_object) with streaming it through core.gemini_stream into
+core.uploads.upload_stream. S3 is a sink that discards the bytes, so the
+numbers are the handler's own allocations.
+
+Usage: python backend/benchmarks/bench_result_upload.py [--image-mb 8]
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import use_stub_sdk
+
+use_stub_sdk()
+from core.gemini_stream import iter_inline_image  # noqa: E402
+from core.uploads import upload_stream  # noqa: E402
+
+
+class SinkS3:
+    def put_object(self, Body, **kw):
+        return {}
+
+    def create_multipart_upload(self, **kw):
+        return {'UploadId': 'bench'}
+
+    def upload_part(self, Body, **kw):
+        return {'ETag': 'etag'}
+
+    def complete_multipart_upload(self, **kw):
+        return {}
+
+
+def gemini_body(image_mb):
+    image = os.urandom(image_mb * 1024 * 1024)
+    part = {'inlineData': {'mimeType': 'image/png', 'data': base64.b64encode(image).decode('ascii')}}
+    return json.dumps({'candidates': [{'content': {'parts': [part]}}]}).encode('utf-8')
+
+
+def buffered(response, s3):
+    data = json.loads(response.read().decode('utf-8'))
+    parts = data['candidates'][0]['content']['parts']
+    image_b64 = next(p['inlineData']['data'] for p in parts if 'inlineData' in p)
+    s3.put_object(Bucket='b', Key='k', Body=base64.b64decode(image_b64), ContentType='image/png')
+
+
+def streamed(response, s3):
+    upload_stream(s3, 'b', 'k', iter_inline_image(response.read), 'image/png')
+
+
+def measure(fn, body):
+    response = io.BytesIO(body)
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    fn(response, SinkS3())
+    elapsed = (time.perf_counter() - t0) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--image-mb', type=int, default=8)
+    args = parser.parse_args()
+
+    body = gemini_body(args.image_mb)
+    print(f"response: {len(body) / 2**20:.1f} MiB JSON, image {args.image_mb} MiB")
+    for label, fn in (('buffered (before)', buffered), ('streamed (after)', streamed)):
+        elapsed, peak = measure(fn, body)
+        print(f"{label:<20} peak={peak / 2**20:7.1f} MiB  time={elapsed:7.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
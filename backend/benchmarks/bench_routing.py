@@ -0,0 +1,87 @@
+"""
+Per-request dispatch overhead of ProfileFunction across every /user/* route.
+
+Times the full handler with authentication and each route body replaced by
+no-ops, so what is left is event parsing, route matching and whatever the
+handler builds before it knows the route (the previous dispatcher read the
+environment and constructed the profile table up front for every request).
+Also reports how many DynamoDB table resources a request builds before
+reaching the route.
+
+Usage: python backend/benchmarks/bench_routing.py [--iterations 20000]
+"""
+import argparse
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import use_stub_sdk
+
+use_stub_sdk()
+from core import storage  # noqa: E402
+from handlers import profile  # noqa: E402
+
+# One concrete request per route in template.yaml
+REQUESTS = [
+    ('GET', '/user/generations'),
+    ('POST', '/user/generations/delete'),
+    ('DELETE', '/user/generations/job-1'),
+    ('DELETE', '/user/account'),
+    ('POST', '/user/images/delete'),
+    ('GET', '/user/profile'),
+    ('POST', '/user/images/upload-urls'),
+    ('POST', '/user/images/upload-url'),
+    ('POST', '/user/images'),
+    ('GET', '/user/images'),
+    ('DELETE', '/user/images/file-1'),
+    ('PATCH', '/user/images/file-1'),
+]
+
+
+class CountingDynamoDB:
+    def __init__(self):
+        self.tables = 0
+
+    def Table(self, name):
+        self.tables += 1
+        return None
+
+
+def no_op_routes():
+    """Copy of the router whose route functions return immediately."""
+    router = type(profile.router)()
+    done = lambda event, user_id, **params: {'statusCode': 200}  # noqa: E731
+    router.static = {key: done for key in profile.router.static}
+    router.dynamic = {m: [(p, done) for p, _ in routes] for m, routes in profile.router.dynamic.items()}
+    return router
+
+
+def event(method, path):
+    return {'rawPath': path, 'headers': {}, 'requestContext': {'http': {'method': method}}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    os.environ.update(USER_TABLE_NAME='Users', BUCKET_NAME='bench-bucket', USER_GENERATIONS_TABLE_NAME='Generations')
+    db = CountingDynamoDB()
+    with patch.object(profile, 'router', no_op_routes()), \
+         patch.object(profile, 'get_user_id_from_token', lambda e: 'bench-user'), \
+         patch.object(storage, 'dynamodb', db):
+        for method, path in REQUESTS:
+            request = event(method, path)
+            assert profile.handler(request, None)['statusCode'] == 200, (method, path)
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                profile.handler(request, None)
+            per_request_us = (time.perf_counter() - start) / args.iterations * 1e6
+            print(f"{method:<7} {path:<28} {per_request_us:6.2f}us/request")
+    print(f"tables built before routing: {db.tables}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+DynamoDB reads and consumed capacity per completed job for GET /status polls.
+
+Simulates jobs that take --duration seconds, polled every 3 seconds (the
+extension's interval) by --pollers clients at once, followed by
+--late-polls polls after the job finished (a reopened popup, a retry after
+a dropped response). Time is simulated, so the run takes milliseconds.
+
+Consumed capacity follows DynamoDB's rule for eventually consistent reads:
+0.5 RCU per 4 KB of item, rounded up.
+
+Usage: python backend/benchmarks/bench_status_polls.py [--jobs 200] [--duration 25] [--pollers 2] [--late-polls 3]
+"""
+import argparse
+import json
+import math
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import use_stub_sdk
+
+use_stub_sdk()
+from core import jobs, storage  # noqa: E402
+from core.singleflight import SingleFlight  # noqa: E402
+from handlers import status  # noqa: E402
+
+POLL_INTERVAL = 3.0
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class JobTable:
+    """Jobs that complete `duration` seconds after they start."""
+
+    name = 'Jobs'
+
+    def __init__(self, clock, duration):
+        self.clock = clock
+        self.duration = duration
+        self.started = {}
+        self.reads = 0
+        self.capacity = 0.0
+
+    def get_item(self, Key):
+        job_id = Key['jobId']
+        item = {'jobId': job_id, 'status': 'PROCESSING', 'userId': 'bench-user'}
+        if self.clock.now - self.started[job_id] >= self.duration:
+            item.update(status='COMPLETED', resultUrl=f"https://bucket.s3.amazonaws.com/results/{job_id}.png",
+                        renditions={'primary': f"https://bucket.s3.amazonaws.com/results/{job_id}.webp"})
+        self.reads += 1
+        self.capacity += 0.5 * math.ceil(len(json.dumps(item)) / 4096)
+        return {'Item': item}
+
+
+class OneTable:
+    def __init__(self, table):
+        self.table = table
+
+    def Table(self, name):
+        return self.table
+
+
+def run(args, cached):
+    clock = Clock()
+    table = JobTable(clock, args.duration)
+    flight = SingleFlight(ttl=jobs.JOB_TTL_SECONDS if cached else 0, clock=clock)
+    with patch.object(storage, 'dynamodb', OneTable(table)), \
+         patch.object(jobs, '_job_reads', flight), \
+         patch.object(jobs, '_terminal_jobs', type(jobs._terminal_jobs)()), \
+         patch.object(jobs, 'TERMINAL_CACHE_SIZE', jobs.TERMINAL_CACHE_SIZE if cached else 0):
+        for n in range(args.jobs):
+            job_id = f"job-{n}"
+            table.started[job_id] = clock.now
+            event = {'pathParameters': {'jobId': job_id}}
+            finished = False
+            late = 0
+            while late < args.late_polls:
+                for _ in range(args.pollers):
+                    body = json.loads(status.handler(event, None)['body'])
+                finished = finished or body['status'] == 'COMPLETED'
+                late += finished
+                clock.now += POLL_INTERVAL
+    return table.reads / args.jobs, table.capacity / args.jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--jobs', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=25.0)
+    parser.add_argument('--pollers', type=int, default=2)
+    parser.add_argument('--late-polls', type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ.setdefault('TABLE_NAME', 'Jobs')
+    for label, cached in (('uncached (before)', False), ('cached (after)', True)):
+        reads, capacity = run(args, cached)
+        print(f"{label:<20} {reads:6.1f} GetItem/job {capacity:6.2f} RCU/job")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Latency of POST /try-on with the job write and lane enqueue issued
+sequentially (the previous behaviour) versus concurrently, and the time from
+request to execution start through the lane and SchedulerFunction versus the
+dispatcher's direct start while a slot is free.
+
+Every DynamoDB, SQS, Step Functions and Lambda call sleeps for a latency
+sampled from the same model, so the difference between the runs is the round
+trips removed from the path. Through the lane, the start time adds the
+scheduler kick's delivery (one more sampled latency) and the scheduler's run.
+
+The stage spans recorded by core.telemetry go to a local MemoryExporter and
+are summarised per stage after the totals.
+
+Usage: python backend/benchmarks/bench_try_on_latency.py [--requests 200] [--median-ms 12] [--p95-ms 40]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import Latency, SerialExecutor, summarize, timed, use_stub_sdk
+
+use_stub_sdk()
+from core import storage, telemetry  # noqa: E402
+from core.telemetry import MemoryExporter  # noqa: E402
+from handlers import dispatcher, scheduler  # noqa: E402
+
+
+class SlowUserTable:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def update_item(self, **kwargs):
+        self.latency.wait()
+        return {'Attributes': {'credits': 100}}
+
+
+class SlowSelfieTable:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def get_item(self, Key, **kwargs):
+        self.latency.wait()
+        return {'Item': {'userId': Key['userId'], 'imageId': Key['imageId'], 's3Url': 'https://s3/selfie.jpg'}}
+
+
+class SlowJobTable:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def put_item(self, **kwargs):
+        self.latency.wait()
+
+    def update_item(self, **kwargs):
+        self.latency.wait()
+        return {}
+
+
+class SlowDynamoDB:
+    def __init__(self, latency):
+        self.tables = {
+            'Users': SlowUserTable(latency),
+            'Selfies': SlowSelfieTable(latency),
+            'Jobs': SlowJobTable(latency)
+        }
+
+    def Table(self, name):
+        return self.tables[name]
+
+
+class SlowSQS:
+    def __init__(self, latency):
+        self.latency = latency
+        self.queues = {}
+
+    def send_message(self, QueueUrl, MessageBody):
+        self.latency.wait()
+        self.queues.setdefault(QueueUrl, []).append({
+            'Body': MessageBody,
+            'ReceiptHandle': 'bench',
+            'Attributes': {'SentTimestamp': str(int(time.time() * 1000))}
+        })
+        return {'MessageId': 'bench'}
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages, **kwargs):
+        self.latency.wait()
+        queue = self.queues.get(QueueUrl, [])
+        messages, self.queues[QueueUrl] = queue[:MaxNumberOfMessages], queue[MaxNumberOfMessages:]
+        return {'Messages': messages}
+
+    def delete_message(self, **kwargs):
+        self.latency.wait()
+
+    def change_message_visibility(self, **kwargs):
+        self.latency.wait()
+
+
+class SlowSFN:
+    """A state machine with free execution slots."""
+    def __init__(self, latency):
+        self.latency = latency
+
+    def list_executions(self, **kwargs):
+        self.latency.wait()
+        return {'executions': []}
+
+    def start_execution(self, name, **kwargs):
+        self.latency.wait()
+        return {'executionArn': f"arn:execution:{name}"}
+
+
+class SlowLambda:
+    """The scheduler kick: an asynchronous invoke."""
+    def __init__(self, latency):
+        self.latency = latency
+
+    def invoke(self, **kwargs):
+        self.latency.wait()
+
+
+STAGES = ('token_validation', 'charge_credit', 'selfie_read', 'job_write', 'enqueue')
+
+
+def run(requests, latency, executor=None, exporter=None):
+    event = {
+        'headers': {'x-user-id': 'bench-user'},
+        'body': json.dumps({'itemUrl': 'https://example.com/item.jpg', 'selfieId': 'selfie'})
+    }
+    samples = []
+    pool = executor or storage.io_pool
+    with patch.object(storage, 'dynamodb', SlowDynamoDB(latency)), \
+         patch.object(storage, 'sqs_client', SlowSQS(latency)), \
+         patch.object(storage, 'lambda_client', SlowLambda(latency)), \
+         patch.object(storage, 'io_pool', pool), \
+         patch.object(dispatcher, 'slot_is_free', lambda: False), \
+         patch.object(telemetry, 'exporter', exporter or MemoryExporter()):
+        for _ in range(requests):
+            response, elapsed = timed(dispatcher.handler, event, None)
+            assert response['statusCode'] == 200, response
+            samples.append(elapsed)
+    return samples
+
+
+def run_to_start(requests, latency, direct):
+    """Milliseconds from each request to its execution's start."""
+    event = {
+        'headers': {'x-user-id': 'bench-user'},
+        'body': json.dumps({'itemUrl': 'https://example.com/item.jpg', 'selfieId': 'selfie'})
+    }
+    samples = []
+    with patch.object(storage, 'dynamodb', SlowDynamoDB(latency)), \
+         patch.object(storage, 'sqs_client', SlowSQS(latency)), \
+         patch.object(storage, 'sfn_client', SlowSFN(latency)), \
+         patch.object(storage, 'lambda_client', SlowLambda(latency)), \
+         patch.object(dispatcher, 'slot_is_free', lambda: direct), \
+         patch.object(telemetry, 'exporter', MemoryExporter()):
+        for _ in range(requests):
+            response, elapsed = timed(dispatcher.handler, event, None)
+            assert response['statusCode'] == 200, response
+            if not direct:
+                # The asynchronous kick reaching the scheduler, then its run
+                elapsed += timed(latency.wait)[1] + timed(scheduler.handler, {}, None)[1]
+            samples.append(elapsed)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--median-ms', type=float, default=12.0)
+    parser.add_argument('--p95-ms', type=float, default=40.0)
+    args = parser.parse_args()
+
+    os.environ.update(USER_TABLE_NAME='Users', USER_SELFIES_TABLE_NAME='Selfies', TABLE_NAME='Jobs',
+                      PAID_QUEUE_URL='paid', FREE_QUEUE_URL='free', SCHEDULER_FUNCTION='scheduler',
+                      STATE_MACHINE_ARN='arn:sm')
+
+    sequential = run(args.requests, Latency(args.median_ms, args.p95_ms, seed=1), SerialExecutor())
+    spans = MemoryExporter()
+    concurrent = run(args.requests, Latency(args.median_ms, args.p95_ms, seed=1), exporter=spans)
+    print(summarize('sequential (before)', sequential))
+    print(summarize('concurrent (after)', concurrent))
+    for stage in STAGES:
+        print(summarize(f"  stage {stage}", spans.durations(stage)))
+    print(summarize('start via lane', run_to_start(args.requests, Latency(args.median_ms, args.p95_ms, seed=2), False)))
+    print(summarize('start direct', run_to_start(args.requests, Latency(args.median_ms, args.p95_ms, seed=2), True)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+First-request latency of the latency-critical handlers with and without
+warm-up (core.warmup).
+
+For each function, fresh interpreters import the handler from its built
+artifact and time the first real request in three ways:
+
+- cold:   import, then the request (what a user hits on a new container)
+- init:   import inside a Lambda-like environment (AWS_LAMBDA_FUNCTION_NAME
+          set, so the init-phase steps run), then the request
+- pinged: cold import, one warm-up event, then the request
+
+Setup, fixtures and the SDK choice are those of bench_cold_start.py.
+
+Usage: python backend/benchmarks/bench_warmup.py [--runs 5] [--stub-sdk] [FunctionLogicalId ...]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_cold_start import build_fixtures, handler_events, subprocess_env
+from harness import BACKEND_DIR
+
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'tools'))
+from package_handler import package, template_handlers
+
+DRIVER = r'''
+import importlib, json, sys, time
+spec, event, ping = sys.argv[1], json.loads(sys.argv[2]), sys.argv[3] == 'ping'
+module_name, handler_name = spec.rsplit('.', 1)
+t0 = time.perf_counter()
+handler = getattr(importlib.import_module(module_name), handler_name)
+t1 = time.perf_counter()
+if ping:
+    handler({'warmup': {}}, None)
+t2 = time.perf_counter()
+try:
+    handler(event, None)
+except Exception:
+    # Step Functions tasks raise on failure; the timing is still valid
+    pass
+t3 = time.perf_counter()
+print(json.dumps({'setup_ms': (t2 - t0) * 1000, 'request_ms': (t3 - t2) * 1000}))
+'''
+
+MODES = ('cold', 'init', 'pinged')
+
+DEFAULT_FUNCTIONS = ('DispatcherFunction', 'StatusFunction')
+
+
+def measure(spec, event, env, mode):
+    env = dict(env)
+    if mode == 'init':
+        env['AWS_LAMBDA_FUNCTION_NAME'] = 'bench'
+    out = subprocess.run(
+        [sys.executable, '-c', DRIVER, spec, json.dumps(event), 'ping' if mode == 'pinged' else 'none'],
+        env=env, capture_output=True, text=True, check=True
+    )
+    # Handlers print progress; the driver's result is the last line
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('functions', nargs='*', help=f"function logical IDs (default: {', '.join(DEFAULT_FUNCTIONS)})")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--stub-sdk', action='store_true', help='use the boto3 stubs from tests/mocks')
+    args = parser.parse_args()
+
+    try:
+        import boto3  # noqa: F401
+        stub_sdk = args.stub_sdk
+    except ImportError:
+        stub_sdk = True
+
+    functions = template_handlers()
+    with tempfile.TemporaryDirectory() as workdir:
+        build_fixtures(workdir)
+        events = handler_events(workdir)
+        print(f"SDK: {'stub' if stub_sdk else 'boto3'}; median of {args.runs} fresh interpreters")
+        print(f"{'function':<24} {'mode':<7} {'setup':>9} {'1st request':>12}")
+        for function in args.functions or DEFAULT_FUNCTIONS:
+            spec = functions[function]
+            artifact_dir = os.path.join(workdir, function)
+            package(spec, artifact_dir)
+            env = subprocess_env(workdir, artifact_dir, stub_sdk)
+            for mode in MODES:
+                runs = [measure(spec, events[spec], env, mode) for _ in range(args.runs)]
+                setup = statistics.median(r['setup_ms'] for r in runs)
+                request = statistics.median(r['request_ms'] for r in runs)
+                print(f"{function:<24} {mode:<7} {setup:8.1f}ms {request:11.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Shared helpers for the backend benchmarks.
+
+Benchmarks run the Lambda handlers in-process against fake AWS services that
+sleep for a sampled network latency, so results reflect how many round trips
+sit on the request path rather than the speed of the local machine.
+"""
+import math
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOCKS_DIR = os.path.join(BACKEND_DIR, 'tests', 'mocks')
+
+
+def use_stub_sdk():
+    """Put the boto3/botocore stubs from tests/mocks ahead of any installed SDK."""
+    for path in (BACKEND_DIR, MOCKS_DIR):
+        if path in sys.path:
+            sys.path.remove(path)
+        sys.path.insert(0, path)
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(label, samples_ms):
+    return (f"{label:<28} n={len(samples_ms):<5} "
+            f"p50={percentile(samples_ms, 50):7.1f}ms "
+            f"p95={percentile(samples_ms, 95):7.1f}ms "
+            f"max={max(samples_ms):7.1f}ms")
+
+
+class Latency:
+    """Log-normal latency model parameterised by its median and p95 in milliseconds."""
+
+    def __init__(self, median_ms, p95_ms, seed=None):
+        self.mu = math.log(median_ms)
+        # p95 of a log-normal is exp(mu + 1.645 * sigma)
+        self.sigma = (math.log(p95_ms) - self.mu) / 1.645
+        self.rng = random.Random(seed)
+
+    def wait(self):
+        time.sleep(self.rng.lognormvariate(self.mu, self.sigma) / 1000.0)
+
+
+class SerialExecutor:
+    """Executor stand-in that runs submitted work inline, one call after another."""
+
+    def submit(self, fn, *args, **kwargs):
+        from concurrent.futures import Future
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def timed(fn, *args, **kwargs):
+    """Call fn and return (result, elapsed milliseconds)."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000.0
@@ -0,0 +1,166 @@
+"""
+Discrete-event simulation of the try-on lanes under Gemini throttling.
+
+A fixed number of execution slots (MAX_RUNNING_JOBS) serves jobs whose
+run time is log-normal around --job-seconds. Three scenarios:
+
+- flood: a burst of free jobs at t=0, then steady free and paid arrivals;
+- paid overload: paid jobs alone arrive faster than the slots can serve,
+  while free jobs keep coming;
+- quiet: light load in both lanes.
+
+Each is run with one FIFO queue (before) and with the lanes started in
+core.scheduling.WeightedFairScheduler order (after), reporting queue wait
+per lane. The starvation check runs on the overload scenario: while free
+jobs wait, no more than the paid weight of consecutive starts may go to
+paid, and free jobs must keep their weighted share of all starts.
+
+Usage: python backend/benchmarks/sim_priority_lanes.py [--slots 10] [--job-seconds 25] [--hours 2]
+"""
+import argparse
+import heapq
+import os
+import random
+import sys
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from harness import percentile, use_stub_sdk
+
+use_stub_sdk()
+from core.scheduling import LANES, WeightedFairScheduler, lane_weights  # noqa: E402
+
+
+def arrivals(rng, lane, per_minute, until, start=0.0):
+    """Poisson arrival times in seconds."""
+    t, times = start, []
+    while per_minute > 0:
+        t += rng.expovariate(per_minute / 60.0)
+        if t >= until:
+            return times
+        times.append((t, lane))
+    return times
+
+
+def scenario(name, rng, slots, job_seconds, until):
+    capacity_per_minute = slots * 60.0 / job_seconds
+    if name == 'flood':
+        jobs = [(0.0, 'free')] * 300
+        jobs += arrivals(rng, 'free', 0.6 * capacity_per_minute, until)
+        jobs += arrivals(rng, 'paid', 0.3 * capacity_per_minute, until)
+    elif name == 'paid overload':
+        jobs = arrivals(rng, 'paid', 1.5 * capacity_per_minute, until)
+        jobs += arrivals(rng, 'free', 0.5 * capacity_per_minute, until)
+    else:
+        jobs = arrivals(rng, 'paid', 0.1 * capacity_per_minute, until)
+        jobs += arrivals(rng, 'free', 0.3 * capacity_per_minute, until)
+    return sorted(jobs)
+
+
+class FifoPicker:
+    def __init__(self):
+        self.order = deque()
+
+    def add(self, lane, job):
+        self.order.append((lane, job))
+
+    def pick(self, queues):
+        lane, _ = self.order.popleft()
+        return lane
+
+
+class LanePicker:
+    def __init__(self, weights):
+        self.scheduler = WeightedFairScheduler(weights)
+
+    def add(self, lane, job):
+        pass
+
+    def pick(self, queues):
+        return self.scheduler.next([lane for lane in LANES if queues[lane]])
+
+
+def simulate(jobs, picker, slots, job_seconds, rng):
+    """Returns per-lane waits in seconds and the lane of every start in order."""
+    sigma = 0.35
+    queues = {lane: deque() for lane in LANES}
+    events = [(t, 0, 'arrive', lane) for t, lane in jobs]
+    heapq.heapify(events)
+    free_slots, seq = slots, 1
+    waits = {lane: [] for lane in LANES}
+    starts = []
+
+    while events:
+        now, _, kind, lane = heapq.heappop(events)
+        if kind == 'arrive':
+            queues[lane].append(now)
+            picker.add(lane, now)
+        else:
+            free_slots += 1
+        while free_slots and any(queues.values()):
+            chosen = picker.pick(queues)
+            arrived = queues[chosen].popleft()
+            waits[chosen].append(now - arrived)
+            starts.append((chosen, any(queues['free']) or chosen == 'free'))
+            free_slots -= 1
+            duration = rng.lognormvariate(0, sigma) * job_seconds
+            heapq.heappush(events, (now + duration, seq, 'done', chosen))
+            seq += 1
+    return waits, starts
+
+
+def starvation_check(starts, weights):
+    """(longest paid run while free waited, free share of starts while both waited)."""
+    longest = run = both = free = 0
+    for lane, free_waiting in starts:
+        if lane == 'paid' and free_waiting:
+            run += 1
+            longest = max(longest, run)
+        else:
+            run = 0
+        if free_waiting:
+            both += 1
+            free += lane == 'free'
+    return longest, free / both if both else 1.0
+
+
+def report(label, waits):
+    for lane in LANES:
+        samples = waits[lane]
+        if samples:
+            print(f"  {label} {lane:<5} n={len(samples):<5} "
+                  f"p50={percentile(samples, 50):7.1f}s p95={percentile(samples, 95):7.1f}s max={max(samples):7.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--slots', type=int, default=10)
+    parser.add_argument('--job-seconds', type=float, default=25.0)
+    parser.add_argument('--hours', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    weights = lane_weights()
+    until = args.hours * 3600
+    overload_starts = None
+    for name in ('flood', 'paid overload', 'quiet'):
+        jobs = scenario(name, random.Random(args.seed), args.slots, args.job_seconds, until)
+        print(f"{name}: {len(jobs)} jobs, {args.slots} slots, weights {weights}")
+        fifo, _ = simulate(jobs, FifoPicker(), args.slots, args.job_seconds, random.Random(args.seed))
+        lanes, starts = simulate(jobs, LanePicker(weights), args.slots, args.job_seconds, random.Random(args.seed))
+        report('fifo ', fifo)
+        report('lanes', lanes)
+        if name == 'paid overload':
+            overload_starts = starts
+
+    longest, share = starvation_check(overload_starts, weights)
+    expected = weights['free'] / sum(weights.values())
+    starved = longest > weights['paid'] or share < expected * 0.95
+    print(f"starvation check (paid overload): longest paid run while free waited={longest} "
+          f"(bound {weights['paid']}), free share={share:.3f} (weight share {expected:.3f}) "
+          f"-> {'FAIL' if starved else 'OK'}")
+    sys.exit(1 if starved else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+"""
+Shared building blocks for the WebWardrobe Lambda handlers.
+
+Modules here are imported by the thin entry points in handlers/. Keep them
+free of heavy imports at module level: every function ships only the core
+modules its handler actually imports (see tools/package_handler.py).
+"""
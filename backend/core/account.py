@@ -0,0 +1,128 @@
+"""
+Bulk removal of a user's generations and selfies, and full account purge.
+
+Each query or listing page is handed to the shared worker pool as soon as it
+arrives, so deletes of one page overlap reading the next. The batch calls
+themselves are in core/bulk.py.
+"""
+import os
+
+from core import storage
+from core.bulk import batch_delete, delete_s3_keys, list_s3_keys
+from core.log import get_logger
+from core.selfies import list_selfies
+
+log = get_logger('account')
+
+# Image attributes holding S3 keys: the original and its server-made variants
+IMAGE_KEY_FIELDS = ('s3Key', 'thumbnailS3Key', 'modelS3Key')
+
+# S3 prefixes holding everything stored for a user
+USER_PREFIXES = ('uploads/{user_id}/', 'results/{user_id}/')
+
+def image_keys(images):
+    return [img[field] for img in images for field in IMAGE_KEY_FIELDS if field in img]
+
+def generation_keys(item):
+    urls = [item.get('resultUrl')] + list((item.get('renditions') or {}).values())
+    return [storage.s3_key_from_url(url) for url in urls if url]
+
+# TryOnJobs index on userId: every job and batch record of a user
+JOBS_BY_USER_INDEX = 'UserIdIndex'
+
+def query_pages(table, args):
+    """Yield the item pages of a query, following LastEvaluatedKey."""
+    while True:
+        page = table.query(**args)
+        yield page.get('Items', [])
+        if 'LastEvaluatedKey' not in page:
+            return
+        args['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+def generation_pages(gen_table, user_id):
+    """Yield pages of the user's generations, projected to what deletion needs."""
+    return query_pages(gen_table, {
+        'KeyConditionExpression': '#u = :u',
+        'ProjectionExpression': '#u, #t, #j, #r, #n',
+        'ExpressionAttributeNames': {
+            '#u': 'userId', '#t': 'timestamp', '#j': 'jobId', '#r': 'resultUrl', '#n': 'renditions'
+        },
+        'ExpressionAttributeValues': {':u': user_id}
+    })
+
+def job_pages(job_table, user_id):
+    """
+    Yield pages of the user's TryOnJobs keys, whatever their state: failed
+    and in-flight jobs have no generation, and batch records none at all.
+    """
+    return query_pages(job_table, {
+        'IndexName': JOBS_BY_USER_INDEX,
+        'KeyConditionExpression': 'userId = :u',
+        'ExpressionAttributeValues': {':u': user_id}
+    })
+
+def delete_generations(user_id, bucket_name, job_ids=None, include_jobs=False):
+    """
+    Delete the user's generations (all of them, or those in `job_ids`) and
+    their result objects; with `include_jobs`, their TryOnJobs records too.
+
+    Returns {'deleted': n, 'failed': m}, counting generation items.
+    """
+    gen_table_name = os.environ['USER_GENERATIONS_TABLE_NAME']
+    gen_table = storage.table(gen_table_name)
+    dynamodb = storage.get_dynamodb()
+    s3 = storage.get_s3_client()
+    pool = storage.get_io_pool()
+    wanted = set(job_ids) if job_ids is not None else None
+
+    found = 0
+    item_futures, other_futures = [], []
+    for page in generation_pages(gen_table, user_id):
+        items = [i for i in page if wanted is None or i.get('jobId') in wanted]
+        if not items:
+            continue
+        found += len(items)
+        keys = [{'userId': i['userId'], 'timestamp': i['timestamp']} for i in items]
+        item_futures.append(pool.submit(batch_delete, dynamodb, gen_table_name, keys))
+        other_futures.append(pool.submit(delete_s3_keys, s3, bucket_name, [k for i in items for k in generation_keys(i)]))
+        if include_jobs:
+            job_keys = [{'jobId': i['jobId']} for i in items if i.get('jobId')]
+            other_futures.append(pool.submit(batch_delete, dynamodb, os.environ['TABLE_NAME'], job_keys))
+
+    failed = sum(len(f.result()) for f in item_futures)
+    leftovers = sum(len(f.result()) for f in other_futures)
+    if leftovers:
+        log.warning('Bulk delete left objects or job records behind', userId=user_id, leftovers=leftovers)
+    return {'deleted': found - failed, 'failed': failed}
+
+def purge_account(user_id, bucket_name):
+    """
+    Remove everything stored for a user: generations, every job and batch
+    record, selfie items, every S3 object under their prefixes, and finally
+    the profile.
+    """
+    s3 = storage.get_s3_client()
+    pool = storage.get_io_pool()
+
+    generations = delete_generations(user_id, bucket_name, include_jobs=True)
+
+    dynamodb = storage.get_dynamodb()
+    job_table_name = os.environ['TABLE_NAME']
+    futures = [pool.submit(batch_delete, dynamodb, job_table_name, [{'jobId': i['jobId']} for i in page])
+               for page in job_pages(storage.table(job_table_name), user_id)]
+
+    selfie_keys = [{'userId': user_id, 'imageId': img['id']} for img in list_selfies(user_id)]
+    futures.append(pool.submit(batch_delete, dynamodb, os.environ['USER_SELFIES_TABLE_NAME'], selfie_keys))
+    for prefix in USER_PREFIXES:
+        for keys in list_s3_keys(s3, bucket_name, prefix.format(user_id=user_id)):
+            futures.append(pool.submit(delete_s3_keys, s3, bucket_name, keys))
+    leftovers = sum(len(f.result()) for f in futures)
+
+    # Last, so a purge that failed part way can simply be repeated
+    if not generations['failed'] and not leftovers:
+        storage.table(os.environ['USER_TABLE_NAME']).delete_item(Key={'userId': user_id})
+
+    return {
+        'generationsDeleted': generations['deleted'],
+        'complete': not generations['failed'] and not leftovers
+    }
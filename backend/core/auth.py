@@ -0,0 +1,117 @@
+"""
+Resolve the calling user from Google OAuth bearer tokens.
+
+Google lookups are coalesced per token: concurrent requests with the same
+token share one call, and its answer is reused for TOKEN_TTL_SECONDS, but
+never past the token's expiry. Lookups that named no user are not reused.
+
+Access tokens are opaque, so there are no signing keys (JWKS) to load; every
+check is a call to Google. prewarm() does the part of that call a container
+can do ahead of time: building the TLS context and resolving the host.
+"""
+import json
+import socket
+import ssl
+
+from core.log import get_logger
+from core.singleflight import SingleFlight
+
+log = get_logger('auth')
+
+TOKEN_TTL_SECONDS = 60
+
+GOOGLE_API_HOST = 'www.googleapis.com'
+
+_google_lookups = SingleFlight(ttl=TOKEN_TTL_SECONDS)
+
+# Loading the CA bundle costs milliseconds; one context serves every call
+_tls_context = None
+
+def _tls():
+    global _tls_context
+    if _tls_context is None:
+        _tls_context = ssl.create_default_context()
+    return _tls_context
+
+def prewarm():
+    """Build the TLS context and resolve Google's API host before the first token check."""
+    _tls()
+    socket.getaddrinfo(GOOGLE_API_HOST, 443)
+
+def _token_info(token):
+    import urllib.request
+    url = f"https://{GOOGLE_API_HOST}/oauth2/v3/tokeninfo?access_token={token}"
+    with urllib.request.urlopen(url, context=_tls()) as response:
+        return json.loads(response.read().decode())
+
+def token_info_ttl(data):
+    """Seconds to reuse a tokeninfo answer: up to TOKEN_TTL_SECONDS, within the token's expires_in."""
+    try:
+        expires_in = int(data['expires_in'])
+    except (KeyError, TypeError, ValueError):
+        return 0
+    return max(0, min(TOKEN_TTL_SECONDS, expires_in)) if data.get('sub') else 0
+
+def user_info_ttl(info):
+    return TOKEN_TTL_SECONDS if info else 0
+
+def _token_user_info(token):
+    import urllib.request
+    # Use userinfo endpoint instead of tokeninfo for better profile data
+    url = f"https://{GOOGLE_API_HOST}/oauth2/v3/userinfo"
+    req = urllib.request.Request(url, headers={'Authorization': f"Bearer {token}"})
+    with urllib.request.urlopen(req, context=_tls()) as response:
+        data = json.loads(response.read().decode())
+        log.debug('User info received', keys=list(data.keys()))
+        user_info = {field: data[field] for field in ('email', 'name', 'picture') if field in data}
+        return user_info if user_info else None
+
+def get_user_id_from_token(event):
+    """
+    Extracts user ID from Authorization header (Google OAuth Token)
+    or x-user-id header (Mock/Legacy).
+    """
+    headers = event.get('headers', {})
+
+    # 1. Check for Authorization header (Bearer Token)
+    auth_header = headers.get('authorization') or headers.get('Authorization')
+    if auth_header:
+        token = auth_header.replace('Bearer ', '').strip()
+        try:
+            # Validate with Google
+            data = _google_lookups.do(('tokeninfo', token), lambda: _token_info(token), ttl=token_info_ttl)
+            # 'sub' is the unique user ID
+            return data.get('sub')
+        except Exception as e:
+            log.warning('Token validation failed', error=e)
+            # Fall through to check other headers if validation fails
+            pass
+
+    # 2. Fallback: Check x-user-id (Mock/Testing)
+    user_id = headers.get('x-user-id') or headers.get('X-User-Id')
+    if user_id:
+        return user_id
+
+    # 3. Fallback: Check body
+    try:
+        body = json.loads(event.get('body', '{}'))
+        return body.get('userId')
+    except:
+        return None
+
+def get_user_info_from_token(event):
+    """Extract user email and name from Google OAuth token if available.
+    Returns a dict with keys 'email' and 'name' when found, otherwise None.
+    """
+    headers = event.get('headers', {})
+    auth_header = headers.get('authorization') or headers.get('Authorization')
+    if auth_header:
+        token = auth_header.replace('Bearer ', '').strip()
+        try:
+            info = _google_lookups.do(('userinfo', token), lambda: _token_user_info(token), ttl=user_info_ttl)
+            # Callers may add to it; the shared answer stays as Google sent it
+            return dict(info) if info else None
+        except Exception as e:
+            log.warning('User info lookup failed', error=e)
+    # Fallback: no info available
+    return None
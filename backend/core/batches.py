@@ -0,0 +1,74 @@
+"""
+Batch try-on records in TryOnJobs.
+
+A batch is one item keyed by its batch id next to the job records it fans
+out to: the owner, the (jobId, selfieId, itemUrl) of every pair, and
+`pendingJobs`, the string set of jobs the saver has not recorded yet. Each
+job's record carries the batchId; the batch's status is read off its jobs.
+"""
+import datetime
+
+from botocore.exceptions import ClientError
+
+from core.jobs import TERMINAL_STATUSES
+
+# Pairs one POST /try-on/batch may fan out to
+MAX_BATCH_PAIRS = 10
+
+def put_batch_record(job_table, batch_id, user_id, pairs):
+    """Store the batch with every job pending. `pairs` are dicts with jobId, selfieId and itemUrl."""
+    job_table.put_item(Item={
+        'jobId': batch_id,
+        'kind': 'batch',
+        'userId': user_id,
+        'pairs': pairs,
+        'pendingJobs': {pair['jobId'] for pair in pairs},
+        'timestamp': datetime.datetime.utcnow().isoformat()
+    })
+
+def finish_batch_job(job_table, batch_id, job_id):
+    """
+    Take a recorded job off its batch's pending set.
+
+    Returns True when this call removed the last pending job. Repeats for
+    the same job change nothing and return False.
+    """
+    try:
+        response = job_table.update_item(
+            Key={'jobId': batch_id},
+            UpdateExpression="delete pendingJobs :job",
+            ConditionExpression="contains(pendingJobs, :job_id)",
+            ExpressionAttributeValues={':job': {job_id}, ':job_id': job_id},
+            ReturnValues='UPDATED_NEW'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise e
+    # DynamoDB drops a set attribute once its last element is deleted
+    return not response.get('Attributes', {}).get('pendingJobs')
+
+def batch_status(batch, jobs):
+    """
+    The API view of a batch from its record and its jobs' records (None for
+    a job whose record was never written, which failed to queue).
+    """
+    items, counts = [], {'COMPLETED': 0, 'FAILED': 0, 'PROCESSING': 0}
+    for pair, job in zip(batch['pairs'], jobs):
+        job = job or {'status': 'FAILED', 'error': 'Not queued'}
+        status = job.get('status', 'PROCESSING')
+        counts[status if status in counts else 'PROCESSING'] += 1
+        items.append({
+            **pair,
+            'status': status,
+            'resultUrl': job.get('resultUrl'),
+            'renditions': job.get('renditions') or {},
+            'error': job.get('error')
+        })
+    finished = all(item['status'] in TERMINAL_STATUSES for item in items)
+    return {
+        'batchId': batch['jobId'],
+        'status': 'COMPLETED' if finished else 'PROCESSING',
+        'counts': counts,
+        'items': items
+    }
@@ -0,0 +1,70 @@
+"""
+Batched deletes for S3 and DynamoDB.
+
+delete_s3_keys() sends up to 1000 keys per DeleteObjects call and
+batch_delete() up to 25 keys per BatchWriteItem call, resubmitting
+unprocessed items with backoff. Both take an optional executor so callers
+can overlap batches (and pages) instead of waiting on each in turn.
+"""
+import time
+
+S3_BATCH = 1000
+DYNAMODB_BATCH = 25
+
+def chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _run(executor, fn, batches):
+    if executor is None:
+        return [fn(batch) for batch in batches]
+    return [f.result() for f in [executor.submit(fn, batch) for batch in batches]]
+
+def delete_s3_keys(s3_client, bucket_name, keys, executor=None):
+    """Delete `keys` from the bucket; returns the keys S3 could not delete."""
+    def delete(batch):
+        response = s3_client.delete_objects(
+            Bucket=bucket_name,
+            Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+        )
+        return [error['Key'] for error in response.get('Errors', [])]
+
+    failed = []
+    for errors in _run(executor, delete, list(chunks(sorted(set(keys)), S3_BATCH))):
+        failed.extend(errors)
+    return failed
+
+def batch_delete(dynamodb, table_name, keys, executor=None, max_attempts=5, base_delay=0.05):
+    """
+    Delete items by primary key with BatchWriteItem.
+
+    Items DynamoDB leaves unprocessed (throttling) are resubmitted with
+    exponential backoff; whatever is still left after `max_attempts` is
+    returned.
+    """
+    def delete(batch):
+        request = {table_name: [{'DeleteRequest': {'Key': key}} for key in batch]}
+        for attempt in range(max_attempts):
+            response = dynamodb.batch_write_item(RequestItems=request)
+            request = response.get('UnprocessedItems') or {}
+            if not request:
+                return []
+            time.sleep(base_delay * (2 ** attempt))
+        return [r['DeleteRequest']['Key'] for r in request.get(table_name, [])]
+
+    failed = []
+    for leftovers in _run(executor, delete, list(chunks(keys, DYNAMODB_BATCH))):
+        failed.extend(leftovers)
+    return failed
+
+def list_s3_keys(s3_client, bucket_name, prefix):
+    """Yield pages (lists) of keys under `prefix`."""
+    args = {'Bucket': bucket_name, 'Prefix': prefix}
+    while True:
+        page = s3_client.list_objects_v2(**args)
+        keys = [obj['Key'] for obj in page.get('Contents', [])]
+        if keys:
+            yield keys
+        if not page.get('IsTruncated'):
+            return
+        args['ContinuationToken'] = page['NextContinuationToken']
@@ -0,0 +1,155 @@
+"""
+Thin DynamoDB data access on the low-level client.
+
+Resource and Table mirror the parts of boto3's resource API the handlers use
+(Table(name).get_item/put_item/update_item/delete_item/query/scan and
+batch_write_item) but marshal with the functions below. Numbers come back as
+int or float rather than Decimal, so items can go straight to json.dumps, and
+boto3's resource layer is never imported.
+"""
+import math
+from decimal import Decimal
+
+from botocore.exceptions import ClientError
+
+def _number_text(value):
+    # DynamoDB has no Infinity or NaN; refuse them here, next to the cause
+    if not isinstance(value, int) and not math.isfinite(value):
+        raise ValueError(f"Infinity and NaN are not supported: {value}")
+    return str(value)
+
+def serialize(value):
+    """
+    Encode a Python value as a DynamoDB AttributeValue. Raises ValueError
+    for values DynamoDB would reject (empty sets, Infinity, NaN), as boto3's
+    TypeSerializer does.
+    """
+    if isinstance(value, str):
+        return {'S': value}
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if isinstance(value, (int, float, Decimal)):
+        return {'N': _number_text(value)}
+    if value is None:
+        return {'NULL': True}
+    if isinstance(value, dict):
+        return {'M': {k: serialize(v) for k, v in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {'L': [serialize(v) for v in value]}
+    if isinstance(value, bytes):
+        return {'B': value}
+    if isinstance(value, (set, frozenset)):
+        if not value:
+            raise ValueError('Empty sets are not supported')
+        if all(isinstance(v, str) for v in value):
+            return {'SS': sorted(value)}
+        return {'NS': sorted(_number_text(v) for v in value)}
+    raise TypeError(f"Unsupported DynamoDB value: {type(value).__name__}")
+
+def serialize_item(item):
+    return {k: serialize(v) for k, v in item.items()}
+
+def _number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+def _identity(value):
+    return value
+
+_DESERIALIZERS = {
+    'S': _identity,
+    'N': _number,
+    'BOOL': _identity,
+    'NULL': lambda value: None,
+    'M': lambda value: {k: deserialize(v) for k, v in value.items()},
+    'L': lambda value: [deserialize(v) for v in value],
+    'B': _identity,
+    'SS': list,
+    'NS': lambda value: [_number(n) for n in value],
+    'BS': list,
+}
+
+def deserialize(value):
+    """Decode an AttributeValue into plain, JSON-ready Python types."""
+    for tag, raw in value.items():
+        return _DESERIALIZERS[tag](raw)
+
+def deserialize_item(item):
+    return {k: deserialize(v) for k, v in item.items()}
+
+# Request arguments and response fields that hold attribute maps
+_ITEM_ARGS = ('Key', 'Item', 'ExclusiveStartKey', 'ExpressionAttributeValues')
+_ITEM_FIELDS = ('Item', 'Attributes', 'LastEvaluatedKey')
+
+def _decode_response(response):
+    for field in _ITEM_FIELDS:
+        if field in response:
+            response[field] = deserialize_item(response[field])
+    if 'Items' in response:
+        response['Items'] = [deserialize_item(item) for item in response['Items']]
+    return response
+
+class Table:
+    """One table, called with the same keyword arguments as a boto3 Table."""
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def _call(self, operation, kwargs):
+        request = dict(kwargs, TableName=self.name)
+        for arg in _ITEM_ARGS:
+            if arg in request:
+                request[arg] = serialize_item(request[arg])
+        try:
+            response = getattr(self.client, operation)(**request)
+        except ClientError as e:
+            # ReturnValuesOnConditionCheckFailure puts the old item on the error
+            if 'Item' in e.response:
+                e.response['Item'] = deserialize_item(e.response['Item'])
+            raise e
+        return _decode_response(response)
+
+    def get_item(self, **kwargs):
+        return self._call('get_item', kwargs)
+
+    def put_item(self, **kwargs):
+        return self._call('put_item', kwargs)
+
+    def update_item(self, **kwargs):
+        return self._call('update_item', kwargs)
+
+    def delete_item(self, **kwargs):
+        return self._call('delete_item', kwargs)
+
+    def query(self, **kwargs):
+        return self._call('query', kwargs)
+
+    def scan(self, **kwargs):
+        return self._call('scan', kwargs)
+
+def _convert_write(request, convert):
+    """Apply `convert` to the Item or Key of a PutRequest/DeleteRequest."""
+    return {kind: {field: convert(value) for field, value in body.items()} for kind, body in request.items()}
+
+class Resource:
+    """Stand-in for boto3.resource('dynamodb') over a low-level client."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def Table(self, name):
+        return Table(self.client, name)
+
+    def batch_write_item(self, RequestItems):
+        response = self.client.batch_write_item(RequestItems={
+            table: [_convert_write(r, serialize_item) for r in requests]
+            for table, requests in RequestItems.items()
+        })
+        response['UnprocessedItems'] = {
+            table: [_convert_write(r, deserialize_item) for r in requests]
+            for table, requests in (response.get('UnprocessedItems') or {}).items()
+        }
+        return response
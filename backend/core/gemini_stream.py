@@ -0,0 +1,149 @@
+"""
+Incremental extraction of the generated image from a Gemini response.
+
+The response is a JSON document whose image is a multi-megabyte base64 string
+at candidates[].content.parts[].inlineData.data. InlineImageDecoder walks the
+JSON structure as bytes arrive and base64-decodes that one string on the fly,
+so neither the JSON document nor the decoded image is ever held in full.
+"""
+import base64
+import re
+
+# Gemini answers in camelCase; the REST API also accepts snake_case
+INLINE_KEYS = (b'inlineData', b'inline_data')
+
+# How much of the raw response to keep for error messages
+HEAD_SIZE = 2048
+
+_STRING_STOP = re.compile(rb'["\\]')
+
+_KEY, _SKIP, _IMAGE = 'key', 'skip', 'image'
+
+
+class InlineImageDecoder:
+    """
+    Push parser for the first inlineData.data string in a JSON byte stream.
+
+    feed() returns the image bytes decoded from each chunk. Strings other than
+    keys are skipped with a regex search rather than byte by byte, so large
+    fields such as thought signatures cost almost nothing.
+    """
+
+    def __init__(self):
+        # One frame per open container: [kind, current key, expecting a key]
+        self.stack = []
+        self.string = None
+        self.key = bytearray()
+        self.escape = False
+        self.pending = b''
+        self.found = False
+        self.done = False
+        self.head = b''
+
+    def feed(self, chunk):
+        if len(self.head) < HEAD_SIZE:
+            self.head += chunk[:HEAD_SIZE - len(self.head)]
+        out = []
+        pos = 0
+        while pos < len(chunk) and not self.done:
+            if self.string is None:
+                pos = self._structure(chunk, pos)
+            else:
+                pos = self._string(chunk, pos, out)
+        return b''.join(out)
+
+    def close(self):
+        """Check that the image string was complete."""
+        if not self.found:
+            raise ValueError(f"No image found in Gemini response: {self.head.decode('utf-8', 'replace')}")
+        if not self.done:
+            raise ValueError("Gemini response ended inside the image data")
+
+    def _structure(self, chunk, pos):
+        c = chunk[pos:pos + 1]
+        top = self.stack[-1] if self.stack else None
+        if c == b'{':
+            self.stack.append([b'{', None, True])
+        elif c == b'[':
+            self.stack.append([b'[', None, False])
+        elif c in (b'}', b']'):
+            self.stack.pop()
+        elif c == b',' and top and top[0] == b'{':
+            top[2] = True
+        elif c == b'"':
+            if top and top[2]:
+                self.string = _KEY
+                self.key = bytearray()
+            elif self._at_image():
+                self.string = _IMAGE
+                self.found = True
+            else:
+                self.string = _SKIP
+        return pos + 1
+
+    def _at_image(self):
+        if len(self.stack) < 2:
+            return False
+        field, parent = self.stack[-1], self.stack[-2]
+        return (field[0] == b'{' and field[1] == b'data'
+                and parent[0] == b'{' and parent[1] in INLINE_KEYS)
+
+    def _string(self, chunk, pos, out):
+        if self.escape:
+            self.escape = False
+            self._consume(chunk[pos:pos + 1], out, escaped=True)
+            return pos + 1
+        match = _STRING_STOP.search(chunk, pos)
+        end = match.start() if match else len(chunk)
+        self._consume(chunk[pos:end], out)
+        if match is None:
+            return end
+        if chunk[end:end + 1] == b'\\':
+            self.escape = True
+        else:
+            self._end_string(out)
+        return end + 1
+
+    def _consume(self, data, out, escaped=False):
+        if self.string == _KEY:
+            self.key += data
+        elif self.string == _IMAGE:
+            # Base64 never needs escaping, but encoders may still write \/
+            if escaped and data != b'/':
+                return
+            data = self.pending + data
+            usable = len(data) - len(data) % 4
+            if usable:
+                out.append(base64.b64decode(data[:usable]))
+            self.pending = data[usable:]
+
+    def _end_string(self, out):
+        if self.string == _KEY:
+            top = self.stack[-1]
+            top[1] = bytes(self.key)
+            top[2] = False
+        elif self.string == _IMAGE:
+            if self.pending:
+                # Tolerate encoders that drop the '=' padding
+                out.append(base64.b64decode(self.pending + b'=' * (-len(self.pending) % 4)))
+                self.pending = b''
+            self.done = True
+        self.string = None
+
+
+def iter_inline_image(read, chunk_size=64 * 1024):
+    """
+    Yield the decoded image bytes from a file-like `read` callable.
+
+    Stops reading as soon as the image string ends; raises ValueError if the
+    response has no image or is truncated.
+    """
+    decoder = InlineImageDecoder()
+    while not decoder.done:
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        data = decoder.feed(chunk)
+        if data:
+            yield data
+    decoder.close()
@@ -0,0 +1,50 @@
+"""
+Helpers for API Gateway (HTTP API) events and responses.
+"""
+import json
+
+def response(status_code, body, headers=None):
+    """Build an API Gateway response with a JSON-encoded body."""
+    result = {
+        'statusCode': status_code,
+        'body': json.dumps(body)
+    }
+    if headers:
+        result['headers'] = headers
+    return result
+
+def error(status_code, message, **extra):
+    return response(status_code, {'error': message, **extra})
+
+def json_body(event):
+    """Parse the request body as JSON; a missing body is an empty object."""
+    return json.loads(event.get('body') or '{}')
+
+def get_method(event):
+    return event.get('requestContext', {}).get('http', {}).get('method')
+
+def get_path(event):
+    """
+    The request path without the stage: HTTP API puts a named stage in
+    rawPath ('/prod/user/images'), while routes are registered without it.
+    """
+    # HTTP API uses rawPath
+    path = event.get('rawPath') or event.get('path') or ''
+    stage = event.get('requestContext', {}).get('stage')
+    prefix = f"/{stage}"
+    if stage and stage != '$default' and (path == prefix or path.startswith(prefix + '/')):
+        return path[len(prefix):] or '/'
+    return path
+
+def get_header(event, name):
+    """Case-insensitive header lookup."""
+    headers = event.get('headers') or {}
+    lowered = name.lower()
+    for key, value in headers.items():
+        if key.lower() == lowered:
+            return value
+    return None
+
+def text(status_code, body):
+    """Build an API Gateway response with a plain-text body."""
+    return {'statusCode': status_code, 'body': body}
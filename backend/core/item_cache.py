@@ -0,0 +1,154 @@
+"""
+Shared cache of product images in S3, keyed by a hash of the item URL.
+
+POST /try-on/prefetch fills it while the user is still choosing: the shop's
+image is downloaded once, checked to be an image of at most MAX_SOURCE_BYTES,
+bounded to MODEL_VARIANT as JPEG and stored at item-cache/<sha256 of the
+URL>.jpg. The generator reads that copy (read_cached) instead of downloading
+from the shop. The bucket expires the prefix after a day, so the cache holds
+at most a day of prefetches.
+
+Downloads connect to the address the host was checked at, not to whatever
+it resolves to next, and follow redirects only after checking every hop
+the same way, so neither DNS rebinding nor a redirect reaches a private
+address.
+"""
+import hashlib
+import http.client
+import ipaddress
+import socket
+import urllib.parse
+
+from botocore.exceptions import ClientError
+
+CACHE_PREFIX = 'item-cache/'
+
+# Larger downloads are refused rather than buffered
+MAX_SOURCE_BYTES = 15 * 2**20
+
+DOWNLOAD_TIMEOUT_SECONDS = 10
+
+MAX_REDIRECTS = 3
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+# Same bound and quality as a selfie's model-ready copy
+MODEL_VARIANT = {'model': (1024, 88)}
+
+# Cached copies are replaced only by expiry
+CACHE_CONTROL = 'public, max-age=86400'
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+def cache_key(item_url):
+    return f"{CACHE_PREFIX}{hashlib.sha256(item_url.encode('utf-8')).hexdigest()}.jpg"
+
+def default_port(parsed):
+    return parsed.port or (443 if parsed.scheme == 'https' else 80)
+
+def validate_url(url):
+    """
+    Raise ValueError unless `url` is http(s) on a host that resolves only to
+    public addresses, so a prefetch cannot reach into our own network.
+    Returns one of those addresses to connect to.
+    """
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise ValueError('Item URL must be http(s)')
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(parsed.hostname, default_port(parsed))}
+    except socket.gaierror:
+        raise ValueError('Item host does not resolve')
+    if not all(ipaddress.ip_address(address.split('%')[0]).is_global for address in addresses):
+        raise ValueError('Item host is not public')
+    return sorted(addresses)[0]
+
+class _Pinned:
+    """Connects to a given address while speaking to (Host, SNI, certificate) the URL's host."""
+    def __init__(self, host, address, **kwargs):
+        super().__init__(host, **kwargs)
+        self.address = address
+
+    def _connect_socket(self):
+        return socket.create_connection((self.address, self.port), self.timeout)
+
+class PinnedHTTPConnection(_Pinned, http.client.HTTPConnection):
+    def connect(self):
+        self.sock = self._connect_socket()
+
+class PinnedHTTPSConnection(_Pinned, http.client.HTTPSConnection):
+    def connect(self):
+        self.sock = self._context.wrap_socket(self._connect_socket(), server_hostname=self.host)
+
+def _fetch(url, address):
+    """GET `url` from `address`; the response, redirects not followed."""
+    parsed = urllib.parse.urlparse(url)
+    connection_class = PinnedHTTPSConnection if parsed.scheme == 'https' else PinnedHTTPConnection
+    connection = connection_class(parsed.hostname, address, port=default_port(parsed), timeout=DOWNLOAD_TIMEOUT_SECONDS)
+    target = urllib.parse.quote(parsed.path) or '/'
+    if parsed.query:
+        target += '?' + parsed.query
+    connection.request('GET', target, headers={'User-Agent': USER_AGENT})
+    return connection.getresponse()
+
+def _read_image(response):
+    content_type = response.getheader('Content-Type', '')
+    if content_type and not content_type.startswith('image/'):
+        raise ValueError(f"Not an image: {content_type}")
+    body = response.read(MAX_SOURCE_BYTES + 1)
+    if len(body) > MAX_SOURCE_BYTES:
+        raise ValueError('Item image is too large')
+    return body
+
+def download(url):
+    """The image bytes at `url`; ValueError if it is too large, not an image or not public."""
+    for _ in range(MAX_REDIRECTS + 1):
+        response = _fetch(url, validate_url(url))
+        try:
+            if response.status not in REDIRECT_STATUSES:
+                if response.status != 200:
+                    raise ValueError(f"Item download failed: HTTP {response.status}")
+                return _read_image(response)
+            location = response.getheader('Location')
+        finally:
+            response.close()
+        if not location:
+            raise ValueError('Item URL redirects nowhere')
+        url = urllib.parse.urljoin(url, location)
+    raise ValueError('Item URL redirects too often')
+
+def _missing(error):
+    return error.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound')
+
+def is_cached(s3, bucket_name, key):
+    try:
+        s3.head_object(Bucket=bucket_name, Key=key)
+    except ClientError as e:
+        if _missing(e):
+            return False
+        raise e
+    return True
+
+def store(s3, bucket_name, item_url, source):
+    """Bound `source` to the model variant and cache it; returns the stored size."""
+    from core.renditions import render
+
+    body = render(source, 'JPEG', MODEL_VARIANT)['model']
+    s3.put_object(
+        Bucket=bucket_name,
+        Key=cache_key(item_url),
+        Body=body,
+        ContentType='image/jpeg',
+        CacheControl=CACHE_CONTROL,
+        Metadata={'source-sha256': hashlib.sha256(source).hexdigest()}
+    )
+    return len(body)
+
+def read_cached(s3, bucket_name, item_url):
+    """The cached copy of the item, or None on a miss."""
+    try:
+        return s3.get_object(Bucket=bucket_name, Key=cache_key(item_url))['Body'].read()
+    except ClientError as e:
+        if _missing(e):
+            return None
+        raise e
@@ -0,0 +1,145 @@
+"""
+Access to the TryOnJobs table: writes shared by the dispatcher, the scheduler
+and the saver, and the status read.
+"""
+import copy
+import datetime
+import threading
+from collections import OrderedDict
+
+from botocore.exceptions import ClientError
+
+from core.singleflight import SingleFlight
+
+# A job record never changes once it reaches one of these
+TERMINAL_STATUSES = ('COMPLETED', 'FAILED')
+
+# Clients poll every few seconds; parallel polls for one job share a read
+JOB_TTL_SECONDS = 1.0
+
+# Finished jobs kept in process, least recently polled dropped first
+TERMINAL_CACHE_SIZE = 1024
+
+_job_reads = SingleFlight(ttl=JOB_TTL_SECONDS)
+_terminal_jobs = OrderedDict()
+_terminal_lock = threading.Lock()
+
+def is_terminal(item):
+    return bool(item) and item.get('status') in TERMINAL_STATUSES
+
+def _cached_terminal(key):
+    with _terminal_lock:
+        item = _terminal_jobs.get(key)
+        if item is not None:
+            _terminal_jobs.move_to_end(key)
+        return item
+
+def _remember_terminal(key, item):
+    with _terminal_lock:
+        _terminal_jobs[key] = item
+        while len(_terminal_jobs) > TERMINAL_CACHE_SIZE:
+            _terminal_jobs.popitem(last=False)
+
+def _read_ttl(item):
+    # A miss may be a record being written right now; never serve it again
+    return JOB_TTL_SECONDS if item else 0
+
+def get_job(job_table, job_id):
+    """
+    The job record or None.
+
+    Finished jobs are served from memory without a read. Others are read
+    through the single-flight layer, shared with identical polls for
+    JOB_TTL_SECONDS; a missing record is only shared while in flight.
+    """
+    key = (getattr(job_table, 'name', job_table), job_id)
+    item = _cached_terminal(key)
+    if item is None:
+        item = _job_reads.do(key, lambda: job_table.get_item(Key={'jobId': job_id}).get('Item'), ttl=_read_ttl)
+        if is_terminal(item):
+            _remember_terminal(key, item)
+    return copy.deepcopy(item)
+
+def put_job_record(job_table, job_item):
+    """
+    Create the PROCESSING job record.
+
+    The put never overwrites an existing record: if the workflow already wrote
+    a terminal status for this job, that status wins.
+    """
+    try:
+        job_table.put_item(Item=job_item, ConditionExpression='attribute_not_exists(jobId)')
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise e
+
+def mark_job_failed(job_table, job_id, error_msg):
+    """
+    Move a PROCESSING job to FAILED. Returns False if it was no longer
+    PROCESSING (finished, or already failed by another path), so callers
+    refund only on the transition that actually happened.
+    """
+    try:
+        job_table.update_item(
+            Key={'jobId': job_id},
+            UpdateExpression="set #s = :s, #e = :e, #t = :t",
+            ConditionExpression="#s = :processing",
+            ExpressionAttributeNames={'#s': 'status', '#e': 'error', '#t': 'timestamp'},
+            ExpressionAttributeValues={
+                ':s': 'FAILED',
+                ':e': error_msg,
+                ':t': datetime.datetime.utcnow().isoformat(),
+                ':processing': 'PROCESSING'
+            }
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise e
+    return True
+
+
+def mark_job_completed(job_table, job_id, result_url, timestamp, renditions=None):
+    """Record the result, keeping the rest of the job record (userId, lane, creditCost, batchId, startedAt)."""
+    update = "set #s = :s, resultUrl = :r, #t = :t"
+    values = {':s': 'COMPLETED', ':r': result_url, ':t': timestamp}
+    if renditions:
+        update += ", renditions = :rn"
+        values[':rn'] = renditions
+    job_table.update_item(
+        Key={'jobId': job_id},
+        UpdateExpression=update,
+        ExpressionAttributeNames={'#s': 'status', '#t': 'timestamp'},
+        ExpressionAttributeValues=values
+    )
+
+def claim_job(job_table, job_id):
+    """
+    Record that the scheduler is starting a queued job.
+
+    Returns True when this call claimed it, False when it was already started
+    or has finished (a redelivered queue message), and None when there is no
+    record yet: the dispatcher's write may still be landing, or it failed and
+    the credit was refunded.
+    """
+    try:
+        job_table.update_item(
+            Key={'jobId': job_id},
+            UpdateExpression="set startedAt = :t",
+            ConditionExpression="attribute_exists(jobId) AND attribute_not_exists(startedAt) AND #s = :processing",
+            ExpressionAttributeNames={'#s': 'status'},
+            ExpressionAttributeValues={
+                ':t': datetime.datetime.utcnow().isoformat(),
+                ':processing': 'PROCESSING'
+            },
+            ReturnValuesOnConditionCheckFailure='ALL_OLD'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise e
+        return False if e.response.get('Item') else None
+    return True
+
+def release_job(job_table, job_id):
+    """Undo claim_job after the execution failed to start, so a retry can claim it."""
+    job_table.update_item(Key={'jobId': job_id}, UpdateExpression="remove startedAt")
@@ -0,0 +1,122 @@
+"""
+Structured JSON logging for the Lambda handlers.
+
+    log = get_logger('generator')
+
+    @log.handler
+    def handler(event, context):
+        log.info('Saved result', jobId=job_id, bytes=size)
+
+Each record is one JSON line on stdout, which Lambda ships to CloudWatch
+(and timestamps), with the level, logger, message, the invocation's request
+id and the given fields. Records are filtered before anything is formatted:
+
+- LOG_LEVEL (default INFO) drops lower levels.
+- LOG_SAMPLE_RATE_<LOGGER> (or LOG_SAMPLE_RATE, default 1) keeps INFO and
+  DEBUG records for that fraction of invocations; WARNING and ERROR are
+  always written. The decision is made once per invocation, so a sampled
+  request logs all of its records.
+
+Field values are bounded: long strings are truncated, long lists shortened,
+and fields whose names look sensitive (tokens, signatures, secrets) are
+redacted at any depth.
+"""
+import functools
+import json
+import os
+import random
+import re
+import sys
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+
+MAX_STRING_CHARS = 512
+MAX_LIST_ITEMS = 20
+MAX_DEPTH = 4
+
+# A bare 'sign' is matched whole (Prodamus' Sign header); inside a name it
+# would also catch design, assigned and the like
+SENSITIVE_FIELD = re.compile(r'token|secret|passw|authori|signature|^sign$|api_?key|cookie', re.IGNORECASE)
+REDACTED = '[redacted]'
+
+# The current invocation; module-level so worker threads share it
+_invocation = {'requestId': None, 'sampled': True}
+
+def _bounded(value, depth=0):
+    """A JSON-ready copy of `value` with size limits and redaction applied."""
+    if isinstance(value, str):
+        if len(value) > MAX_STRING_CHARS:
+            return f"{value[:MAX_STRING_CHARS]}...[{len(value) - MAX_STRING_CHARS} more chars]"
+        return value
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if depth >= MAX_DEPTH:
+        return '[nested]'
+    if isinstance(value, dict):
+        return {
+            str(k): REDACTED if SENSITIVE_FIELD.search(str(k)) else _bounded(v, depth + 1)
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple, set)):
+        items = [_bounded(v, depth + 1) for v in list(value)[:MAX_LIST_ITEMS]]
+        if len(value) > MAX_LIST_ITEMS:
+            items.append(f"[{len(value) - MAX_LIST_ITEMS} more items]")
+        return items
+    if isinstance(value, BaseException):
+        return _bounded(f"{type(value).__name__}: {value}")
+    return _bounded(str(value))
+
+def _env_level():
+    return LEVELS.get(os.environ.get('LOG_LEVEL', 'INFO').upper(), LEVELS['INFO'])
+
+class Logger:
+    def __init__(self, name):
+        self.name = name
+        self.level = _env_level()
+
+    def sample_rate(self):
+        key = f"LOG_SAMPLE_RATE_{self.name.upper()}"
+        return float(os.environ.get(key, os.environ.get('LOG_SAMPLE_RATE', '1')))
+
+    def start_invocation(self, context):
+        """Correlate records with the Lambda request id and roll the sampling dice."""
+        _invocation['requestId'] = getattr(context, 'aws_request_id', None)
+        _invocation['sampled'] = random.random() < self.sample_rate()
+
+    def handler(self, fn):
+        """Decorator for a Lambda handler that starts each invocation."""
+        @functools.wraps(fn)
+        def wrapped(event, context):
+            self.start_invocation(context)
+            return fn(event, context)
+        return wrapped
+
+    def enabled(self, level):
+        number = LEVELS[level]
+        if number < self.level:
+            return False
+        return number >= LEVELS['WARNING'] or _invocation['sampled']
+
+    def log(self, level, message, **fields):
+        if not self.enabled(level):
+            return
+        record = {'level': level, 'logger': self.name, 'message': message}
+        if _invocation['requestId']:
+            record['requestId'] = _invocation['requestId']
+        record.update(_bounded(fields))
+        sys.stdout.write(json.dumps(record) + '\n')
+
+    def debug(self, message, **fields):
+        self.log('DEBUG', message, **fields)
+
+    def info(self, message, **fields):
+        self.log('INFO', message, **fields)
+
+    def warning(self, message, **fields):
+        self.log('WARNING', message, **fields)
+
+    def error(self, message, **fields):
+        self.log('ERROR', message, **fields)
+
+def get_logger(name):
+    return Logger(name)
@@ -0,0 +1,46 @@
+"""
+Crediting verified Prodamus payments.
+
+The webhook verifies a notification, then either credits it before
+answering or, when PAYMENT_QUEUE_URL is set, queues it for
+PaymentConsumerFunction and answers at once (enqueue_payment). Both paths
+end in credit_payment, which is idempotent per payment id (see
+core.profiles.add_purchased_credits), so a redelivered webhook or a retried
+message credits a payment only once.
+"""
+import json
+
+from core import storage
+from core.log import get_logger
+from core.pricing import credits_for_payment
+from core.prodamus import payment_sku
+from core.profiles import add_purchased_credits
+
+log = get_logger('payments')
+
+# Outcomes of credit_payment, also the webhook's plain-text answers
+CREDITED = 'Success'
+ALREADY_PROCESSED = 'Already processed'
+NO_CREDITS = 'No credits to add'
+
+def payment_id(data):
+    return data.get('payment_id') or data.get('order_id')
+
+def credit_payment(user_table, data):
+    """Credit a verified successful payment to data['customer_extra']; returns the outcome."""
+    user_id = data['customer_extra']
+    amount = float(data.get('sum', 0))
+    credits_to_add = credits_for_payment(payment_sku(data), amount)
+    if credits_to_add <= 0:
+        log.warning('Credits to add is 0', amount=data.get('sum'), paymentId=payment_id(data))
+        return NO_CREDITS
+
+    log.info('Adding credits', userId=user_id, credits=credits_to_add, amount=amount)
+    if not add_purchased_credits(user_table, user_id, credits_to_add, payment_id(data)):
+        log.info('Payment already processed', paymentId=payment_id(data))
+        return ALREADY_PROCESSED
+    return CREDITED
+
+def enqueue_payment(queue_url, data):
+    """Durably queue a verified payment for PaymentConsumerFunction."""
+    storage.get_sqs_client().send_message(QueueUrl=queue_url, MessageBody=json.dumps(data))
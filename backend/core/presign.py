@@ -0,0 +1,109 @@
+"""
+Presigned POST policies for browser uploads to S3.
+
+A POST policy lets S3 itself reject uploads that are too large or of the wrong
+type, which a presigned PUT cannot. Signing is local: boto3 signs the policy
+with the cached client's credentials, so issuing any number of uploads costs
+no AWS round trips.
+
+Extensions older than 2.11.15 ask POST /user/images/upload-url for
+{uploadUrl, s3Key, fileId} and PUT the file there; legacy_selfie_upload keeps
+issuing that, with only the content type enforced by the signature. Their
+size is checked afterwards, when the upload is confirmed (check_upload).
+"""
+import uuid
+
+from botocore.exceptions import ClientError
+
+# Types Pillow can decode for the selfie processor and Gemini accepts
+ALLOWED_CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/webp')
+
+MAX_SELFIE_BYTES = 10 * 1024 * 1024
+MAX_THUMBNAIL_BYTES = 512 * 1024
+
+# Most files in one batch request; a profile holds at most 5 selfies
+MAX_BATCH_FILES = 5
+
+URL_TTL_SECONDS = 300
+
+def upload_post(s3_client, bucket_name, key, content_type, max_bytes):
+    """URL and form fields for one constrained upload of `key`."""
+    post = s3_client.generate_presigned_post(
+        Bucket=bucket_name,
+        Key=key,
+        Fields={'Content-Type': content_type},
+        Conditions=[
+            {'Content-Type': content_type},
+            ['content-length-range', 1, max_bytes]
+        ],
+        ExpiresIn=URL_TTL_SECONDS
+    )
+    return {'url': post['url'], 'fields': post['fields'], 'maxBytes': max_bytes}
+
+def upload_put(s3_client, bucket_name, key, content_type):
+    """Presigned PUT URL for `key`; the signature pins the Content-Type."""
+    return s3_client.generate_presigned_url(
+        'put_object',
+        Params={'Bucket': bucket_name, 'Key': key, 'ContentType': content_type},
+        ExpiresIn=URL_TTL_SECONDS
+    )
+
+def selfie_keys(user_id, filename, content_type):
+    """
+    (fileId, s3 key, thumbnail s3 key) for a new selfie upload.
+
+    Raises ValueError for a missing filename or an unsupported content type.
+    """
+    if not filename:
+        raise ValueError('Missing filename')
+    if content_type not in ALLOWED_CONTENT_TYPES:
+        raise ValueError(f"Unsupported content type: {content_type}")
+    file_id = str(uuid.uuid4())
+    return file_id, f"uploads/{user_id}/{file_id}-{filename}", f"uploads/{user_id}/{file_id}-thumb-{filename}"
+
+def selfie_upload(s3_client, bucket_name, user_id, filename, content_type, include_thumbnail=False):
+    """
+    Issue the upload for one selfie (and optionally a client-made thumbnail).
+
+    Raises ValueError for a missing filename or an unsupported content type.
+    """
+    file_id, s3_key, thumb_s3_key = selfie_keys(user_id, filename, content_type)
+    result = {
+        'fileId': file_id,
+        's3Key': s3_key,
+        'upload': upload_post(s3_client, bucket_name, s3_key, content_type, MAX_SELFIE_BYTES)
+    }
+    if include_thumbnail:
+        result['thumbnailS3Key'] = thumb_s3_key
+        result['thumbnailUpload'] = upload_post(
+            s3_client, bucket_name, thumb_s3_key, content_type, MAX_THUMBNAIL_BYTES
+        )
+    return result
+
+def legacy_selfie_upload(s3_client, bucket_name, user_id, filename, content_type, include_thumbnail=False):
+    """selfie_upload in the presigned PUT shape older extensions expect."""
+    file_id, s3_key, thumb_s3_key = selfie_keys(user_id, filename, content_type)
+    result = {
+        'uploadUrl': upload_put(s3_client, bucket_name, s3_key, content_type),
+        's3Key': s3_key,
+        'fileId': file_id
+    }
+    if include_thumbnail:
+        result['thumbnailUploadUrl'] = upload_put(s3_client, bucket_name, thumb_s3_key, content_type)
+        result['thumbnailS3Key'] = thumb_s3_key
+    return result
+
+def check_upload(s3_client, bucket_name, key, max_bytes):
+    """
+    Make sure an uploaded object exists and is at most `max_bytes`; an
+    oversize one is deleted. Raises ValueError otherwise.
+    """
+    try:
+        size = s3_client.head_object(Bucket=bucket_name, Key=key)['ContentLength']
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            raise ValueError('Upload not found')
+        raise e
+    if size > max_bytes:
+        s3_client.delete_object(Bucket=bucket_name, Key=key)
+        raise ValueError(f"File too large: {size} bytes, at most {max_bytes} allowed")
@@ -0,0 +1,48 @@
+"""
+Credit prices and tariffs shared by payment link generation and the payment
+webhook.
+"""
+
+# 1 credit = PRICE_PER_CREDIT RUB
+PRICE_PER_CREDIT = 32
+
+# Tariffs offered on the site. `billed_credits` is what the customer pays for.
+TARIFFS = {
+    'On the go': {'sku': 'on_the_go', 'credits': 10, 'billed_credits': 10},
+    'Starter': {'sku': 'starter', 'credits': 25, 'billed_credits': 25},
+    # Discount for Standard: 60 credits for the price of 50
+    'Standard': {'sku': 'standard', 'credits': 60, 'billed_credits': 50},
+}
+
+CREDITS_BY_SKU = {tariff['sku']: tariff['credits'] for tariff in TARIFFS.values()}
+
+# Items one try-on can dress the selfie in (one Gemini call for all of them)
+MAX_OUTFIT_ITEMS = 3
+
+def try_on_cost(item_count):
+    """Credits charged for a try-on of `item_count` items: one per item."""
+    return item_count
+
+def price_per_credit(lang):
+    """Price of one credit in the currency of the payment page for `lang`."""
+    # Server-side validation: never trust a client-supplied price
+    if lang == 'ru':
+        return 32
+    return 0.4
+
+def tariff_price(tariff, lang):
+    return tariff['billed_credits'] * price_per_credit(lang)
+
+def credits_for_payment(sku, amount):
+    """Credits bought by a payment, by SKU or else by the RUB amount paid."""
+    if sku in CREDITS_BY_SKU:
+        return CREDITS_BY_SKU[sku]
+    # Fallback to amount-based calculation
+    # Check for specific discounted amounts (approximate)
+    if abs(amount - 1600) < 50: # Standard (1600 RUB)
+        return 60
+    if abs(amount - 800) < 25: # Starter (800 RUB)
+        return 25
+    if abs(amount - 320) < 10: # On the go (320 RUB)
+        return 10
+    return int(amount / PRICE_PER_CREDIT)
@@ -0,0 +1,63 @@
+"""
+Prodamus request signing, used both to sign payment links and to verify
+webhook notifications.
+"""
+import hashlib
+import hmac
+import json
+
+def _normalize(obj):
+    """Sort dict keys at every level and convert all values to strings."""
+    if isinstance(obj, dict):
+        return {k: _normalize(v) for k, v in sorted(obj.items())}
+    if isinstance(obj, list):
+        return [_normalize(x) for x in obj]
+    return str(obj)
+
+def signing_string(data):
+    """
+    The exact string Prodamus signs: recursively sorted data with string values,
+    serialized as compact JSON (non-ASCII kept) with every / escaped as \\/.
+    """
+    json_str = json.dumps(_normalize(data), separators=(',', ':'), ensure_ascii=False)
+    return json_str.replace('/', '\\/')
+
+def sign(data, secret_key):
+    """HMAC-SHA256 hex signature of `data`."""
+    return hmac.new(
+        secret_key.encode('utf-8'),
+        signing_string(data).encode('utf-8'),
+        hashlib.sha256
+    ).hexdigest()
+
+def verify(data, signature, secret_key):
+    return hmac.compare_digest(sign(data, secret_key), signature.lower())
+
+def parse_notification(event):
+    """
+    Parse a webhook body (JSON or form-encoded) into a flat dict.
+    Returns {} when the body is empty or unparseable.
+    """
+    import urllib.parse
+
+    headers = event.get('headers', {})
+    body_str = event.get('body', '')
+    content_type = headers.get('content-type', '') or headers.get('Content-Type', '')
+
+    if 'application/x-www-form-urlencoded' in content_type:
+        # parse_qs returns lists, we need single values
+        return {k: v[0] for k, v in urllib.parse.parse_qs(body_str).items()}
+    try:
+        # JSON, or unknown content type: try JSON
+        data = json.loads(body_str)
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+def payment_sku(data):
+    """SKU of the purchased product, from the top level or the first product."""
+    sku = data.get('sku') or data.get('item_code')
+    products = data.get('products')
+    if not sku and isinstance(products, list) and products and isinstance(products[0], dict):
+        sku = products[0].get('sku')
+    return sku
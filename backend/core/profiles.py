@@ -0,0 +1,246 @@
+"""
+Accessors for TryOnUserProfiles: projected reads, profile creation and
+credit charges.
+"""
+import copy
+import time
+
+from botocore.exceptions import ClientError
+
+from core import ratelimit
+from core.singleflight import SingleFlight
+
+# Eventually consistent reads may already be this stale, so identical ones
+# within the window share one GetItem across the container's requests
+PROFILE_TTL_SECONDS = 1.0
+
+_profile_reads = SingleFlight(ttl=PROFILE_TTL_SECONDS)
+
+# Profile attribute views. Each caller names the attributes it needs so reads
+# can use a ProjectionExpression instead of fetching the whole profile
+# (processed_payments, ...). userId is always included so an existing profile
+# never comes back as an empty item. Selfies live in their own table (see
+# core/selfies.py); 'images' is only read to find profiles still holding the
+# legacy list.
+PROFILE_CONTACT_VIEW = ('userId', 'email')
+PROFILE_SUMMARY_VIEW = ('userId', 'credits', 'images', 'email', 'name', 'picture')
+
+class ProfileReader:
+    """
+    Request-scoped accessor for TryOnUserProfiles reads.
+
+    Create one per invocation. Every read is projected to the requested view
+    and is eventually consistent unless `consistent=True` is passed. Results are
+    memoized, so the same profile is read at most once per invocation unless a
+    later call needs attributes or consistency the memo does not have yet.
+    Identical reads from concurrent requests are coalesced (see
+    PROFILE_TTL_SECONDS); strongly consistent ones only while in flight.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self._memo = {}
+
+    def get(self, user_id, view, consistent=False):
+        """Return the profile projected to `view`, or None if it does not exist."""
+        wanted = set(view) | {'userId'}
+        cached = self._memo.get(user_id)
+        if cached and self._covers(cached, wanted, consistent):
+            return cached['item']
+
+        if cached and cached['attributes'] is not None:
+            wanted |= cached['attributes']
+        names = {f"#p{i}": attr for i, attr in enumerate(sorted(wanted))}
+        read = lambda: self.table.get_item(  # noqa: E731
+            Key={'userId': user_id},
+            ProjectionExpression=', '.join(names),
+            ExpressionAttributeNames=names,
+            ConsistentRead=consistent
+        ).get('Item')
+        key = (getattr(self.table, 'name', self.table), user_id, tuple(names.values()), consistent)
+        # Callers update the item they get; keep the shared one intact
+        item = copy.deepcopy(_profile_reads.do(key, read, ttl=0 if consistent else None))
+        self._memo[user_id] = {
+            'item': item,
+            # A missing profile is missing for every view
+            'attributes': wanted if item else None,
+            'consistent': consistent
+        }
+        return item
+
+    def remember(self, user_id, item):
+        """Record a profile this invocation has just written in full."""
+        self._memo[user_id] = {'item': item, 'attributes': None, 'consistent': True}
+
+    def forget(self, user_id):
+        """Drop the memo after a write that changes the stored profile."""
+        self._memo.pop(user_id, None)
+
+    @staticmethod
+    def _covers(cached, wanted, consistent):
+        if consistent and not cached['consistent']:
+            return False
+        return cached['attributes'] is None or wanted <= cached['attributes']
+
+def new_profile_item(user_id, user_info):
+    """Build the initial profile for a first-time user from optional Google user info."""
+    item = {
+        'userId': user_id,
+        'credits': 5,
+        'imageCount': 0
+    }
+    if user_info:
+        for field in ('email', 'name', 'picture'):
+            if field in user_info:
+                item[field] = user_info[field]
+    return item
+
+def create_profile_if_absent(user_table, user_id, user_info):
+    """
+    Store a new profile with a single conditional put.
+
+    Returns the stored item, or None when a concurrent request created the
+    profile first (the existing profile is left untouched).
+    """
+    item = new_profile_item(user_id, user_info)
+    try:
+        user_table.put_item(
+            Item=item,
+            ConditionExpression='attribute_not_exists(userId)'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return None
+        raise e
+    return item
+
+def has_credit(profile, cost=1):
+    """Missing `credits` counts as 5 (legacy users)."""
+    return profile.get('credits', 5) >= cost
+
+def _charge(user_table, user_id, job_id, cost, jobs, now, tat):
+    rate_condition, rate_action, rate_values = ratelimit.rate_clause(tat, now, jobs)
+    slot_condition, slot_action, slot_values = ratelimit.in_flight_clause(job_id)
+    response = user_table.update_item(
+        Key={'userId': user_id},
+        UpdateExpression=f"set credits = if_not_exists(credits, :start) - :dec, {rate_action} add {slot_action}",
+        # A try-on never costs more than the 5 a legacy profile starts with
+        ConditionExpression=(
+            "attribute_exists(userId) AND (credits >= :dec OR attribute_not_exists(credits))"
+            f" AND {slot_condition} AND {rate_condition}"
+        ),
+        ExpressionAttributeValues={
+            ':dec': cost,
+            ':start': 5, # If missing, start at 5 then minus the cost
+            **rate_values,
+            **slot_values
+        },
+        ReturnValues='ALL_NEW',
+        ReturnValuesOnConditionCheckFailure='ALL_OLD'
+    )
+    return response.get('Attributes', {})
+
+def charge_try_on_credit(user_table, user_id, job_id, cost=1, jobs=1):
+    """
+    Deduct `cost` credits from an existing profile and admit `jobs` jobs
+    holding one in-flight slot, `job_id` (a batch id for a batch), against
+    the user's limits (core.ratelimit) in a single conditional update.
+
+    Missing `credits` counts as 5 (legacy users). On
+    ConditionalCheckFailedException the old item (if any) is attached to the
+    error response, which tells "no profile", "no credits" (has_credit) and
+    a limit (ratelimit.rejection) apart. A wrong guess at the stored rateTat
+    is retried once with the stored value.
+    Returns the updated profile, whose payment history picks the job's lane
+    (see core.scheduling.lane_for).
+    """
+    now = time.time()
+    tat = ratelimit.known_tat(user_id)
+    for attempt in range(2):
+        try:
+            profile = _charge(user_table, user_id, job_id, cost, jobs, now, tat)
+        except ClientError as e:
+            old = e.response.get('Item')
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException' or not old:
+                raise e
+            ratelimit.remember(user_id, old.get('rateTat'))
+            if attempt or not has_credit(old, cost) or ratelimit.rejection(old, now, jobs):
+                raise e
+            tat = old.get('rateTat')
+            continue
+        ratelimit.remember(user_id, profile.get('rateTat'))
+        return profile
+
+def refund_credit(user_table, user_id, slot_id, cost=1):
+    """
+    Give back the credits taken by charge_try_on_credit and free the in-flight
+    slot `slot_id` (the job's id, or the batch's). Conditional on the slot
+    still being held, so whichever of the saver, the reclaimer
+    (core.slots) or a retry comes second refunds nothing. Returns whether
+    this call refunded.
+    """
+    try:
+        user_table.update_item(
+            Key={'userId': user_id},
+            UpdateExpression="set credits = credits + :inc delete inFlightJobs :job",
+            ConditionExpression="contains(inFlightJobs, :slot_id)",
+            ExpressionAttributeValues={':inc': cost, ':job': {slot_id}, ':slot_id': slot_id}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise e
+    return True
+
+def refund_batch_job(user_table, user_id, cost=1):
+    """
+    Give back the credits of one job of a batch; the batch keeps its slot.
+    Not idempotent by itself: call it only after the job's own conditional
+    PROCESSING -> FAILED transition (core.jobs.mark_job_failed) succeeded.
+    """
+    user_table.update_item(
+        Key={'userId': user_id},
+        UpdateExpression="set credits = credits + :inc",
+        ExpressionAttributeValues={':inc': cost}
+    )
+
+def add_purchased_credits(user_table, user_id, credits_to_add, payment_id):
+    """
+    Credit a payment to a profile (creating it if needed).
+
+    When `payment_id` is known the update is idempotent: the id is recorded in
+    processed_payments and a repeated delivery is rejected by the condition.
+    purchasedCredits keeps the lifetime total either way.
+    Returns False if the payment was already processed.
+    """
+    try:
+        if payment_id:
+            user_table.update_item(
+                Key={'userId': user_id},
+                UpdateExpression="set credits = if_not_exists(credits, :start) + :inc, purchasedCredits = if_not_exists(purchasedCredits, :zero) + :inc, processed_payments = list_append(if_not_exists(processed_payments, :empty_list), :new_pid_list)",
+                ConditionExpression="NOT contains(processed_payments, :pid)",
+                ExpressionAttributeValues={
+                    ':inc': credits_to_add,
+                    ':start': 5,
+                    ':zero': 0,
+                    ':empty_list': [],
+                    ':new_pid_list': [str(payment_id)],
+                    ':pid': str(payment_id)
+                }
+            )
+        else:
+            # Fallback without idempotency
+            user_table.update_item(
+                Key={'userId': user_id},
+                UpdateExpression="set credits = if_not_exists(credits, :start) + :inc, purchasedCredits = if_not_exists(purchasedCredits, :zero) + :inc",
+                ExpressionAttributeValues={
+                    ':inc': credits_to_add,
+                    ':start': 5,
+                    ':zero': 0
+                }
+            )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise e
+    return True
@@ -0,0 +1,177 @@
+"""
+Opt-in cProfile and tracemalloc capture for one Lambda invocation.
+
+    profiler = Profiler('generator')
+
+    @profiler.handler
+    def handler(event, context):
+        ...
+
+An invocation is profiled when
+- PROFILE_HANDLERS lists the function ('generator,profile', or '*'), or
+- the request carries an `X-Profile: 1` header and wins a roll against
+  PROFILE_HEADER_SAMPLE_RATE (default 0, so the header does nothing until a
+  deployment opts in).
+
+Otherwise the wrapper costs one environment lookup. A profiled invocation
+writes three artefacts named after the function and request id:
+<id>.prof (pstats, for snakeviz or flameprof), <id>.folded (collapsed
+stacks in microseconds, for flamegraph.pl or speedscope) and <id>.txt (top
+functions by cumulative time, peak traced memory and the top allocation
+sites). They go to s3://PROFILE_BUCKET/profiles/<function>/ when
+PROFILE_BUCKET is set, else to PROFILE_DIR (default /tmp/profiles). Writing
+them never fails the invocation.
+"""
+import cProfile
+import functools
+import io
+import marshal
+import os
+import pstats
+import random
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+
+from core import http, storage
+from core.log import get_logger
+
+log = get_logger('profiling')
+
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 10
+MAX_STACK_DEPTH = 64
+MIN_FOLDED_US = 1
+
+def _listed(name):
+    listed = {n.strip() for n in os.environ.get('PROFILE_HANDLERS', '').split(',')}
+    return name in listed or '*' in listed
+
+def _header_requested(event):
+    if not isinstance(event, dict) or http.get_header(event, 'X-Profile') != '1':
+        return False
+    return random.random() < float(os.environ.get('PROFILE_HEADER_SAMPLE_RATE', '0'))
+
+def _label(func):
+    filename, line, name = func
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+def folded_stacks(stats):
+    """
+    Collapsed stacks ("a;b;c <microseconds>" lines) approximated from a
+    pstats call graph: a function's time on each path is split across its
+    callers in proportion to the time each caller spent in it.
+    """
+    raw = stats.stats
+    children = defaultdict(list)
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            children[caller].append((func, edge[3]))
+    folded = Counter()
+
+    def walk(func, path, seen, cumulative):
+        own, total = raw[func][2], raw[func][3]
+        if total <= 0:
+            return
+        scale = cumulative / total
+        folded[';'.join(path)] += own * scale
+        if len(path) >= MAX_STACK_DEPTH:
+            return
+        for child, edge_time in children.get(func, ()):
+            if child not in seen and edge_time * scale * 1e6 >= MIN_FOLDED_US:
+                walk(child, path + [_label(child)], seen | {child}, edge_time * scale)
+
+    for func, (_, _, _, total, callers) in raw.items():
+        if not callers:
+            walk(func, [_label(func)], {func}, total)
+    lines = [f"{stack} {round(seconds * 1e6)}" for stack, seconds in folded.items()
+             if seconds * 1e6 >= MIN_FOLDED_US]
+    return '\n'.join(sorted(lines)) + '\n'
+
+def summary(stats, peak_bytes, snapshot):
+    out = io.StringIO()
+    out.write(f"peak traced memory: {peak_bytes / 2**20:.2f} MiB\n\ntop allocations:\n")
+    for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+        out.write(f"  {stat}\n")
+    out.write('\n')
+    stats.stream = out
+    stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+    return out.getvalue()
+
+class Capture:
+    """cProfile plus tracemalloc around one call."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.stats = None
+        self.peak_bytes = 0
+        self.snapshot = None
+
+    def run(self, fn, *args):
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        else:
+            tracemalloc.reset_peak()
+        self.profile.enable()
+        try:
+            return fn(*args)
+        finally:
+            self.profile.disable()
+            self.peak_bytes = tracemalloc.get_traced_memory()[1]
+            self.snapshot = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+            self.stats = pstats.Stats(self.profile)
+
+    def artefacts(self):
+        """{extension: bytes} for the .prof, .folded and .txt outputs."""
+        return {
+            'prof': marshal.dumps(self.stats.stats),
+            'folded': folded_stacks(self.stats).encode('utf-8'),
+            'txt': summary(self.stats, self.peak_bytes, self.snapshot).encode('utf-8'),
+        }
+
+def write_artefacts(function, invocation_id, artefacts):
+    """Store the artefacts in S3 or on local disk; returns where they went."""
+    bucket = os.environ.get('PROFILE_BUCKET')
+    if bucket:
+        prefix = f"profiles/{function}/{invocation_id}"
+        for ext, body in artefacts.items():
+            storage.get_s3_client().put_object(Bucket=bucket, Key=f"{prefix}.{ext}", Body=body)
+        return f"s3://{bucket}/{prefix}"
+    directory = os.path.join(os.environ.get('PROFILE_DIR', '/tmp/profiles'), function)
+    os.makedirs(directory, exist_ok=True)
+    for ext, body in artefacts.items():
+        with open(os.path.join(directory, f"{invocation_id}.{ext}"), 'wb') as f:
+            f.write(body)
+    return os.path.join(directory, invocation_id)
+
+class Profiler:
+    def __init__(self, name):
+        self.name = name
+
+    def enabled(self, event):
+        return _listed(self.name) or _header_requested(event)
+
+    def handler(self, fn):
+        """Decorator for a Lambda handler that profiles invocations that opt in."""
+        @functools.wraps(fn)
+        def wrapped(event, context):
+            if not self.enabled(event):
+                return fn(event, context)
+            capture = Capture()
+            try:
+                return capture.run(fn, event, context)
+            finally:
+                self.save(capture, context)
+        return wrapped
+
+    def save(self, capture, context):
+        invocation_id = getattr(context, 'aws_request_id', None) or str(int(time.time() * 1000))
+        try:
+            location = write_artefacts(self.name, invocation_id, capture.artefacts())
+            log.info('Profile written', function=self.name, location=location,
+                     peakBytes=capture.peak_bytes)
+        except Exception as e:
+            log.warning('Failed to write profile', function=self.name, error=e)
@@ -0,0 +1,204 @@
+"""
+Per-user admission limits for POST /try-on and POST /try-on/batch.
+
+Two limits are checked in the same conditional UpdateItem that charges the
+credit (core.profiles.charge_try_on_credit), so concurrent requests cannot
+slip past them:
+
+- Rate: at most TRY_ON_RATE_LIMIT jobs in any TRY_ON_RATE_WINDOW_SECONDS
+  window. The sliding window is kept as one number on the profile,
+  `rateTat`, the generic cell rate algorithm's theoretical arrival time:
+  each admitted job moves it one interval (window / limit) past
+  max(rateTat, now), and a request for n jobs is admitted while that
+  leaves rateTat at most one window ahead of now.
+- Concurrency: at most TRY_ON_MAX_IN_FLIGHT job ids in the profile's
+  `inFlightJobs` string set. The saver takes a job out when it records the
+  result or the failure (release_slot / core.profiles.refund_credit). A
+  batch holds one slot, under its batch id, until its last job finishes.
+
+rateTat only ever moves forward, so a warm container that has seen a user's
+rateTat can turn requests away from memory until it falls back within reach
+(local_rejection).
+
+POST /try-on/prefetch has a window of its own, PREFETCH on `prefetchTat`,
+taken with admit() in an update that charges nothing.
+"""
+import math
+import os
+import time
+from collections import OrderedDict, namedtuple
+
+from botocore.exceptions import ClientError
+
+from core import http
+
+# Seconds to suggest when every in-flight slot is taken; about one job's run
+IN_FLIGHT_RETRY_SECONDS = 15
+
+# Users whose rateTat a warm container remembers
+LOCAL_USERS = 1024
+
+Rejection = namedtuple('Rejection', ['code', 'retry_after'])
+
+class SlidingWindow:
+    """
+    A GCRA limit of `limit` jobs per `window` seconds kept in one profile
+    attribute, with both read from the environment on use.
+    """
+
+    def __init__(self, attribute, limit_variable, window_variable, default_limit, default_window):
+        self.attribute = attribute
+        self.limit_variable = limit_variable
+        self.window_variable = window_variable
+        self.default_limit = default_limit
+        self.default_window = default_window
+        self.known = OrderedDict()
+
+    def limit(self):
+        return int(os.environ.get(self.limit_variable, str(self.default_limit)))
+
+    def window(self):
+        return float(os.environ.get(self.window_variable, str(self.default_window)))
+
+    def interval(self):
+        """Seconds each admitted job moves the attribute forward."""
+        return self.window() / self.limit()
+
+    def headroom(self, jobs=1):
+        """How far ahead of now the attribute may be for a request for `jobs` jobs to be admitted."""
+        return self.window() - jobs * self.interval()
+
+    def clause(self, tat, now, jobs=1):
+        """
+        Condition, SET action and values admitting a request for `jobs` jobs
+        against `tat`, the caller's best guess at the stored value (None when
+        unknown).
+
+        An idle user (attribute absent or past) restarts from now; a busy one
+        advances from the stored value. A wrong guess fails the condition and
+        the caller retries with the stored value.
+        """
+        name = self.attribute
+        if tat is None or tat <= now:
+            return (
+                f"(attribute_not_exists({name}) OR {name} <= :now)",
+                f"{name} = :restart",
+                {':now': now, ':restart': now + jobs * self.interval()}
+            )
+        return (
+            f"{name} BETWEEN :now AND :latest",
+            f"{name} = {name} + :interval",
+            {':now': now, ':latest': now + self.headroom(jobs), ':interval': jobs * self.interval()}
+        )
+
+    def rejection(self, tat, now, jobs=1):
+        ahead = max(tat or now, now) - now
+        if ahead <= self.headroom(jobs):
+            return None
+        return Rejection('RATE_LIMITED', max(1, math.ceil(ahead - self.headroom(jobs))))
+
+    def remember(self, user_id, tat):
+        """Keep the latest value seen for a user, bounded to LOCAL_USERS."""
+        if tat is None:
+            return
+        self.known[user_id] = max(tat, self.known.get(user_id, tat))
+        self.known.move_to_end(user_id)
+        while len(self.known) > LOCAL_USERS:
+            self.known.popitem(last=False)
+
+    def local_rejection(self, user_id, now=None, jobs=1):
+        """A rejection decided from memory alone, or None if DynamoDB must decide."""
+        now = time.time() if now is None else now
+        return self.rejection(self.known.get(user_id), now, jobs)
+
+TRY_ON = SlidingWindow('rateTat', 'TRY_ON_RATE_LIMIT', 'TRY_ON_RATE_WINDOW_SECONDS', 10, 60)
+
+PREFETCH = SlidingWindow('prefetchTat', 'PREFETCH_RATE_LIMIT', 'PREFETCH_RATE_WINDOW_SECONDS', 30, 60)
+
+_known_tat = TRY_ON.known
+
+def rate_limit():
+    return TRY_ON.limit()
+
+def max_in_flight():
+    return int(os.environ.get('TRY_ON_MAX_IN_FLIGHT', '3'))
+
+def rate_clause(tat, now, jobs=1):
+    return TRY_ON.clause(tat, now, jobs)
+
+def in_flight_clause(job_id):
+    """Condition, ADD action and values taking an in-flight slot for `job_id`."""
+    return (
+        "(attribute_not_exists(inFlightJobs) OR size(inFlightJobs) < :max_in_flight)",
+        "inFlightJobs :job",
+        {':max_in_flight': max_in_flight(), ':job': {job_id}}
+    )
+
+def rejection(profile, now=None, jobs=1):
+    """The limit a stored profile turns a new request for `jobs` jobs away on, or None."""
+    now = time.time() if now is None else now
+    if len(profile.get('inFlightJobs') or []) >= max_in_flight():
+        return Rejection('TOO_MANY_IN_FLIGHT', IN_FLIGHT_RETRY_SECONDS)
+    return TRY_ON.rejection(profile.get('rateTat'), now, jobs)
+
+def too_many_requests(rejection):
+    """429 response for a Rejection, with Retry-After."""
+    return http.response(429, {
+        'error': 'Too many try-on requests',
+        'code': rejection.code,
+        'retryAfter': rejection.retry_after
+    }, headers={'Retry-After': str(rejection.retry_after)})
+
+def known_tat(user_id):
+    return TRY_ON.known.get(user_id)
+
+def remember(user_id, tat):
+    TRY_ON.remember(user_id, tat)
+
+def local_rejection(user_id, now=None, jobs=1):
+    return TRY_ON.local_rejection(user_id, now, jobs)
+
+def admit(window, user_table, user_id, now=None):
+    """
+    Admit one request against `window` on an existing profile with a
+    conditional update. Returns None when admitted, else the Rejection.
+    ConditionalCheckFailedException without an item (no profile) is raised.
+    """
+    now = time.time() if now is None else now
+    tat = window.known.get(user_id)
+    for attempt in range(2):
+        condition, action, values = window.clause(tat, now)
+        try:
+            response = user_table.update_item(
+                Key={'userId': user_id},
+                UpdateExpression=f"set {action}",
+                ConditionExpression=f"attribute_exists(userId) AND {condition}",
+                ExpressionAttributeValues=values,
+                ReturnValues='UPDATED_NEW',
+                ReturnValuesOnConditionCheckFailure='ALL_OLD'
+            )
+        except ClientError as e:
+            old = e.response.get('Item')
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException' or not old:
+                raise e
+            tat = old.get(window.attribute)
+            window.remember(user_id, tat)
+            limited = window.rejection(tat, now)
+            if limited or attempt:
+                return limited or Rejection('RATE_LIMITED', 1)
+            continue
+        window.remember(user_id, response.get('Attributes', {}).get(window.attribute))
+        return None
+
+def release_slot(user_table, user_id, job_id):
+    """Free a finished job's in-flight slot. Repeats and unknown jobs are no-ops."""
+    try:
+        user_table.update_item(
+            Key={'userId': user_id},
+            UpdateExpression="delete inFlightJobs :job",
+            ConditionExpression="attribute_exists(userId)",
+            ExpressionAttributeValues={':job': {job_id}}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise e
@@ -0,0 +1,66 @@
+"""
+Compressed renditions of a generated try-on result.
+
+The generator stores the lossless PNG Gemini returns, which is several MB.
+render() re-encodes it into a compressed full-size 'primary' image for the
+overlay and a small 'thumb' for history lists; the selfie processor uses it
+with its own variants. Pillow is imported lazily and is only shipped with the
+functions that encode; without it, or without an encoder for any requested
+format, there are no renditions and clients keep using the original.
+"""
+import io
+
+# name -> (longest side in pixels, None for full size; encoder quality)
+RENDITIONS = {
+    'primary': (None, 80),
+    'thumb': (256, 70),
+}
+
+# Pillow format -> (file extension, content type, Pillow feature name)
+FORMATS = {
+    'AVIF': ('avif', 'image/avif', 'avif'),
+    'WEBP': ('webp', 'image/webp', 'webp'),
+    'JPEG': ('jpg', 'image/jpeg', 'jpg'),
+}
+
+# Rendition keys are unique per job, so the objects never change
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+def pick_format(preferred):
+    """First format in `preferred` this Pillow build can encode, or None."""
+    try:
+        from PIL import features
+    except ImportError:
+        return None
+    for fmt in preferred:
+        if fmt in FORMATS and features.check(FORMATS[fmt][2]):
+            return fmt
+    return None
+
+def encode(image, fmt, max_side, quality):
+    if max_side and max(image.size) > max_side:
+        image = image.copy()
+        image.thumbnail((max_side, max_side))
+    if fmt == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    out = io.BytesIO()
+    image.save(out, fmt, quality=quality)
+    return out.getvalue()
+
+def render(source_bytes, fmt, renditions=RENDITIONS):
+    """Map of rendition name -> encoded bytes of `source_bytes` in `fmt`."""
+    from PIL import Image, ImageOps
+
+    # Phone photos are often stored sideways with an EXIF rotation
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(source_bytes)))
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    return {
+        name: encode(image, fmt, max_side, quality)
+        for name, (max_side, quality) in renditions.items()
+    }
+
+def rendition_key(source_key, name, fmt):
+    """results/u/job.png -> results/u/job.thumb.webp"""
+    base = source_key.rsplit('.', 1)[0]
+    return f"{base}.{name}.{FORMATS[fmt][0]}"
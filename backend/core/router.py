@@ -0,0 +1,48 @@
+"""
+Declarative request routing for API Gateway handlers.
+
+Routes are registered with a method and a path template such as
+'/user/images/{fileId}'. Templates are compiled when the handler module is
+imported: literal paths go into a dict keyed by (method, path), templated ones
+into per-method lists of regexes. Matching a request is one dict lookup, plus
+a few regex matches for paths with parameters.
+"""
+import re
+
+_PARAM = re.compile(r'\{(\w+)\}')
+
+def compile_template(template):
+    """Regex for a path template; each {name} matches one path segment."""
+    parts = _PARAM.split(template)
+    pattern = ''.join(
+        re.escape(part) if n % 2 == 0 else f"(?P<{part}>[^/]+)"
+        for n, part in enumerate(parts)
+    )
+    return re.compile(pattern)
+
+class Router:
+    def __init__(self):
+        self.static = {}
+        self.dynamic = {}
+
+    def route(self, method, template):
+        """Decorator registering `fn(event, user_id, **params)` for a route."""
+        def register(fn):
+            if _PARAM.search(template):
+                self.dynamic.setdefault(method, []).append((compile_template(template), fn))
+            else:
+                self.static[(method, template)] = fn
+            return fn
+        return register
+
+    def match(self, method, path):
+        """(route function, path parameters) for a request, or (None, {})."""
+        path = (path or '').rstrip('/')
+        fn = self.static.get((method, path))
+        if fn:
+            return fn, {}
+        for pattern, fn in self.dynamic.get(method, ()):
+            match = pattern.fullmatch(path)
+            if match:
+                return fn, match.groupdict()
+        return None, {}
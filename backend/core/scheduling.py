@@ -0,0 +1,177 @@
+"""
+Priority lanes for try-on jobs and the weighted fair order they start in.
+
+The dispatcher puts each job on the SQS queue of its lane; SchedulerFunction
+starts queued jobs while fewer than MAX_RUNNING_JOBS executions run, picking
+lanes with WeightedFairScheduler. A profile with any payment history is in
+the 'paid' lane, everyone else in 'free'.
+
+While an execution slot is free the dispatcher skips the lane and starts
+the execution itself (start_now), so an idle system answers with the
+execution already running. Dispatches racing for the last free slots can
+briefly run a few more than MAX_RUNNING_JOBS.
+
+Weights come from LANE_WEIGHTS ('paid=3,free=1' by default): while both
+lanes have work, every run of 4 starts gives 3 to paid and 1 to free, so
+paid jobs overtake the free backlog but a free job is never passed over more
+than 3 times in a row.
+"""
+import json
+import os
+
+from core import storage
+from core.jobs import mark_job_failed, put_job_record, release_job
+from core.log import get_logger
+
+log = get_logger('scheduling')
+
+LANES = ('paid', 'free')
+DEFAULT_WEIGHTS = 'paid=3,free=1'
+
+def lane_for(profile):
+    """'paid' when the profile records a purchase, else 'free'."""
+    profile = profile or {}
+    return 'paid' if profile.get('processed_payments') or profile.get('purchasedCredits') else 'free'
+
+def lane_weights():
+    weights = dict(part.split('=') for part in os.environ.get('LANE_WEIGHTS', DEFAULT_WEIGHTS).split(','))
+    return {lane: max(1, int(weights.get(lane, 1))) for lane in LANES}
+
+def queue_url(lane):
+    return os.environ[f"{lane.upper()}_QUEUE_URL"]
+
+class WeightedFairScheduler:
+    """
+    Smooth weighted round robin over the lanes that have work.
+
+    Each pick adds every ready lane's weight to its credit, takes the lane
+    with the most credit and charges it the ready lanes' total weight. Over
+    any sum(weights) consecutive picks with all lanes ready, each lane gets
+    exactly its weight, interleaved rather than in bursts.
+    """
+
+    def __init__(self, weights):
+        self.weights = dict(weights)
+        self.credit = {lane: 0 for lane in self.weights}
+
+    def next(self, ready):
+        """The lane to start from next among `ready`, or None."""
+        ready = [lane for lane in self.weights if lane in ready]
+        if not ready:
+            return None
+        for lane in ready:
+            self.credit[lane] += self.weights[lane]
+        chosen = max(ready, key=lambda lane: self.credit[lane])
+        self.credit[chosen] -= sum(self.weights[lane] for lane in ready)
+        return chosen
+
+def free_slots(released=0):
+    """Executions that may start now under MAX_RUNNING_JOBS."""
+    limit = int(os.environ.get('MAX_RUNNING_JOBS', '10'))
+    response = storage.get_sfn_client().list_executions(
+        stateMachineArn=os.environ['STATE_MACHINE_ARN'],
+        statusFilter='RUNNING',
+        maxResults=limit
+    )
+    return max(0, limit - len(response.get('executions', [])) + released)
+
+def submit_enqueue(job_table, job_item, sfn_input, tracer):
+    """
+    Start writing the job record and queueing the job on its lane, side by
+    side on the I/O pool. Returns the two futures for settle_enqueue.
+    """
+    pool = storage.get_io_pool()
+    put_future = tracer.submit(pool, 'job_write', put_job_record, job_table, job_item)
+    send_future = tracer.submit(
+        pool, 'enqueue', storage.get_sqs_client().send_message,
+        QueueUrl=queue_url(job_item['lane']),
+        MessageBody=json.dumps(sfn_input)
+    )
+    return put_future, send_future
+
+def settle_enqueue(job_table, job_id, put_future, send_future):
+    """
+    Wait for submit_enqueue's calls. If either failed the error is re-raised
+    so the caller can refund:
+    - record written, send failed: the record is marked FAILED.
+    - message sent, record failed: the scheduler finds no record to claim
+      and drops the message.
+    """
+    put_error = put_future.exception()
+    send_error = send_future.exception()
+    if send_error:
+        if not put_error:
+            try:
+                mark_job_failed(job_table, job_id, f"Failed to queue: {send_error}")
+            except Exception as mark_error:
+                log.error('Failed to mark job as failed', jobId=job_id, error=mark_error)
+        raise send_error
+    if put_error:
+        raise put_error
+
+def enqueue_job(job_table, job_item, sfn_input, tracer):
+    """
+    Write the job record and queue the job on its lane concurrently.
+    SchedulerFunction starts the Step Functions execution once the job's turn
+    comes. Raises if the job could not be queued (see settle_enqueue).
+    """
+    settle_enqueue(job_table, job_item['jobId'], *submit_enqueue(job_table, job_item, sfn_input, tracer))
+
+def send_to_lane(job_table, job_item, sfn_input):
+    """Queue a job whose record is written; marks it FAILED and re-raises if that fails."""
+    try:
+        storage.get_sqs_client().send_message(QueueUrl=queue_url(job_item['lane']), MessageBody=json.dumps(sfn_input))
+    except Exception as e:
+        mark_job_failed(job_table, job_item['jobId'], f"Failed to queue: {e}")
+        raise e
+
+def start_now(job_table, job_item, sfn_input, tracer):
+    """
+    Write the job record as already started and start its execution side by
+    side on the I/O pool. Returns the executionArn, or None when the start
+    failed and the job went to its lane instead. If the record cannot be
+    written the execution is stopped and the error re-raised so the caller
+    can refund.
+    """
+    pool = storage.get_io_pool()
+    started = dict(job_item, startedAt=job_item['timestamp'])
+    put_future = tracer.submit(pool, 'job_write', put_job_record, job_table, started)
+    start_future = tracer.submit(
+        pool, 'start_execution', storage.get_sfn_client().start_execution,
+        stateMachineArn=os.environ['STATE_MACHINE_ARN'],
+        name=job_item['jobId'],
+        input=json.dumps(sfn_input)
+    )
+    put_error, start_error = put_future.exception(), start_future.exception()
+    if put_error:
+        if not start_error:
+            stop_execution(start_future.result()['executionArn'])
+        raise put_error
+    if start_error:
+        log.warning('Direct start failed, queueing the job', jobId=job_item['jobId'], error=start_error)
+        release_job(job_table, job_item['jobId'])
+        send_to_lane(job_table, job_item, sfn_input)
+        return None
+    return start_future.result()['executionArn']
+
+def stop_execution(execution_arn):
+    """Best effort: left running, the saver still records the job's outcome."""
+    try:
+        storage.get_sfn_client().stop_execution(executionArn=execution_arn, cause='Job record not written')
+    except Exception as e:
+        log.error('Failed to stop execution', executionArn=execution_arn, error=e)
+
+def kick_scheduler(released=0):
+    """
+    Ask SchedulerFunction to start queued jobs now rather than at its next
+    scheduled run. `released` counts executions that are about to finish
+    but still show as running. Best effort: the schedule catches up.
+    """
+    try:
+        storage.get_lambda_client().invoke(
+            FunctionName=os.environ['SCHEDULER_FUNCTION'],
+            InvocationType='Event',
+            Payload=json.dumps({'released': released}).encode('utf-8')
+        )
+    except Exception as e:
+        log.warning('Failed to kick scheduler', error=e)
@@ -0,0 +1,177 @@
+"""
+Accessors for TryOnUserSelfies, one item per selfie keyed by (userId, imageId).
+
+The profile keeps only an imageCount. Adding and deleting selfies updates it
+in the same transaction, and the add is conditional on the count, so the
+per-user limit holds under concurrent uploads.
+"""
+import datetime
+import os
+
+from botocore.exceptions import ClientError
+
+from core import storage
+from core.dynamo import serialize, serialize_item
+
+MAX_IMAGES = 5
+
+def selfie_table():
+    return storage.table(os.environ['USER_SELFIES_TABLE_NAME'])
+
+def to_api(item):
+    """Selfie item -> the image shape clients know ({'id', 'name', 's3Url', ...})."""
+    image = {k: v for k, v in item.items() if k not in ('userId', 'imageId')}
+    image['id'] = item['imageId']
+    return image
+
+def list_selfies(user_id):
+    """The user's selfies in upload order."""
+    response = selfie_table().query(
+        KeyConditionExpression='userId = :u',
+        ExpressionAttributeValues={':u': user_id},
+        ConsistentRead=True
+    )
+    items = sorted(response.get('Items', []), key=lambda i: i.get('createdAt', ''))
+    return [to_api(item) for item in items]
+
+def _get(user_id, image_id):
+    return selfie_table().get_item(Key={'userId': user_id, 'imageId': image_id}).get('Item')
+
+def get_selfie(user_id, image_id):
+    """
+    One selfie by id with a single GetItem, or None. A miss may be a
+    profile not migrated yet: that is done then and the read repeated.
+    """
+    item = _get(user_id, image_id) or (migrate_profile(user_id) and _get(user_id, image_id))
+    return to_api(item) if item else None
+
+def _count_update(user_id, delta, condition=None, values=None):
+    update = {
+        'TableName': os.environ['USER_TABLE_NAME'],
+        'Key': {'userId': serialize(user_id)},
+        'UpdateExpression': 'SET imageCount = if_not_exists(imageCount, :zero) + :delta',
+        'ExpressionAttributeValues': serialize_item(dict(values or {}, **{':zero': 0, ':delta': delta}))
+    }
+    if condition:
+        update['ConditionExpression'] = condition
+    return {'Update': update}
+
+def _selfie_item(user_id, image):
+    item = {k: v for k, v in image.items() if k != 'id'}
+    item.update(userId=user_id, imageId=image['id'])
+    item.setdefault('createdAt', datetime.datetime.utcnow().isoformat())
+    return item
+
+def _transact(items):
+    """Run a transaction; returns False if any condition failed."""
+    try:
+        storage.get_dynamodb_client().transact_write_items(TransactItems=items)
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'TransactionCanceledException':
+            return False
+        raise e
+    return True
+
+def _add(user_id, image):
+    # A legacy `images` list is not in imageCount yet, so it must be gone
+    return _transact([
+        _count_update(
+            user_id, 1,
+            condition='attribute_not_exists(images) AND (attribute_not_exists(imageCount) OR imageCount < :max)',
+            values={':max': MAX_IMAGES}
+        ),
+        {'Put': {
+            'TableName': os.environ['USER_SELFIES_TABLE_NAME'],
+            'Item': serialize_item(_selfie_item(user_id, image)),
+            'ConditionExpression': 'attribute_not_exists(imageId)'
+        }}
+    ])
+
+def add_selfie(user_id, image):
+    """
+    Store a new selfie and count it against the limit in one transaction.
+    A profile still holding a legacy `images` list is migrated first, so
+    those images count too.
+
+    Returns False if the user already has MAX_IMAGES selfies.
+    """
+    return _add(user_id, image) or (migrate_profile(user_id) and _add(user_id, image))
+
+def delete_selfies(user_id, images):
+    """
+    Delete selfies (as returned by get/list_selfies) and uncount them.
+
+    Returns False if one of them was already deleted; nothing changes then.
+    """
+    deletes = [
+        {'Delete': {
+            'TableName': os.environ['USER_SELFIES_TABLE_NAME'],
+            'Key': serialize_item({'userId': user_id, 'imageId': image['id']}),
+            'ConditionExpression': 'attribute_exists(imageId)'
+        }}
+        for image in images
+    ]
+    return _transact(deletes + [_count_update(user_id, -len(images))])
+
+def update_selfie(user_id, image_id, fields):
+    """
+    Set `fields` on an existing selfie.
+
+    Returns the previous values of the updated fields ({} if they were unset),
+    or None if the selfie does not exist.
+    """
+    names = {f"#f{n}": field for n, field in enumerate(fields)}
+    values = {f":f{n}": value for n, value in enumerate(fields.values())}
+    try:
+        response = selfie_table().update_item(
+            Key={'userId': user_id, 'imageId': image_id},
+            UpdateExpression='SET ' + ', '.join(f"{name} = :{name[1:]}" for name in names),
+            ConditionExpression='attribute_exists(imageId)',
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnValues='UPDATED_OLD'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return None
+        raise e
+    return response.get('Attributes', {})
+
+def migrate_legacy_images(user_id, images):
+    """
+    Move a profile's legacy `images` list into the selfies table.
+
+    The list is removed and counted in the same transaction, which is
+    conditional on the list still existing, so concurrent migrations of the
+    same profile cannot double count. Returns False if another one won.
+    """
+    # Spread createdAt by a microsecond per image to keep the list order
+    now = datetime.datetime.utcnow()
+    puts = [
+        {'Put': {
+            'TableName': os.environ['USER_SELFIES_TABLE_NAME'],
+            'Item': serialize_item(_selfie_item(user_id, dict(
+                image, createdAt=(now + datetime.timedelta(microseconds=n)).isoformat()
+            )))
+        }}
+        for n, image in enumerate(images)
+    ]
+    move = _count_update(user_id, len(images), condition='attribute_exists(images)')
+    move['Update']['UpdateExpression'] += ' REMOVE images'
+    return _transact(puts + [move])
+
+def migrate_profile(user_id):
+    """Migrate the profile's legacy `images` list if it still has one; returns whether it had."""
+    profile = storage.table(os.environ['USER_TABLE_NAME']).get_item(
+        Key={'userId': user_id}, ProjectionExpression='images', ConsistentRead=True
+    ).get('Item') or {}
+    if 'images' not in profile:
+        return False
+    migrate_legacy_images(user_id, profile['images'])
+    return True
+
+def profile_selfies(user_id, profile):
+    """list_selfies, first moving a legacy `images` list off the profile."""
+    if 'images' in profile:
+        migrate_legacy_images(user_id, profile['images'])
+    return list_selfies(user_id)
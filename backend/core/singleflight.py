@@ -0,0 +1,76 @@
+"""
+Coalescing of concurrent identical lookups within a warm container.
+
+SingleFlight.do(key, fn) runs fn once for all callers that ask for the same
+key while it is in flight; the others wait for and share its result. A
+successful result is also served for `ttl` seconds afterwards, which covers
+the bursts of identical requests the extension sends at popup open; `ttl` may
+be a function of the result, for results that say how long they hold.
+Failures are passed to the callers that were waiting and are never kept.
+"""
+import threading
+import time
+from concurrent.futures import Future
+
+class SingleFlight:
+    def __init__(self, ttl=0.0, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, fn, ttl=None):
+        """
+        Return fn(), or the result of an identical call in flight or within
+        the TTL: `ttl` seconds, or ttl(result) if it is callable.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            now = self.clock()
+            flight = self._flights.get(key)
+            if flight is None or self._expired(flight, now):
+                self._prune(now)
+                future = Future()
+                self._flights[key] = [future, None]
+                leader = True
+            else:
+                future = flight[0]
+                leader = False
+
+        if leader:
+            self._run(key, future, fn, ttl)
+        return future.result()
+
+    def clear(self):
+        with self._lock:
+            self._flights.clear()
+
+    def _run(self, key, future, fn, ttl):
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                if self._owns(key, future):
+                    del self._flights[key]
+            future.set_exception(e)
+            return
+        if callable(ttl):
+            ttl = ttl(result)
+        with self._lock:
+            if self._owns(key, future):
+                self._flights[key][1] = self.clock() + ttl
+        future.set_result(result)
+
+    def _owns(self, key, future):
+        flight = self._flights.get(key)
+        return flight is not None and flight[0] is future
+
+    @staticmethod
+    def _expired(flight, now):
+        expires_at = flight[1]
+        return expires_at is not None and now >= expires_at
+
+    def _prune(self, now):
+        """Drop kept results past their TTL; caller holds the lock."""
+        for key in [k for k, f in self._flights.items() if self._expired(f, now)]:
+            del self._flights[key]
@@ -0,0 +1,132 @@
+"""
+Reclaiming in-flight slots (core.ratelimit) that no saver will free.
+
+The saver frees a job's slot when it records the result or the failure. A
+job whose workflow never gets there (SaveResult out of retries, the
+execution timed out or was stopped, the lane message was lost) would hold
+its slot, and its credits, for good. So when every slot of a user is taken,
+charge_reclaiming looks at the jobs holding them and reclaims:
+
+- finished jobs: the slot is freed, and a failed job's credits refunded if
+  the saver did not manage to;
+- jobs still PROCESSING STALE_SLOT_SECONDS after they were started (twice
+  the state machine's timeout) or, if they never were, queued: the job is
+  marked FAILED, so the scheduler drops it if it is still queued, and its
+  credits refunded;
+- batches none of whose jobs is still live by the rules above.
+
+Slots whose job record is not written yet are left alone; their dispatch is
+still in progress. Every refund is conditional on the slot still being
+held, so a slot's credits come back at most once.
+"""
+import datetime
+
+from botocore.exceptions import ClientError
+
+from core import ratelimit
+from core.profiles import charge_try_on_credit, has_credit, refund_credit
+
+STALE_SLOT_SECONDS = 30 * 60
+
+STALE_ERROR = 'Timed out'
+
+def _conditional_failed(error):
+    return error.response['Error']['Code'] == 'ConditionalCheckFailedException'
+
+def age_seconds(record, now=None):
+    """Seconds since the job was started, or queued if it was not; 0 without a time."""
+    now = now or datetime.datetime.utcnow()
+    try:
+        since = datetime.datetime.fromisoformat(record.get('startedAt') or record['timestamp'])
+    except (KeyError, TypeError, ValueError):
+        return 0
+    return (now - since).total_seconds()
+
+def is_stale(record, now=None):
+    return record.get('status') == 'PROCESSING' and age_seconds(record, now) >= STALE_SLOT_SECONDS
+
+def fail_stale_job(job_table, record, error_msg=STALE_ERROR):
+    """
+    Mark a stale job FAILED, unless it finished or was started since it was
+    read (a record without startedAt must still be unstarted). Returns
+    whether it was marked.
+    """
+    started = record.get('startedAt')
+    values = {
+        ':s': 'FAILED',
+        ':e': error_msg,
+        ':t': datetime.datetime.utcnow().isoformat(),
+        ':processing': 'PROCESSING'
+    }
+    condition = "#s = :processing AND attribute_not_exists(startedAt)"
+    if started:
+        condition = "#s = :processing AND startedAt = :started"
+        values[':started'] = started
+    try:
+        job_table.update_item(
+            Key={'jobId': record['jobId']},
+            UpdateExpression="set #s = :s, #e = :e, #t = :t",
+            ConditionExpression=condition,
+            ExpressionAttributeNames={'#s': 'status', '#e': 'error', '#t': 'timestamp'},
+            ExpressionAttributeValues=values
+        )
+    except ClientError as e:
+        if _conditional_failed(e):
+            return False
+        raise e
+    return True
+
+def _cost(record):
+    return int(record.get('creditCost') or 1)
+
+def _get(job_table, job_id):
+    return job_table.get_item(Key={'jobId': job_id}, ConsistentRead=True).get('Item')
+
+def _reclaim_job(user_table, job_table, user_id, record, now):
+    if record.get('status') == 'COMPLETED':
+        ratelimit.release_slot(user_table, user_id, record['jobId'])
+        return True
+    if record.get('status') == 'PROCESSING':
+        if not is_stale(record, now) or not fail_stale_job(job_table, record):
+            return False
+    return refund_credit(user_table, user_id, record['jobId'], _cost(record))
+
+def _reclaim_batch(user_table, job_table, user_id, record, now):
+    """Free a batch's slot once none of its jobs is still live, refunding the stale ones."""
+    pending = [_get(job_table, job_id) for job_id in record.get('pendingJobs') or ()]
+    live = [job for job in pending if job and job.get('status') == 'PROCESSING']
+    if not all(is_stale(job, now) for job in live):
+        return False
+    refund = sum(_cost(job) for job in live if fail_stale_job(job_table, job))
+    return refund_credit(user_table, user_id, record['jobId'], refund)
+
+def reclaim_stale_slots(user_table, job_table, user_id, slot_ids, now=None):
+    """Reclaim what can be of `slot_ids` (job or batch ids); returns how many were freed."""
+    reclaimed = 0
+    for slot_id in slot_ids:
+        record = _get(job_table, slot_id)
+        if not record or record.get('userId', user_id) != user_id:
+            continue
+        reclaim = _reclaim_batch if record.get('kind') == 'batch' else _reclaim_job
+        reclaimed += bool(reclaim(user_table, job_table, user_id, record, now))
+    return reclaimed
+
+def _out_of_slots(error, cost):
+    old = error.response.get('Item')
+    if not _conditional_failed(error) or not old or not has_credit(old, cost):
+        return False
+    return len(old.get('inFlightJobs') or ()) >= ratelimit.max_in_flight()
+
+def charge_reclaiming(user_table, job_table, user_id, job_id, cost=1, jobs=1):
+    """
+    core.profiles.charge_try_on_credit, tried once more after reclaiming
+    stale slots when it failed only because every slot was taken.
+    """
+    try:
+        return charge_try_on_credit(user_table, user_id, job_id, cost, jobs=jobs)
+    except ClientError as e:
+        if not _out_of_slots(e, cost):
+            raise e
+        if not reclaim_stale_slots(user_table, job_table, user_id, e.response['Item']['inFlightJobs']):
+            raise e
+    return charge_try_on_credit(user_table, user_id, job_id, cost, jobs=jobs)
@@ -0,0 +1,73 @@
+"""
+Lazily constructed AWS clients and S3 URL helpers.
+
+Clients are created on first use and cached for warm invocations, so a
+handler only pays for the clients it actually calls. Tables are accessed
+through core.dynamo on the low-level DynamoDB client rather than
+boto3.resource. Tests replace the module attributes (dynamodb,
+dynamodb_client, sfn_client, s3_client, lambda_client, sqs_client, io_pool)
+directly.
+"""
+import threading
+
+import boto3
+
+from core import dynamo
+
+sfn_client = None
+dynamodb = None
+dynamodb_client = None
+s3_client = None
+lambda_client = None
+sqs_client = None
+
+# Worker threads for overlapping independent AWS calls
+io_pool = None
+
+# Reentrant: the table resource is built on the client
+_init_lock = threading.RLock()
+
+def _cached(name, factory):
+    value = globals()[name]
+    if value is None:
+        with _init_lock:
+            value = globals()[name]
+            if value is None:
+                value = factory()
+                globals()[name] = value
+    return value
+
+def get_sfn_client():
+    return _cached('sfn_client', lambda: boto3.client('stepfunctions'))
+
+def get_dynamodb():
+    return _cached('dynamodb', lambda: dynamo.Resource(get_dynamodb_client()))
+
+def get_dynamodb_client():
+    return _cached('dynamodb_client', lambda: boto3.client('dynamodb'))
+
+def get_s3_client():
+    return _cached('s3_client', lambda: boto3.client('s3'))
+
+def get_lambda_client():
+    return _cached('lambda_client', lambda: boto3.client('lambda'))
+
+def get_sqs_client():
+    return _cached('sqs_client', lambda: boto3.client('sqs'))
+
+def get_io_pool():
+    def create():
+        from concurrent.futures import ThreadPoolExecutor
+        return ThreadPoolExecutor(max_workers=4)
+    return _cached('io_pool', create)
+
+def table(name):
+    """Return the DynamoDB table resource for `name`."""
+    return get_dynamodb().Table(name)
+
+def s3_url(bucket_name, key):
+    return f"https://{bucket_name}.s3.amazonaws.com/{key}"
+
+def s3_key_from_url(url):
+    # resultUrl format: https://{bucket}.s3.amazonaws.com/{key}
+    return url.split('.amazonaws.com/')[-1]
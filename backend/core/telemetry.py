@@ -0,0 +1,181 @@
+"""
+Stage timings for the try-on pipeline, emitted as CloudWatch embedded metrics.
+
+    tracer = Tracer('dispatcher')
+
+    @tracer.handler
+    def handler(event, context):
+        with tracer.span('charge_credit'):
+            ...
+        tracer.annotate(jobId=job_id)
+        sfn_input['trace'] = tracer.context()
+
+Every span adds its duration in milliseconds to a metric named after the
+stage; a stage that runs more than once (a retried Gemini call) keeps all
+its values. When the handler returns, the invocation's metrics go out as one
+EMF record, with the Function as dimension and the trace id, annotations
+and the span list as properties, so CloudWatch builds the metrics and Logs
+Insights can follow one job across the functions.
+
+Spans belong to the invocation that started them: work left running on the
+I/O pool when a handler returns (tracer.submit) is timed, but a span that
+ends after the next invocation started is dropped rather than added to that
+invocation's record.
+
+The trace context travels through the Step Functions payload under 'trace';
+a handler whose event carries one continues that trace instead of starting
+a new one. Records go to the module-level `exporter`: stdout in Lambda, or
+a MemoryExporter in tests and benchmarks.
+"""
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'WebWardrobe/TryOn')
+
+class IExporter:
+    def export(self, record):
+        raise NotImplementedError
+
+class StdoutExporter(IExporter):
+    """One JSON line per record; Lambda ships it to CloudWatch Logs."""
+    def export(self, record):
+        sys.stdout.write(json.dumps(record) + '\n')
+
+class MemoryExporter(IExporter):
+    """Keeps records in a list, for tests and benchmarks."""
+    def __init__(self):
+        self.records = []
+
+    def export(self, record):
+        self.records.append(record)
+
+    def durations(self, stage):
+        """All values recorded for `stage` across the kept records."""
+        values = []
+        for record in self.records:
+            value = record.get(stage)
+            if value is not None:
+                values.extend(value if isinstance(value, list) else [value])
+        return values
+
+exporter = StdoutExporter()
+
+def _new_id():
+    return uuid.uuid4().hex
+
+class Span:
+    def __init__(self, tracer, stage, invocation=None):
+        self.tracer = tracer
+        self.stage = stage
+        self.invocation = invocation or tracer.invocation
+        self.span_id = _new_id()[:16]
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ms = (time.perf_counter() - self.start) * 1000.0
+        self.tracer.record(self.stage, duration_ms, self.span_id, failed=exc_type is not None,
+                           invocation=self.invocation)
+        return False
+
+class Tracer:
+    def __init__(self, function):
+        self.function = function
+        self._lock = threading.Lock()
+        self.start_invocation({})
+
+    def start_invocation(self, event):
+        """Continue the trace carried by `event`, or start a new one."""
+        trace = event.get('trace') if isinstance(event, dict) else None
+        trace = trace if isinstance(trace, dict) else {}
+        with self._lock:
+            self.trace_id = trace.get('traceId') or _new_id()
+            self.parent_id = trace.get('spanId')
+            self.span_id = _new_id()[:16]
+            # Identifies this invocation to the spans it starts
+            self.invocation = object()
+            self.annotations = {}
+            self.spans = []
+            self.metrics = {}
+
+    def span(self, stage):
+        return Span(self, stage)
+
+    def timed(self, stage, fn, *args, **kwargs):
+        """fn(*args, **kwargs) inside a span."""
+        with self.span(stage):
+            return fn(*args, **kwargs)
+
+    def submit(self, pool, stage, fn, *args, **kwargs):
+        """pool.submit of timed(stage, fn, ...), its span bound to the current invocation."""
+        invocation = self.invocation
+        def run():
+            with Span(self, stage, invocation):
+                return fn(*args, **kwargs)
+        return pool.submit(run)
+
+    def record(self, stage, duration_ms, span_id=None, failed=False, invocation=None):
+        duration_ms = round(duration_ms, 3)
+        span = {'name': stage, 'spanId': span_id, 'durationMs': duration_ms}
+        if failed:
+            span['error'] = True
+        with self._lock:
+            if invocation is not None and invocation is not self.invocation:
+                return
+            self.spans.append(span)
+            self.metrics.setdefault(stage, []).append(duration_ms)
+
+    def annotate(self, **properties):
+        with self._lock:
+            self.annotations.update(properties)
+
+    def context(self):
+        """Trace context to pass on in a Step Functions payload."""
+        return {'traceId': self.trace_id, 'spanId': self.span_id}
+
+    def emf_record(self):
+        with self._lock:
+            metrics = {stage: values[0] if len(values) == 1 else list(values)
+                       for stage, values in self.metrics.items()}
+            record = {
+                '_aws': {
+                    'Timestamp': int(time.time() * 1000),
+                    'CloudWatchMetrics': [{
+                        'Namespace': NAMESPACE,
+                        'Dimensions': [['Function']],
+                        'Metrics': [{'Name': stage, 'Unit': 'Milliseconds'} for stage in metrics],
+                    }],
+                },
+                'Function': self.function,
+                'traceId': self.trace_id,
+                'spanId': self.span_id,
+                'parentSpanId': self.parent_id,
+                'spans': list(self.spans),
+            }
+            record.update(self.annotations)
+        record.update(metrics)
+        return record
+
+    def flush(self):
+        if self.metrics:
+            exporter.export(self.emf_record())
+
+    def handler(self, fn):
+        """Decorator for a Lambda handler: one 'total' span and one record per invocation."""
+        @functools.wraps(fn)
+        def wrapped(event, context):
+            self.start_invocation(event)
+            try:
+                with self.span('total'):
+                    return fn(event, context)
+            finally:
+                self.flush()
+        return wrapped
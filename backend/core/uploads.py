@@ -0,0 +1,71 @@
+"""
+Streaming uploads to S3.
+
+upload_stream() accepts any iterable of byte chunks and holds at most one
+part in memory: small bodies go up with a single put_object, larger ones as a
+multipart upload that is aborted if the stream or any part fails.
+"""
+from core.log import get_logger
+
+log = get_logger('uploads')
+
+# S3 rejects smaller parts, except for the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+def upload_stream(s3_client, bucket, key, chunks, content_type, part_size=MIN_PART_SIZE):
+    """Upload the concatenation of `chunks` to s3://bucket/key and return its size."""
+    buffer = bytearray()
+    upload = None
+    size = 0
+    try:
+        for chunk in chunks:
+            buffer += chunk
+            size += len(chunk)
+            if len(buffer) >= part_size:
+                if upload is None:
+                    upload = MultipartUpload(s3_client, bucket, key, content_type)
+                # Hand the buffer over as is; copying it would double the peak
+                upload.add_part(buffer)
+                buffer = bytearray()
+        if upload is None:
+            s3_client.put_object(Bucket=bucket, Key=key, Body=buffer, ContentType=content_type)
+            return size
+        if buffer:
+            upload.add_part(buffer)
+        upload.complete()
+        return size
+    except Exception:
+        if upload is not None:
+            upload.abort()
+        raise
+
+class MultipartUpload:
+    def __init__(self, s3_client, bucket, key, content_type):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.parts = []
+        self.upload_id = s3_client.create_multipart_upload(
+            Bucket=bucket, Key=key, ContentType=content_type
+        )['UploadId']
+
+    def add_part(self, body):
+        number = len(self.parts) + 1
+        response = self.s3.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            PartNumber=number, Body=body
+        )
+        self.parts.append({'PartNumber': number, 'ETag': response['ETag']})
+
+    def complete(self):
+        self.s3.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            MultipartUpload={'Parts': self.parts}
+        )
+
+    def abort(self):
+        try:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        except Exception as e:
+            # The original failure matters more; a lifecycle rule can clean up
+            log.warning('Failed to abort multipart upload', uploadId=self.upload_id, error=e)
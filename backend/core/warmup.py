@@ -0,0 +1,135 @@
+"""
+Warm-up pings and init-phase preparation for the user-facing, latency-critical
+handlers: the dispatcher and status, which a schedule in template.yaml pings.
+Queue consumers and Step Functions tasks are not wrapped; nothing pings them.
+
+    warmup = Warmup('dispatcher', DYNAMODB, SQS, google_auth)
+
+    @warmup.handler
+    @profiler.handler
+    def handler(event, context):
+        ...
+
+The steps build what the handler's first request would otherwise build:
+AWS clients (loading their service models) with their endpoint host
+resolved, the I/O pool, the TLS context for Google token checks. They run
+- during the Lambda init phase, when the handler is decorated in a Lambda
+  runtime (AWS_LAMBDA_FUNCTION_NAME is set), and
+- on a warm-up event, {"warmup": {"concurrency": N}}, which returns right
+  after without reaching the handler (so pings are neither logged,
+  profiled nor traced as requests).
+
+A scheduled rule sends the warm-up event. With a concurrency of N the
+receiving container invokes its own function N - 1 more times at once, and
+each of those holds its container for HOLD_MS, so N containers are warm
+afterwards. Each step runs once per container; a failing step is logged and
+left for the first request to retry.
+"""
+import functools
+import json
+import os
+import socket
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from core import auth, storage
+from core.log import get_logger
+
+log = get_logger('warmup')
+
+# Upper bound on containers one ping may warm
+MAX_CONCURRENCY = 20
+
+# How long a fanned-out ping keeps its container busy, so its siblings
+# cannot land on it
+HOLD_MS = 150
+
+def _resolve(endpoint_url):
+    host = urllib.parse.urlparse(endpoint_url).hostname
+    if host:
+        socket.getaddrinfo(host, 443)
+
+def client_step(name, get_client):
+    """A step that builds a storage client and resolves its endpoint."""
+    def step():
+        _resolve(get_client().meta.endpoint_url)
+    step.__name__ = name
+    return step
+
+def _dynamodb():
+    storage.get_dynamodb()
+    return storage.get_dynamodb_client()
+
+DYNAMODB = client_step('dynamodb', _dynamodb)
+S3 = client_step('s3', storage.get_s3_client)
+SQS = client_step('sqs', storage.get_sqs_client)
+LAMBDA = client_step('lambda', storage.get_lambda_client)
+STEP_FUNCTIONS = client_step('stepfunctions', storage.get_sfn_client)
+
+def io_pool():
+    storage.get_io_pool()
+
+def google_auth():
+    auth.prewarm()
+
+def is_warmup(event):
+    return isinstance(event, dict) and isinstance(event.get('warmup'), dict)
+
+class Warmup:
+    def __init__(self, function, *steps):
+        self.function = function
+        self.steps = steps
+        self.pending = list(steps)
+        self.invoked = False
+
+    def prepare(self):
+        """Run the steps that have not succeeded yet; returns the ms spent."""
+        started = time.perf_counter()
+        for step in list(self.pending):
+            try:
+                step()
+                self.pending.remove(step)
+            except Exception as e:
+                log.warning('Warm-up step failed', function=self.function, step=step.__name__, error=e)
+        return round((time.perf_counter() - started) * 1000, 1)
+
+    def fan_out(self, function_name, count):
+        """Invoke `function_name` `count` times at once with a single-container ping."""
+        payload = json.dumps({'warmup': {'concurrency': 1, 'holdMs': HOLD_MS}}).encode('utf-8')
+        client = storage.get_lambda_client()
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            futures = [pool.submit(client.invoke, FunctionName=function_name, Payload=payload) for _ in range(count)]
+        failed = [future.exception() for future in futures if future.exception()]
+        if failed:
+            log.warning('Warm-up invocations failed', function=self.function, failed=len(failed), error=failed[0])
+        return count - len(failed)
+
+    def warm(self, ping, context):
+        """Answer a warm-up event."""
+        cold = not self.invoked
+        prepare_ms = self.prepare()
+        concurrency = min(max(int(ping.get('concurrency', 1)), 1), MAX_CONCURRENCY)
+        warmed = 1
+        if concurrency > 1:
+            function_name = getattr(context, 'function_name', None) or os.environ['AWS_LAMBDA_FUNCTION_NAME']
+            warmed += self.fan_out(function_name, concurrency - 1)
+        else:
+            time.sleep(min(int(ping.get('holdMs', 0)), HOLD_MS) / 1000)
+        log.info('Warm-up', function=self.function, cold=cold, prepareMs=prepare_ms, warmed=warmed)
+        return {'warm': True, 'cold': cold, 'prepareMs': prepare_ms, 'warmed': warmed}
+
+    def handler(self, fn):
+        """Decorator for a Lambda handler: prepares at init and answers warm-up events."""
+        if os.environ.get('AWS_LAMBDA_FUNCTION_NAME'):
+            self.prepare()
+
+        @functools.wraps(fn)
+        def wrapped(event, context):
+            try:
+                if is_warmup(event):
+                    return self.warm(event['warmup'], context)
+                return fn(event, context)
+            finally:
+                self.invoked = True
+        return wrapped
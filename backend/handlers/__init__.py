@@ -0,0 +1,6 @@
+"""
+Lambda entry points, one module per function in template.yaml.
+
+Each module exposes `handler(event, context)` and imports only the core
+modules it needs, so its deployment artifact and cold start stay small.
+"""
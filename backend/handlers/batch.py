@@ -0,0 +1,213 @@
+"""
+BatchFunction: POST /try-on/batch and GET /try-on/batch/{batchId}
+
+A batch tries several (selfie, item) pairs in one request: one token check,
+one conditional update charging every credit, then one queued job per pair.
+The jobs run like single try-ons, at the pace of the lane scheduler's
+bounded pool (core.scheduling), and report under the batch id.
+"""
+import datetime
+import os
+import uuid
+
+from botocore.exceptions import ClientError
+
+from core import http, ratelimit, storage
+from core.auth import get_user_id_from_token, get_user_info_from_token
+from core.batches import MAX_BATCH_PAIRS, batch_status, finish_batch_job, put_batch_record
+from core.jobs import get_job
+from core.log import get_logger
+from core.pricing import try_on_cost
+from core.profiles import create_profile_if_absent, has_credit, refund_batch_job, refund_credit
+from core.profiling import Profiler
+from core.router import Router
+from core.scheduling import kick_scheduler, lane_for, settle_enqueue, submit_enqueue
+from core.selfies import get_selfie
+from core.slots import charge_reclaiming
+from core.telemetry import Tracer
+
+log = get_logger('batch')
+profiler = Profiler('batch')
+tracer = Tracer('batch')
+
+router = Router()
+
+# Finished batches never change; see handlers/status.py
+TERMINAL_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+PENDING_CACHE_CONTROL = 'no-store'
+
+def max_pairs():
+    """A batch may not need more of the rate limit than a whole window holds."""
+    return min(MAX_BATCH_PAIRS, ratelimit.rate_limit())
+
+def pairs_from(body):
+    """The requested [{'selfieId', 'itemUrl'}] pairs, or None if they are not usable."""
+    pairs = body.get('pairs')
+    if not isinstance(pairs, list) or not 0 < len(pairs) <= max_pairs():
+        return None
+    for pair in pairs:
+        if not isinstance(pair, dict) or not pair.get('selfieId') or not pair.get('itemUrl'):
+            return None
+    return [{'selfieId': pair['selfieId'], 'itemUrl': pair['itemUrl']} for pair in pairs]
+
+def read_selfies(user_id, selfie_ids):
+    """Start one GetItem per distinct selfie; returns {selfieId: future}."""
+    pool = storage.get_io_pool()
+    return {sid: tracer.submit(pool, 'selfie_read', get_selfie, user_id, sid) for sid in sorted(set(selfie_ids))}
+
+def queue_jobs(job_table, jobs):
+    """Queue every (job_item, sfn_input) at once; returns the ids that could not be queued."""
+    submitted = [(item['jobId'], submit_enqueue(job_table, item, sfn_input, tracer)) for item, sfn_input in jobs]
+    failed = []
+    for job_id, futures in submitted:
+        try:
+            settle_enqueue(job_table, job_id, *futures)
+        except Exception as e:
+            log.error('Failed to queue batch job', jobId=job_id, error=e)
+            failed.append(job_id)
+    return failed
+
+def give_back(user_table, job_table, user_id, batch_id, job_ids):
+    """
+    Refund jobs that could not be queued and free the batch's slot if none
+    are left. They hold no slot of their own, and no other path refunds
+    them: they never reach a saver.
+    """
+    for job_id in job_ids:
+        refund_batch_job(user_table, user_id)
+        if finish_batch_job(job_table, batch_id, job_id):
+            ratelimit.release_slot(user_table, user_id, batch_id)
+
+@router.route('POST', '/try-on/batch')
+def create_batch(event, user_id):
+    """
+    Body: {"pairs": [{"selfieId", "itemUrl"}, ...], "siteUrl", "siteTitle"}.
+    Charges one credit per pair and admits the batch as len(pairs) jobs
+    holding one in-flight slot (core.ratelimit), then queues a job per pair.
+    """
+    body = http.json_body(event)
+    pairs = pairs_from(body)
+    if not pairs:
+        return http.error(400, f"Send 1-{max_pairs()} pairs of selfieId and itemUrl")
+
+    limited = ratelimit.local_rejection(user_id, jobs=len(pairs))
+    if limited:
+        return ratelimit.too_many_requests(limited)
+
+    user_table = storage.table(os.environ['USER_TABLE_NAME'])
+    job_table = storage.table(os.environ['TABLE_NAME'])
+    batch_id = str(uuid.uuid4())
+    cost = try_on_cost(1) * len(pairs)
+    tracer.annotate(batchId=batch_id, pairs=len(pairs))
+
+    selfie_futures = read_selfies(user_id, [pair['selfieId'] for pair in pairs])
+    try:
+        with tracer.span('charge_credit'):
+            profile = charge_reclaiming(user_table, job_table, user_id, batch_id, cost, jobs=len(pairs))
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise e
+        old = e.response.get('Item')
+        if old and not has_credit(old, cost):
+            return http.error(402, 'Insufficient credits', code='INSUFFICIENT_CREDITS')
+        if old:
+            return ratelimit.too_many_requests(
+                ratelimit.rejection(old, jobs=len(pairs)) or ratelimit.Rejection('RATE_LIMITED', 1))
+        create_profile_if_absent(user_table, user_id, get_user_info_from_token(event))
+        return http.error(404, 'Selfie not found')
+
+    try:
+        selfies = {sid: future.result() for sid, future in selfie_futures.items()}
+        missing = [sid for sid, selfie in selfies.items() if not selfie]
+        if missing:
+            refund_credit(user_table, user_id, batch_id, cost)
+            return http.error(404, 'Selfie not found', selfieIds=missing)
+
+        lane = lane_for(profile)
+        timestamp = datetime.datetime.utcnow().isoformat()
+        for pair in pairs:
+            pair['jobId'] = str(uuid.uuid4())
+        put_batch_record(job_table, batch_id, user_id, pairs)
+    except Exception:
+        refund_credit(user_table, user_id, batch_id, cost)
+        raise
+
+    jobs = []
+    for pair in pairs:
+        selfie = selfies[pair['selfieId']]
+        jobs.append(({
+            'jobId': pair['jobId'],
+            'status': 'PROCESSING',
+            'userId': user_id,
+            'lane': lane,
+            'creditCost': 1,
+            'batchId': batch_id,
+            'timestamp': timestamp
+        }, {
+            'jobId': pair['jobId'],
+            'userId': user_id,
+            'itemUrl': pair['itemUrl'],
+            'itemUrls': [pair['itemUrl']],
+            'creditCost': 1,
+            'selfieUrl': selfie.get('modelUrl') or selfie['s3Url'],
+            'selfieId': pair['selfieId'],
+            'siteUrl': body.get('siteUrl'),
+            'siteTitle': body.get('siteTitle'),
+            'batchId': batch_id,
+            'trace': tracer.context()
+        }))
+    failed = queue_jobs(job_table, jobs)
+    if failed:
+        give_back(user_table, job_table, user_id, batch_id, failed)
+    if len(failed) == len(pairs):
+        return http.error(500, 'Failed to queue batch', batchId=batch_id)
+    kick_scheduler()
+
+    return http.response(200, {
+        'batchId': batch_id,
+        'jobIds': [pair['jobId'] for pair in pairs],
+        'failedJobIds': failed,
+        'lane': lane,
+        'message': 'Batch queued'
+    })
+
+@router.route('GET', '/try-on/batch/{batchId}')
+def get_batch(event, user_id, batchId):
+    """Per-pair status of the user's batch; 404 for anyone else's."""
+    job_table = storage.table(os.environ['TABLE_NAME'])
+    batch = get_job(job_table, batchId)
+    if not batch or batch.get('kind') != 'batch' or batch.get('userId') != user_id:
+        return http.error(404, 'Batch not found')
+
+    jobs = list(storage.get_io_pool().map(lambda pair: get_job(job_table, pair['jobId']), batch['pairs']))
+    result = batch_status(batch, jobs)
+    cache_control = TERMINAL_CACHE_CONTROL if result['status'] == 'COMPLETED' else PENDING_CACHE_CONTROL
+    return http.response(200, result, {'Cache-Control': cache_control})
+
+@profiler.handler
+@log.handler
+@tracer.handler
+def handler(event, context):
+    """
+    Routes the batch endpoints (see create_batch and get_batch).
+
+    Returns 400 for unusable pairs, 401 without authentication, 402 when the
+    user cannot pay for every pair, 404 for unknown selfies or batches, 429
+    (with Retry-After) when the batch would pass the user's limits, 500 on
+    unexpected errors.
+    """
+    try:
+        route, params = router.match(http.get_method(event), http.get_path(event))
+        with tracer.span('token_validation'):
+            user_id = get_user_id_from_token(event)
+
+        if not user_id:
+            return http.error(401, 'Unauthorized')
+        if not route:
+            return http.error(404, 'Not found')
+
+        return route(event, user_id, **params)
+
+    except Exception as e:
+        log.error('Batch handler failed', error=e)
+        return http.error(500, str(e))
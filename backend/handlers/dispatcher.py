@@ -0,0 +1,197 @@
+"""
+DispatcherFunction: POST /try-on
+"""
+import datetime
+import os
+import uuid
+
+from botocore.exceptions import ClientError
+
+from core import http, ratelimit, storage
+from core.auth import get_user_id_from_token, get_user_info_from_token
+from core.log import get_logger
+from core.profiles import create_profile_if_absent, has_credit, refund_credit
+from core.pricing import MAX_OUTFIT_ITEMS, try_on_cost
+from core.profiling import Profiler
+from core.scheduling import enqueue_job, free_slots, kick_scheduler, lane_for, start_now
+from core.selfies import get_selfie
+from core.slots import charge_reclaiming
+from core.telemetry import Tracer
+from core.warmup import DYNAMODB, LAMBDA, SQS, STEP_FUNCTIONS, Warmup, google_auth, io_pool
+
+log = get_logger('dispatcher')
+profiler = Profiler('dispatcher')
+tracer = Tracer('dispatcher')
+warmup = Warmup('dispatcher', DYNAMODB, SQS, LAMBDA, STEP_FUNCTIONS, io_pool, google_auth)
+
+def slot_is_free():
+    """Whether an execution may start right away; False when unsure (the lane is the safe path)."""
+    if not os.environ.get('STATE_MACHINE_ARN'):
+        return False
+    try:
+        return free_slots() > 0
+    except Exception as e:
+        log.warning('Could not count running executions', error=e)
+        return False
+
+def queue_or_start(job_table, job_item, sfn_input, slot_future):
+    """Start the job now if a slot is free, else queue it; returns the executionArn if started."""
+    if slot_future.result():
+        execution_arn = start_now(job_table, job_item, sfn_input, tracer)
+        if execution_arn:
+            return execution_arn
+    else:
+        enqueue_job(job_table, job_item, sfn_input, tracer)
+    kick_scheduler()
+    return None
+
+def item_urls_from(body):
+    """
+    The items to try on: `itemUrls` (1 to MAX_OUTFIT_ITEMS URLs worn
+    together) or a single `itemUrl`. None if the request names no usable list.
+    """
+    item_urls = body.get('itemUrls')
+    if item_urls is None:
+        item_urls = [body['itemUrl']] if body.get('itemUrl') else []
+    if not isinstance(item_urls, list) or not 0 < len(item_urls) <= MAX_OUTFIT_ITEMS:
+        return None
+    if not all(isinstance(url, str) and url for url in item_urls):
+        return None
+    return item_urls
+
+@warmup.handler
+@profiler.handler
+@log.handler
+@tracer.handler
+def handler(event, context):
+    """
+    Handle POST /try-on requests: validate inputs, charge credits, create a job record, and start the job's Step Functions execution right away if an execution slot is free, else queue it for SchedulerFunction.
+    
+    Expects:
+    - event['body'] JSON containing `selfieId` (string) and either `itemUrl` (string) or `itemUrls` (list of up to 3 strings, tried on together in one generation).
+    - Authorization via headers (Bearer token validated by get_user_id_from_token or x-user-id header).
+    - Environment variables: USER_TABLE_NAME, USER_SELFIES_TABLE_NAME, TABLE_NAME, PAID_QUEUE_URL, FREE_QUEUE_URL, SCHEDULER_FUNCTION; STATE_MACHINE_ARN and MAX_RUNNING_JOBS for the direct start.
+    
+    Behavior:
+    - Verifies the items, selfieId, and authenticated userId; returns 400 if any are missing or there are too many items.
+    - Atomically decrements the user's credits by the try-on's cost (one credit per item, core.pricing.try_on_cost) and admits the job against the user's rate limit and in-flight cap (core.ratelimit) with one conditional DynamoDB update (when every slot is taken, slots of finished or stale jobs are reclaimed first, see core.slots); missing `credits` counts as 5 for legacy users. The updated profile's payment history picks the lane ('paid' or 'free'). The selfie is fetched with a single GetItem on the selfies table while the charge runs. Returns 402 with code `INSUFFICIENT_CREDITS` if the user has fewer credits than that, and 429 with a Retry-After header if a limit is reached (a warm container rejects users it knows are over the rate limit without calling DynamoDB).
+    - If the profile does not exist, creates it with a conditional put and returns 404 (a new user has no selfies).
+    - Uses the selfie's model-ready copy when processed; if the selfie does not exist, refunds the credits, frees the in-flight slot and returns 404.
+    - Concurrently creates a job record in the jobs table with status `PROCESSING`, its lane and creditCost, and sends the Step Functions input (jobId, userId, itemUrl (the first item), itemUrls, creditCost, selfieUrl, selfieId and the trace context) to the lane's queue (see core.scheduling.enqueue_job for compensation), then nudges the scheduler. While fewer than MAX_RUNNING_JOBS executions run (counted while the credits are deducted), the record is written as started and the execution started directly instead (core.scheduling.start_now); if that start fails the job is queued. Returns the jobId and lane, and the executionArn when started directly.
+    
+    Returns:
+    A dict suitable for an API Gateway response:
+    - 200: {'jobId': <id>, 'lane': <lane>, 'message': 'Try-on job queued'}, or with 'executionArn' and 'message': 'Try-on job started'
+    - 400: missing parameters or more than 3 items
+    - 402: insufficient credits (includes 'code': 'INSUFFICIENT_CREDITS')
+    - 429: rate limit or in-flight cap reached ('code': 'RATE_LIMITED' or 'TOO_MANY_IN_FLIGHT', 'retryAfter' in seconds)
+    - 404: user profile or selfie not found
+    - 500: unexpected error with error message
+    """
+    credit_deducted = False
+    user_id = None
+    user_table = None
+    job_id = str(uuid.uuid4())
+
+    try:
+        body = http.json_body(event)
+        item_urls = item_urls_from(body)
+        selfie_id = body.get('selfieId')
+        site_url = body.get('siteUrl')
+        site_title = body.get('siteTitle')
+        with tracer.span('token_validation'):
+            user_id = get_user_id_from_token(event)
+
+        if not item_urls or not selfie_id or not user_id:
+            return http.error(400, f"Missing itemUrl (or 1-{MAX_OUTFIT_ITEMS} itemUrls), selfieId, or user authentication")
+        cost = try_on_cost(len(item_urls))
+
+        limited = ratelimit.local_rejection(user_id)
+        if limited:
+            return ratelimit.too_many_requests(limited)
+
+        user_table = storage.table(os.environ['USER_TABLE_NAME'])
+        job_table = storage.table(os.environ['TABLE_NAME'])
+
+        # Look the selfie up and count running executions while the credits are deducted
+        selfie_future = tracer.submit(storage.get_io_pool(), 'selfie_read', get_selfie, user_id, selfie_id)
+        slot_future = tracer.submit(storage.get_io_pool(), 'capacity', slot_is_free)
+        try:
+            with tracer.span('charge_credit'):
+                profile = charge_reclaiming(user_table, job_table, user_id, job_id, cost)
+            credit_deducted = True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise e
+            old = e.response.get('Item')
+            if old and not has_credit(old, cost):
+                return http.error(402, 'Insufficient credits', code='INSUFFICIENT_CREDITS')
+            if old:
+                # Still admissible means a concurrent request moved the limits first
+                return ratelimit.too_many_requests(ratelimit.rejection(old) or ratelimit.Rejection('RATE_LIMITED', 1))
+            # No profile yet: create one. A brand new user has no selfies.
+            create_profile_if_absent(user_table, user_id, get_user_info_from_token(event))
+            return http.error(404, 'Selfie not found')
+
+        selfie = selfie_future.result()
+        if not selfie:
+            refund_credit(user_table, user_id, job_id, cost)
+            credit_deducted = False
+            return http.error(404, 'Selfie not found')
+
+        # Prefer the server-made, size-bounded copy over the original upload
+        selfie_url = selfie.get('modelUrl') or selfie['s3Url']
+        lane = lane_for(profile)
+        tracer.annotate(jobId=job_id, lane=lane)
+
+        # Input for the Step Function
+        sfn_input = {
+            'jobId': job_id,
+            'userId': user_id,
+            'itemUrl': item_urls[0],
+            'itemUrls': item_urls,
+            'creditCost': cost,
+            'selfieUrl': selfie_url,
+            'selfieId': selfie_id,
+            'siteUrl': site_url,
+            'siteTitle': site_title,
+            'batchId': None,
+            'trace': tracer.context()
+        }
+
+        # Initialize Job Status in DynamoDB and start or queue the job concurrently
+        job_item = {
+            'jobId': job_id,
+            'status': 'PROCESSING',
+            'userId': user_id,
+            'lane': lane,
+            'creditCost': cost,
+            'timestamp': datetime.datetime.utcnow().isoformat()
+        }
+        execution_arn = queue_or_start(job_table, job_item, sfn_input, slot_future)
+        if execution_arn:
+            return http.response(200, {
+                'jobId': job_id,
+                'lane': lane,
+                'executionArn': execution_arn,
+                'message': 'Try-on job started'
+            })
+        return http.response(200, {
+            'jobId': job_id,
+            'lane': lane,
+            'message': 'Try-on job queued'
+        })
+
+    except Exception as e:
+        log.error('Dispatcher failed', error=e)
+        
+        # Refund if deducted but failed to start
+        if credit_deducted and user_id and user_table:
+            try:
+                log.info('Refunding credit after dispatcher error', userId=user_id, credits=cost)
+                refund_credit(user_table, user_id, job_id, cost)
+            except Exception as refund_error:
+                log.error('Failed to refund credit', userId=user_id, error=refund_error)
+
+        return http.error(500, str(e))
+
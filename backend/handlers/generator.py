@@ -0,0 +1,159 @@
+"""
+GeneratorFunction: Step Functions GenerateImage task (Gemini integration)
+"""
+import base64
+import json
+import os
+
+from core import item_cache, storage
+from core.gemini_stream import iter_inline_image
+from core.log import get_logger
+from core.profiling import Profiler
+from core.telemetry import Tracer
+from core.uploads import upload_stream
+
+log = get_logger('generator')
+profiler = Profiler('generator')
+tracer = Tracer('generator')
+
+SINGLE_ITEM_PROMPT = "Blend Image A and Image B. In the result, the person from Image A should be seamlessly wearing the clothes from Image B. Maintain the facial features, pose, and lighting from Image A, but precisely transfer the clothing, textures, and colors from Image B onto the person. Use a photorealistic style, with natural shadows and details. Keep the background from Image A. For reference inputs: Image A is the source character, Image B provides the clothing."
+
+OUTFIT_PROMPT = "Dress the person from Image A in all of the garments from {garments} at once, as one outfit worn together. Maintain the facial features, pose, and lighting from Image A, but precisely transfer the clothing, textures, and colors from each garment image onto the person, layering them naturally where they overlap. Use a photorealistic style, with natural shadows and details. Keep the background from Image A. For reference inputs: Image A is the source character, {garments} each provide one piece of clothing."
+
+def prompt(item_count):
+    """Gemini instructions for a selfie (Image A) and `item_count` garment images (B, C, ...)."""
+    if item_count == 1:
+        return SINGLE_ITEM_PROMPT
+    names = [f"Image {chr(ord('B') + n)}" for n in range(item_count)]
+    return OUTFIT_PROMPT.format(garments=', '.join(names[:-1]) + ' and ' + names[-1])
+
+def gemini_payload(selfie_b64, item_b64s):
+    """One request carrying the selfie and every garment, in prompt order."""
+    images = [selfie_b64] + item_b64s
+    parts = [{"text": prompt(len(item_b64s))}]
+    parts += [{"inline_data": {"mime_type": "image/jpeg", "data": data}} for data in images]
+    return {
+        "contents": [{"parts": parts}],
+        "generationConfig": {
+            "responseModalities": ["IMAGE"],
+            "imageConfig": {
+                "aspectRatio": "3:4",
+                "imageSize": "1024x1024"
+            }
+        }
+    }
+
+@profiler.handler
+@log.handler
+@tracer.handler
+def handler(event, context):
+    """
+    Step Function Task: GenerateImage
+    Downloads the selfie and every item concurrently (items prefetched into
+    core.item_cache are read from S3 instead of the shop), calls the Gemini
+    API once for the whole outfit, saves the result to S3.
+    """
+    import urllib.error
+    import urllib.parse
+    import urllib.request
+
+    try:
+        job_id = event['jobId']
+        user_id = event['userId']
+        item_url = event['itemUrl']
+        item_urls = event.get('itemUrls') or [item_url]
+        selfie_url = event['selfieUrl']
+        selfie_id = event.get('selfieId')
+        site_url = event.get('siteUrl')
+        site_title = event.get('siteTitle')
+        tracer.annotate(jobId=job_id)
+        
+        api_key = os.environ['GEMINI_API_KEY']
+        api_url = os.environ['GEMINI_API_URL']
+        bucket_name = os.environ['BUCKET_NAME']
+
+        def download_as_base64(url):
+            # Encode URL to handle spaces and special characters
+            # We only encode the path part to preserve protocol and domain
+            parsed = urllib.parse.urlparse(url)
+            encoded_path = urllib.parse.quote(parsed.path)
+            encoded_url = urllib.parse.urlunparse(parsed._replace(path=encoded_path))
+            
+            req = urllib.request.Request(
+                encoded_url, 
+                headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'}
+            )
+            
+            with urllib.request.urlopen(req) as response:
+                return base64.b64encode(response.read()).decode('utf-8')
+
+        def item_as_base64(url):
+            try:
+                cached = item_cache.read_cached(storage.get_s3_client(), bucket_name, url)
+            except Exception as e:
+                # The cache only saves time; the shop still has the image
+                log.warning('Item cache read failed', jobId=job_id, error=e)
+                cached = None
+            if cached is None:
+                return tracer.timed('item_download', download_as_base64, url)
+            return base64.b64encode(cached).decode('utf-8')
+
+        log.info('Downloading images', jobId=job_id, items=len(item_urls))
+        pool = storage.get_io_pool()
+        item_futures = [tracer.submit(pool, 'item_read', item_as_base64, url) for url in item_urls]
+        selfie_b64 = tracer.timed('selfie_download', download_as_base64, selfie_url)
+        payload = gemini_payload(selfie_b64, [future.result() for future in item_futures])
+
+        log.info('Calling Gemini API', jobId=job_id)
+        req = urllib.request.Request(
+            api_url,
+            data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': 'application/json', 'x-goog-api-key': api_key}
+        )
+        
+        # Retry logic for 503 Service Unavailable
+        import time
+        max_retries = 5
+        for attempt in range(max_retries):
+            try:
+                response = tracer.timed('gemini_request', urllib.request.urlopen, req)
+                break # Success
+            except urllib.error.HTTPError as e:
+                if e.code == 503 and attempt < max_retries - 1:
+                    wait_time = (2 ** attempt) * 1 # 1, 2, 4, 8, 16 seconds
+                    log.warning('Gemini unavailable, retrying', jobId=job_id, waitSeconds=wait_time)
+                    tracer.timed('gemini_backoff', time.sleep, wait_time)
+                else:
+                    raise e
+
+        # Stream the image out of the response straight into S3; the
+        # multi-megabyte base64 body is never buffered or parsed as a whole
+        log.debug('Streaming result to S3', jobId=job_id)
+        s3_key = f"results/{user_id}/{job_id}.png"
+        with response, tracer.span('result_upload'):
+            size = upload_stream(
+                storage.get_s3_client(),
+                bucket_name,
+                s3_key,
+                iter_inline_image(response.read),
+                'image/png'
+            )
+        log.info('Saved result', jobId=job_id, bytes=size, key=s3_key)
+
+        result_url = storage.s3_url(bucket_name, s3_key)
+        
+        return {
+            'jobId': job_id,
+            'userId': user_id,
+            'itemUrl': item_url,
+            'itemUrls': item_urls,
+            'siteUrl': site_url,
+            'siteTitle': site_title,
+            'status': 'COMPLETED',
+            'resultUrl': result_url
+        }
+
+    except Exception as e:
+        log.error('Generator failed', jobId=event.get('jobId'), error=e)
+        raise e
+
@@ -0,0 +1,67 @@
+"""
+LaneDeadLetterFunction: fails and refunds jobs whose lane message was dead-lettered
+
+A queued job's message moves to its lane's dead-letter queue when the
+scheduler received it maxReceiveCount times without starting it. The job
+would otherwise stay PROCESSING and hold its credits and in-flight slot.
+Each dead message's job is marked FAILED, unless it was started after all,
+and its credits refunded; a batch job is also taken off its batch.
+"""
+import json
+import os
+
+from core import ratelimit, storage
+from core.batches import finish_batch_job
+from core.log import get_logger
+from core.profiles import refund_batch_job, refund_credit
+from core.profiling import Profiler
+from core.slots import fail_stale_job
+
+log = get_logger('lane_dead_letter')
+profiler = Profiler('lane_dead_letter')
+
+DEAD_LETTER_ERROR = 'Could not be scheduled'
+
+def fail_dead_job(job_table, user_table, data):
+    """Fail and refund one dead-lettered job; returns False if it had been started or finished."""
+    job_id, user_id = data['jobId'], data['userId']
+    if not fail_stale_job(job_table, {'jobId': job_id}, DEAD_LETTER_ERROR):
+        return False
+    cost = int(data.get('creditCost') or 1)
+    batch_id = data.get('batchId')
+    if not batch_id:
+        refund_credit(user_table, user_id, job_id, cost)
+        return True
+    # A batch's job holds no slot of its own; failing it above was the one transition
+    refund_batch_job(user_table, user_id, cost)
+    if finish_batch_job(job_table, batch_id, job_id):
+        ratelimit.release_slot(user_table, user_id, batch_id)
+    return True
+
+def apply_record(job_table, user_table, record):
+    """Handle one dead message; returns False if it should be redelivered."""
+    try:
+        data = json.loads(record['body'])
+        failed = fail_dead_job(job_table, user_table, data)
+    except Exception as e:
+        log.error('Dead job not handled', messageId=record['messageId'], error=e)
+        return False
+    log.info('Dead job handled', jobId=data['jobId'], userId=data['userId'], failed=failed)
+    return True
+
+@profiler.handler
+@log.handler
+def handler(event, context):
+    """
+    Triggered by the lanes' dead-letter queues with up to 10 records, each a
+    job's Step Functions input as queued by the dispatcher. Returns
+    {'batchItemFailures': [...]} naming the messages to redeliver.
+    """
+    records = event.get('Records', [])
+    job_table = storage.table(os.environ['TABLE_NAME'])
+    user_table = storage.table(os.environ['USER_TABLE_NAME'])
+    handled = storage.get_io_pool().map(lambda record: apply_record(job_table, user_table, record), records)
+    failures = [{'itemIdentifier': record['messageId']} for record, ok in zip(records, handled) if not ok]
+    if failures:
+        log.warning('Dead jobs left for redelivery', failed=len(failures), received=len(records))
+    return {'batchItemFailures': failures}
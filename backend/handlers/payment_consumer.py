@@ -0,0 +1,47 @@
+"""
+PaymentConsumerFunction: credits payments queued by the payment webhook
+
+Each SQS batch is applied with one conditional update per payment, run side
+by side on the I/O pool. Records that fail are reported back
+(ReportBatchItemFailures) so only they are redelivered; the rest of the
+batch is deleted. Redeliveries are harmless: crediting is idempotent per
+payment id.
+"""
+import json
+import os
+
+from core import storage
+from core.log import get_logger
+from core.payments import credit_payment, payment_id
+from core.profiling import Profiler
+
+log = get_logger('payment_consumer')
+profiler = Profiler('payment_consumer')
+
+def apply_record(user_table, record):
+    """Credit one queued payment; returns False if it should be redelivered."""
+    try:
+        data = json.loads(record['body'])
+        outcome = credit_payment(user_table, data)
+    except Exception as e:
+        log.error('Payment not applied', messageId=record['messageId'], error=e)
+        return False
+    log.info('Payment applied', paymentId=payment_id(data), outcome=outcome)
+    return True
+
+@profiler.handler
+@log.handler
+def handler(event, context):
+    """
+    Triggered by the payment queue with up to 10 records, each the verified
+    Prodamus notification as JSON. Returns {'batchItemFailures': [...]}
+    naming the messages to redeliver; after maxReceiveCount deliveries they
+    move to the dead-letter queue.
+    """
+    records = event.get('Records', [])
+    user_table = storage.table(os.environ['USER_TABLE_NAME'])
+    applied = storage.get_io_pool().map(lambda record: apply_record(user_table, record), records)
+    failures = [{'itemIdentifier': record['messageId']} for record, ok in zip(records, applied) if not ok]
+    if failures:
+        log.warning('Payments left for redelivery', failed=len(failures), received=len(records))
+    return {'batchItemFailures': failures}
@@ -0,0 +1,112 @@
+"""
+PaymentLinkFunction: POST /payment/link
+"""
+import json
+import os
+
+from core import http, prodamus, storage
+from core.auth import get_user_id_from_token
+from core.log import get_logger
+from core.pricing import TARIFFS, tariff_price
+from core.profiles import PROFILE_CONTACT_VIEW, ProfileReader
+from core.profiling import Profiler
+
+log = get_logger('payment_link')
+profiler = Profiler('payment_link')
+
+PAYMENT_URL_RU = "https://web-wardrobe.payform.ru/"
+PAYMENT_URL_EN = "https://web-wardrobe-eng.payform.ru/" # Same for now, or change if needed
+PRODAMUS_SYS = "webwardrobe" # Replace with actual sys if different
+
+@profiler.handler
+@log.handler
+def handler(event, context):
+    """
+    Handle POST /payment/link requests: generate a signed Prodamus payment URL.
+    
+    Expects:
+    - event['body'] JSON containing `tariffName` (string) and `lang` (string).
+    - Authorization via headers (Bearer token validated by get_user_id_from_token).
+    - Environment variables: USER_TABLE_NAME, PRODAMUS_SECRET_KEY.
+    
+    Returns:
+    - 200: {'url': <signed_payment_url>}
+    - 400: missing parameters
+    - 401: unauthorized
+    - 500: unexpected error
+    """
+    import urllib.parse
+
+    try:
+        user_id = get_user_id_from_token(event)
+        if not user_id:
+            return http.error(401, 'Unauthorized')
+
+        body = http.json_body(event)
+        tariff_name = body.get('tariffName')
+        lang = body.get('lang', 'en')
+
+        if not tariff_name:
+            return http.error(400, 'Missing tariffName')
+
+        tariff = TARIFFS.get(tariff_name)
+        if not tariff:
+            return http.error(400, 'Invalid tariff')
+
+        # Fetch user email if available
+        user_table = storage.table(os.environ['USER_TABLE_NAME'])
+        user_profile = ProfileReader(user_table).get(user_id, PROFILE_CONTACT_VIEW) or {}
+        user_email = user_profile.get('email')
+
+        products = [
+            {
+                "name": f"WebWardrobe: {tariff['credits']} Credits",
+                "price": tariff_price(tariff, lang),
+                "quantity": 1,
+                "tax": "none",
+                "type": "service",
+                "sku": tariff['sku']
+            }
+        ]
+        success_url = os.environ.get('PRODAMUS_SUCCESS_URL', 'https://web-wardrobe.netlify.app/?payment=success')
+
+        # Construct Params
+        params = {
+            "do": "pay",
+            "products": products, # Will be normalized to list of dicts
+            "customer_extra": user_id,
+            "urlSuccess": success_url,
+            "sys": PRODAMUS_SYS
+        }
+        if user_email:
+            params["customer_email"] = user_email
+
+        secret_key = os.environ.get('PRODAMUS_SECRET_KEY')
+        if not secret_key:
+            log.error('PRODAMUS_SECRET_KEY is missing')
+            return http.error(500, 'Internal server configuration error')
+
+        signature = prodamus.sign(params, secret_key)
+
+        # Construct Final URL
+        # We need to send params as GET parameters.
+        # `products` must be JSON stringified.
+        query_params = {
+            "do": "pay",
+            "products": json.dumps(products, separators=(',', ':'), ensure_ascii=False),
+            "customer_extra": user_id,
+            "urlSuccess": success_url,
+            "sys": PRODAMUS_SYS,
+            "sign": signature
+        }
+        if user_email:
+            query_params["customer_email"] = user_email
+
+        base_url = PAYMENT_URL_RU if lang == 'ru' else PAYMENT_URL_EN
+        final_url = f"{base_url}?{urllib.parse.urlencode(query_params)}"
+
+        return http.response(200, {'url': final_url})
+
+    except Exception as e:
+        log.error('Failed to generate payment link', error=e)
+        return http.error(500, str(e))
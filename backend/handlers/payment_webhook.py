@@ -0,0 +1,69 @@
+"""
+PaymentWebhookFunction: POST /payment/webhook (Prodamus notifications)
+"""
+import os
+
+from core import http, prodamus, storage
+from core.log import get_logger
+from core.payments import credit_payment, enqueue_payment, payment_id
+from core.profiling import Profiler
+
+log = get_logger('payment_webhook')
+profiler = Profiler('payment_webhook')
+
+@profiler.handler
+@log.handler
+def handler(event, context):
+    """
+    Handle Prodamus payment webhook notifications.
+    Verifies the signature, then credits the payment (core.payments). When
+    PAYMENT_QUEUE_URL is set the payment is queued for
+    PaymentConsumerFunction instead and acknowledged without waiting on
+    DynamoDB; a failed enqueue answers 500 so Prodamus delivers it again.
+    """
+    try:
+        secret_key = os.environ.get('PRODAMUS_SECRET_KEY')
+        if not secret_key:
+            log.error('PRODAMUS_SECRET_KEY not configured')
+            return http.text(500, 'Configuration error')
+
+        sign_header = http.get_header(event, 'Sign')
+        if not sign_header:
+            log.warning('Missing Sign header')
+            return http.text(403, 'Missing signature')
+
+        data = prodamus.parse_notification(event)
+        if not data:
+            log.warning('Empty or unparseable body')
+            return http.text(400, 'Invalid body')
+
+        # Prodamus signs the recursively key-sorted data with all values as
+        # strings, serialized as compact JSON with slashes escaped.
+        if not prodamus.verify(data, sign_header, secret_key):
+            log.warning('Signature mismatch', orderId=data.get('order_id'))
+            return http.text(403, 'Signature mismatch')
+
+        # Process Payment
+        payment_status = data.get('payment_status')
+        if payment_status != 'success':
+            log.info('Ignoring payment', paymentStatus=payment_status)
+            return http.text(200, 'Ignored')
+
+        # We passed the user ID in 'customer_extra'
+        user_id = data.get('customer_extra')
+        if not user_id:
+            log.warning('No user_id in customer_extra')
+            return http.text(400, 'Missing user_id')
+
+        queue_url = os.environ.get('PAYMENT_QUEUE_URL')
+        if queue_url:
+            enqueue_payment(queue_url, data)
+            log.info('Payment queued', userId=user_id, paymentId=payment_id(data))
+            return http.text(200, 'Accepted')
+
+        user_table = storage.table(os.environ['USER_TABLE_NAME'])
+        return http.text(200, credit_payment(user_table, data))
+
+    except Exception as e:
+        log.error('Webhook handler failed', error=e)
+        return http.text(500, str(e))
@@ -0,0 +1,89 @@
+"""
+PrefetchFunction: POST /try-on/prefetch
+
+Fills the shared item cache (core.item_cache) while the user is still
+choosing, so the try-on that follows reads the product image from S3 instead
+of the shop. Best effort: a caller need not wait for or act on the answer.
+The Chrome extension does not call it: it learns of an item only when the
+try-on menu is clicked, the moment the try-on itself starts.
+"""
+import os
+from http.client import HTTPException
+
+from botocore.exceptions import ClientError
+
+from core import http, item_cache, ratelimit, storage
+from core.auth import get_user_id_from_token
+from core.log import get_logger
+from core.profiling import Profiler
+from core.singleflight import SingleFlight
+from core.telemetry import Tracer
+
+log = get_logger('prefetch')
+profiler = Profiler('prefetch')
+tracer = Tracer('prefetch')
+
+# Right-clicking the same image again, or another user doing so, within a
+# minute reuses the first answer
+prefetches = SingleFlight(ttl=60.0)
+
+def fill_cache(item_url):
+    """Cache the item unless it already is; returns the response body."""
+    s3 = storage.get_s3_client()
+    bucket_name = os.environ['BUCKET_NAME']
+    key = item_cache.cache_key(item_url)
+    if tracer.timed('cache_check', item_cache.is_cached, s3, bucket_name, key):
+        return {'cached': True, 'key': key}
+
+    source = tracer.timed('item_download', item_cache.download, item_url)
+    size = tracer.timed('cache_put', item_cache.store, s3, bucket_name, item_url, source)
+    return {'cached': False, 'key': key, 'bytes': size}
+
+@profiler.handler
+@log.handler
+@tracer.handler
+def handler(event, context):
+    """
+    Body: {"itemUrl"}. Downloads the image once, bounds it to the model size
+    and stores it under item-cache/ (see core.item_cache).
+
+    Returns:
+    - 200: {'cached': true, 'key'} if it was already cached, else {'cached': false, 'key', 'bytes'}
+    - 400: missing itemUrl
+    - 401: not authenticated
+    - 404: no profile
+    - 422: the URL is not a public http(s) image of at most 15 MiB
+    - 429: PREFETCH_RATE_LIMIT prefetches per PREFETCH_RATE_WINDOW_SECONDS reached (with Retry-After)
+    - 500: unexpected error
+    """
+    try:
+        with tracer.span('token_validation'):
+            user_id = get_user_id_from_token(event)
+        if not user_id:
+            return http.error(401, 'Unauthorized')
+
+        item_url = http.json_body(event).get('itemUrl')
+        if not isinstance(item_url, str) or not item_url:
+            return http.error(400, 'Missing itemUrl')
+
+        limited = ratelimit.PREFETCH.local_rejection(user_id)
+        if not limited:
+            user_table = storage.table(os.environ['USER_TABLE_NAME'])
+            with tracer.span('rate_check'):
+                limited = ratelimit.admit(ratelimit.PREFETCH, user_table, user_id)
+        if limited:
+            return ratelimit.too_many_requests(limited)
+
+        return http.response(200, prefetches.do(item_url, lambda: fill_cache(item_url)))
+
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return http.error(404, 'User not found')
+        log.error('Prefetch failed', error=e)
+        return http.error(500, str(e))
+    except (ValueError, OSError, HTTPException) as e:
+        log.warning('Item not prefetched', error=e)
+        return http.error(422, str(e))
+    except Exception as e:
+        log.error('Prefetch failed', error=e)
+        return http.error(500, str(e))
@@ -0,0 +1,355 @@
+"""
+ProfileFunction: authenticated /user/* endpoints (selfies, generations, profile)
+
+Each endpoint is a route function registered on `router` with its path
+template. Route functions look up only the tables and clients they use, so a
+request builds nothing it does not need.
+"""
+import json
+import os
+
+from core import http, storage
+from core.account import delete_generations, image_keys, purge_account
+from core.auth import get_user_id_from_token, get_user_info_from_token
+from core.bulk import delete_s3_keys
+from core.log import get_logger
+from core.presign import MAX_BATCH_FILES, MAX_SELFIE_BYTES, MAX_THUMBNAIL_BYTES, check_upload, legacy_selfie_upload, selfie_upload
+from core.profiles import PROFILE_SUMMARY_VIEW, ProfileReader, create_profile_if_absent
+from core.profiling import Profiler
+from core.router import Router
+from core.selfies import add_selfie, delete_selfies, get_selfie, list_selfies, migrate_profile, profile_selfies, update_selfie
+
+log = get_logger('profile')
+profiler = Profiler('profile')
+
+router = Router()
+
+def user_table():
+    return storage.table(os.environ['USER_TABLE_NAME'])
+
+def bucket_name():
+    return os.environ['BUCKET_NAME']
+
+def start_selfie_processing(user_id, image):
+    """Hand a confirmed upload to SelfieProcessorFunction without waiting for it."""
+    try:
+        storage.get_lambda_client().invoke(
+            FunctionName=os.environ['SELFIE_PROCESSOR_FUNCTION'],
+            InvocationType='Event',
+            Payload=json.dumps({'userId': user_id, 'image': image}).encode('utf-8')
+        )
+    except Exception as e:
+        # Lists show the original until a backfill picks the image up
+        log.warning('Failed to start selfie processing', imageId=image['id'], error=e)
+
+def create_profile(table, user_id, user_info):
+    """Create the profile of a new user and return its summary."""
+    item = create_profile_if_absent(table, user_id, user_info)
+    if not item:
+        # A concurrent request created it first; use theirs
+        item = ProfileReader(table).get(user_id, PROFILE_SUMMARY_VIEW, consistent=True) or {}
+    return item
+
+def set_profile_fields(table, user_id, item, fields):
+    """Write `fields` (name, picture, email) to the profile and to `item`."""
+    if not fields:
+        return
+    table.update_item(
+        Key={'userId': user_id},
+        UpdateExpression='SET ' + ', '.join(f"#f{n} = :f{n}" for n in range(len(fields))),
+        ExpressionAttributeNames={f"#f{n}": field for n, field in enumerate(fields)},
+        ExpressionAttributeValues={f":f{n}": value for n, value in enumerate(fields.values())}
+    )
+    item.update(fields)
+
+@router.route('GET', '/user/generations')
+def list_generations(event, user_id):
+    gen_table = storage.table(os.environ['USER_GENERATIONS_TABLE_NAME'])
+
+    # Query generations for the user
+    # Since timestamp is the sort key, we can query by userId
+    try:
+        response = gen_table.query(
+            KeyConditionExpression='userId = :u',
+            ExpressionAttributeValues={':u': user_id},
+            ScanIndexForward=False  # Newest first
+        )
+        items = response.get('Items', [])
+
+        # Ensure all required fields are present
+        generations = []
+        for item in items:
+            renditions = item.get('renditions') or {}
+            generations.append({
+                'resultUrl': item.get('resultUrl'),
+                # Small image for the list; falls back to the full PNG
+                'thumbnailUrl': renditions.get('thumb') or item.get('resultUrl'),
+                'renditions': renditions,
+                'itemUrl': item.get('itemUrl'),
+                'itemUrls': item.get('itemUrls') or [item.get('itemUrl')],
+                'siteUrl': item.get('siteUrl'),
+                'timestamp': item.get('timestamp'),
+                'jobId': item.get('jobId'),
+                'siteTitle': item.get('siteTitle')
+            })
+
+        return http.response(200, {'generations': generations})
+    except Exception as e:
+        log.error('Failed to fetch generations', error=e)
+        return http.error(500, str(e))
+
+@router.route('POST', '/user/generations/delete')
+def delete_generations_bulk(event, user_id):
+    """{"jobIds": [...]} or {"all": true}"""
+    body = http.json_body(event)
+    job_ids = None if body.get('all') is True else body.get('jobIds')
+    if job_ids is not None and (not isinstance(job_ids, list) or not job_ids):
+        return http.error(400, 'Provide jobIds or all')
+    result = delete_generations(user_id, bucket_name(), job_ids)
+    return http.response(500 if result['failed'] else 200, result)
+
+@router.route('DELETE', '/user/generations/{jobId}')
+def delete_generation(event, user_id, jobId):
+    try:
+        # The sort key is the timestamp, so this pages through the
+        # user's generations to find the job
+        result = delete_generations(user_id, bucket_name(), [jobId])
+        if result['failed']:
+            return http.error(500, 'Failed to delete generation')
+        if not result['deleted']:
+            return http.error(404, 'Generation not found')
+
+        return http.response(200, {'message': 'Generation deleted'})
+
+    except Exception as e:
+        log.error('Failed to delete generation', jobId=jobId, error=e)
+        return http.error(500, str(e))
+
+@router.route('DELETE', '/user/account')
+def delete_account(event, user_id):
+    """Privacy purge of everything stored for the user."""
+    result = purge_account(user_id, bucket_name())
+    return http.response(200 if result['complete'] else 500, result)
+
+@router.route('POST', '/user/images/delete')
+def delete_images(event, user_id):
+    """{"fileIds": [...]}"""
+    file_ids = http.json_body(event).get('fileIds')
+    if not isinstance(file_ids, list) or not file_ids:
+        return http.error(400, 'Provide fileIds')
+
+    doomed = [img for img in list_selfies(user_id) if img['id'] in file_ids]
+    if not doomed and migrate_profile(user_id):
+        doomed = [img for img in list_selfies(user_id) if img['id'] in file_ids]
+    if not doomed:
+        return http.error(404, 'Image not found')
+
+    # Uncount first: if another request deleted one of them meanwhile the
+    # transaction is canceled, and the objects must stay with the items
+    if not delete_selfies(user_id, doomed):
+        return http.error(409, 'Images changed, please retry')
+
+    failed = delete_s3_keys(storage.get_s3_client(), bucket_name(), image_keys(doomed))
+    if failed:
+        log.warning('Failed to delete from S3', keys=failed)
+    return http.response(200, {'deleted': [img['id'] for img in doomed]})
+
+@router.route('GET', '/user/profile')
+def get_profile(event, user_id):
+    """User profile info (name, picture, email, credits, images)."""
+    table = user_table()
+    item = ProfileReader(table).get(user_id, PROFILE_SUMMARY_VIEW)
+    # Always fetch fresh user info from Google token
+    user_info = get_user_info_from_token(event)
+
+    if not item:
+        item = create_profile(table, user_id, user_info)
+    elif user_info:
+        # Always update name and picture from Google (they might change)
+        fields = {f: user_info[f] for f in ('name', 'picture', 'email') if f in user_info}
+        set_profile_fields(table, user_id, item, fields)
+
+    return http.response(200, {
+        'name': item.get('name'),
+        'picture': item.get('picture'),
+        'email': item.get('email'),
+        'credits': item.get('credits', 5),
+        'userId': item.get('userId'),
+        'images': profile_selfies(user_id, item)
+    })
+
+@router.route('POST', '/user/images/upload-urls')
+def create_upload_urls(event, user_id):
+    """Presigned POSTs for up to MAX_BATCH_FILES files in one call."""
+    files = http.json_body(event).get('files') or []
+    if not isinstance(files, list) or not 1 <= len(files) <= MAX_BATCH_FILES:
+        return http.error(400, f"Provide 1 to {MAX_BATCH_FILES} files")
+    try:
+        uploads = [
+            selfie_upload(
+                storage.get_s3_client(), bucket_name(), user_id,
+                f.get('filename'), f.get('contentType', 'image/jpeg'), f.get('includeThumbnail', False)
+            )
+            for f in files
+        ]
+    except ValueError as e:
+        return http.error(400, str(e))
+    return http.response(200, {'uploads': uploads})
+
+@router.route('POST', '/user/images/upload-url')
+def create_upload_url(event, user_id):
+    """Presigned PUT for one file, the shape installed extensions before 2.11.15 use."""
+    body = http.json_body(event)
+    try:
+        upload = legacy_selfie_upload(
+            storage.get_s3_client(), bucket_name(), user_id,
+            body.get('filename'), body.get('contentType', 'image/jpeg'), body.get('includeThumbnail', False)
+        )
+    except ValueError as e:
+        return http.error(400, str(e))
+    return http.response(200, upload)
+
+@router.route('POST', '/user/images')
+def confirm_upload(event, user_id):
+    body = http.json_body(event)
+    name = body.get('name')
+    s3_key = body.get('s3Key')
+    file_id = body.get('fileId')
+    thumbnail_s3_key = body.get('thumbnailS3Key')
+
+    if not name or not s3_key or not file_id:
+        return http.error(400, 'Missing fields')
+
+    # Presigned PUTs (legacy_selfie_upload) cannot bound the size; check it here
+    try:
+        check_upload(storage.get_s3_client(), bucket_name(), s3_key, MAX_SELFIE_BYTES)
+        if thumbnail_s3_key:
+            check_upload(storage.get_s3_client(), bucket_name(), thumbnail_s3_key, MAX_THUMBNAIL_BYTES)
+    except ValueError as e:
+        return http.error(400, str(e))
+
+    s3_url = storage.s3_url(bucket_name(), s3_key)
+
+    new_image_item = {
+        'id': file_id,
+        'name': name,
+        's3Url': s3_url,
+        's3Key': s3_key
+    }
+
+    if thumbnail_s3_key:
+        new_image_item['thumbnailS3Key'] = thumbnail_s3_key
+        new_image_item['thumbnailUrl'] = storage.s3_url(bucket_name(), thumbnail_s3_key)
+
+    # Counted against the limit in the same transaction
+    if not add_selfie(user_id, new_image_item):
+        return http.error(400, 'Maximum 5 images allowed')
+
+    start_selfie_processing(user_id, new_image_item)
+
+    return http.response(200, {'message': 'Image saved', 'id': file_id, 'url': s3_url})
+
+@router.route('GET', '/user/images')
+def list_images(event, user_id):
+    """The user's images, credits, name and picture."""
+    table = user_table()
+    item = ProfileReader(table).get(user_id, PROFILE_SUMMARY_VIEW)
+
+    # Only call Google when the profile is missing or incomplete
+    user_info = None
+    if not item or ('email' not in item or 'name' not in item):
+        user_info = get_user_info_from_token(event)
+
+    if not item:
+        item = create_profile(table, user_id, user_info)
+    elif user_info:
+        # Fill in email/name/picture if missing and available in token
+        fields = {f: user_info[f] for f in ('email', 'name', 'picture') if f in user_info and f not in item}
+        set_profile_fields(table, user_id, item, fields)
+
+    # Return credits as well, default to 5 if not set
+    return http.response(200, {
+        'images': profile_selfies(user_id, item),
+        'credits': item.get('credits', 5),
+        'name': item.get('name'),
+        'picture': item.get('picture')
+    })
+
+@router.route('DELETE', '/user/images/{fileId}')
+def delete_image(event, user_id, fileId):
+    image_to_remove = get_selfie(user_id, fileId)
+    if not image_to_remove:
+        return http.error(404, 'Image not found')
+
+    # Remove from DynamoDB and uncount it; fails if it was deleted meanwhile
+    if not delete_selfies(user_id, [image_to_remove]):
+        return http.error(404, 'Image not found')
+
+    # Remove the original and its variants from S3 in one call
+    try:
+        failed = delete_s3_keys(storage.get_s3_client(), bucket_name(), image_keys([image_to_remove]))
+        if failed:
+            log.warning('Failed to delete from S3', keys=failed)
+    except Exception as e:
+        log.warning('Failed to delete from S3', error=e)
+
+    return http.response(200, {'message': 'Image deleted'})
+
+@router.route('PATCH', '/user/images/{fileId}')
+def rename_image(event, user_id, fileId):
+    new_name = http.json_body(event).get('name')
+    if not new_name:
+        return http.error(400, 'Missing new name')
+
+    # One conditional update; fails if the image does not exist (or is still on a legacy profile)
+    previous = update_selfie(user_id, fileId, {'name': new_name})
+    if previous is None and migrate_profile(user_id):
+        previous = update_selfie(user_id, fileId, {'name': new_name})
+    if previous is None:
+        return http.error(404, 'Image not found')
+
+    return http.response(200, {'message': 'Image renamed'})
+
+@profiler.handler
+@log.handler
+def handler(event, context):
+    """
+    Handle authenticated user image and generation endpoints under /user/*.
+
+    Supported routes and behavior:
+    - GET /user/generations: return the authenticated user's generations, newest first.
+    - POST /user/images/upload-urls: issue presigned POSTs (size and content-type constrained) for up to 5 files ({"files": [{filename, contentType, includeThumbnail}]}) in one call; returns {'uploads': [...]} with each upload's url and form fields, s3 key(s) and fileId.
+    - POST /user/images/upload-url: presigned PUT URL(s) for an image (and optional thumbnail), kept for extensions before 2.11.15; returns uploadUrl, s3Key and fileId (and thumbnailUploadUrl, thumbnailS3Key).
+    - POST /user/images: confirm an uploaded image, enforce a maximum of 5 images, store its metadata in the selfies table, start server-side thumbnail processing, and return the saved image id and URL.
+    - GET /user/images: return the user's images and current credits (defaults to 5 when unset); a legacy images list on the profile is moved to the selfies table first.
+    - DELETE /user/images/{fileId}: delete an image and its thumbnail/variants from S3 and remove its item from the selfies table.
+    - POST /user/images/delete: the same for several images ({"fileIds": [...]}) with one S3 DeleteObjects call and one transaction.
+    - PATCH /user/images/{fileId}: rename an image with one conditional update.
+    - GET /user/profile: return the user's profile, refreshing name, picture and email from Google.
+    - POST /user/generations/delete: delete the listed generations ({"jobIds": [...]}) or all of them ({"all": true}) with batched S3 and DynamoDB deletes.
+    - DELETE /user/generations/{jobId}: delete one generation and its result objects.
+    - DELETE /user/account: purge the user's generations, job records, selfies, S3 objects and profile.
+
+    Parameters:
+    - event (dict): API Gateway HTTP event containing path/rawPath, requestContext.http.method, headers, and body (JSON for POST requests). The handler expects an authenticated user identifier resolvable via get_user_id_from_token(event).
+    - context: Lambda context object (unused by this handler).
+
+    Returns:
+    A dict representing an HTTP response with keys:
+    - statusCode (int): HTTP status code (e.g., 200, 400, 401, 404, 500, 402 for insufficient credits).
+    - body (str): JSON-encoded response body containing data or an error message.
+    """
+    try:
+        route, params = router.match(http.get_method(event), http.get_path(event))
+        user_id = get_user_id_from_token(event)
+
+        if not user_id:
+             return http.error(401, 'Unauthorized')
+        if not route:
+            return http.error(404, 'Not found')
+
+        return route(event, user_id, **params)
+
+    except Exception as e:
+        log.error('Profile handler failed', error=e)
+        return http.response(500, {'error': str(e)})
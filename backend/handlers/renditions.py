@@ -0,0 +1,62 @@
+"""
+RenditionFunction: Step Functions ProcessResult task
+"""
+import os
+
+from core import storage
+from core.log import get_logger
+from core.profiling import Profiler
+from core.renditions import CACHE_CONTROL, FORMATS, pick_format, render, rendition_key
+from core.telemetry import Tracer
+
+log = get_logger('renditions')
+profiler = Profiler('renditions')
+tracer = Tracer('renditions')
+
+@profiler.handler
+@log.handler
+@tracer.handler
+def handler(event, context):
+    """
+    Step Function Task: ProcessResult
+    Writes compressed renditions of the generated PNG next to it in S3.
+
+    Renditions are an optimisation, so this never fails the job: on any
+    error it returns an empty map and the job completes with the PNG alone.
+    """
+    job_id = event['jobId']
+    result_url = event['resultUrl']
+    bucket_name = os.environ['BUCKET_NAME']
+    preferred = os.environ.get('RESULT_FORMATS', 'WEBP').split(',')
+    tracer.annotate(jobId=job_id)
+
+    try:
+        fmt = pick_format(preferred)
+        if fmt is None:
+            log.warning('No encoder available; keeping PNG only', format=preferred)
+            return {'jobId': job_id, 'renditions': {}}
+
+        s3 = storage.get_s3_client()
+        source_key = storage.s3_key_from_url(result_url)
+        with tracer.span('source_read'):
+            source = s3.get_object(Bucket=bucket_name, Key=source_key)['Body'].read()
+
+        renditions = {}
+        for name, body in tracer.timed('render', render, source, fmt).items():
+            key = rendition_key(source_key, name, fmt)
+            with tracer.span('rendition_put'):
+                s3.put_object(
+                    Bucket=bucket_name,
+                    Key=key,
+                    Body=body,
+                    ContentType=FORMATS[fmt][1],
+                    CacheControl=CACHE_CONTROL
+                )
+            renditions[name] = storage.s3_url(bucket_name, key)
+            log.debug('Rendition written', name=name, bytes=len(body), sourceBytes=len(source))
+
+        return {'jobId': job_id, 'renditions': renditions}
+
+    except Exception as e:
+        log.error('Rendition failed', jobId=job_id, error=e)
+        return {'jobId': job_id, 'renditions': {}}
@@ -0,0 +1,150 @@
+"""
+ResultSaverFunction: Step Functions SaveResult / JobFailed task
+"""
+import datetime
+import json
+import os
+
+from core import ratelimit, storage
+from core.batches import finish_batch_job
+from core.jobs import mark_job_completed, mark_job_failed
+from core.log import get_logger
+from core.profiles import refund_batch_job, refund_credit
+from core.profiling import Profiler
+from core.scheduling import kick_scheduler
+from core.telemetry import Tracer
+
+log = get_logger('saver')
+profiler = Profiler('saver')
+tracer = Tracer('saver')
+
+def finish_batch(table, event):
+    """Take the job off its batch; the last one frees the batch's in-flight slot."""
+    batch_id = event.get('batchId')
+    if not batch_id:
+        return
+    try:
+        if tracer.timed('batch_write', finish_batch_job, table, batch_id, event['jobId']):
+            user_table = storage.table(os.environ['USER_TABLE_NAME'])
+            ratelimit.release_slot(user_table, event['userId'], batch_id)
+    except Exception as e:
+        log.error('Failed to update batch', batchId=batch_id, error=e)
+
+def refund_failed_job(event, failed_now):
+    """
+    A job holds its own slot and the conditional refund_credit makes its
+    refund happen once. A batch's job holds none: it is refunded only if
+    this call moved it to FAILED, not the reclaimer or an earlier attempt.
+    """
+    user_table = storage.table(os.environ['USER_TABLE_NAME'])
+    user_id, cost = event['userId'], int(event.get('creditCost') or 1)
+    refunded = failed_now
+    if not event.get('batchId'):
+        refunded = tracer.timed('refund', refund_credit, user_table, user_id, event['jobId'], cost)
+    elif failed_now:
+        tracer.timed('refund', refund_batch_job, user_table, user_id, cost)
+    log.info('Refund after job failure', userId=user_id, credits=cost, refunded=refunded)
+
+@profiler.handler
+@log.handler
+@tracer.handler
+def handler(event, context):
+    """
+    Step Function Task: SaveResult or JobFailed
+    Updates DynamoDB with the result or error and frees the job's in-flight
+    slot on the user's profile (refunding the credit on failure).
+    """
+    try:
+        job_id = event['jobId']
+        tracer.annotate(jobId=job_id)
+        user_id = event.get('userId')
+        table_name = os.environ['TABLE_NAME']
+        table = storage.table(table_name)
+        
+        # 1. Handle Failure
+        if event.get('status') == 'FAILED':
+            error_info = event.get('error', {})
+            error_msg = str(error_info)
+            
+            failed_now = tracer.timed('job_write', mark_job_failed, table, job_id, error_msg)
+            # Refund the credits the job cost (one per outfit item), once
+            if user_id:
+                try:
+                    refund_failed_job(event, failed_now)
+                except Exception as refund_error:
+                    log.error('Failed to refund credit', userId=user_id, error=refund_error)
+
+            finish_batch(table, event)
+            # This execution's slot is free for the next queued job
+            kick_scheduler(released=1)
+            return {'status': 'FAILED', 'error': error_msg}
+
+        # 2. Handle Success (Result already in S3 from Generator)
+        if 'resultUrl' in event:
+            result_url = event['resultUrl']
+            # Compressed copies of the PNG, e.g. {'primary': url, 'thumb': url}
+            renditions = event.get('renditions') or {}
+            timestamp = datetime.datetime.utcnow().isoformat()
+
+            # Update Jobs Table
+            tracer.timed('job_write', mark_job_completed, table, job_id, result_url, timestamp, renditions)
+
+            # Save to User Generations History
+            if user_id:
+                try:
+                    item_url = event.get('itemUrl')
+                    item_urls = event.get('itemUrls') or []
+                    site_url = event.get('siteUrl')
+                    site_title = event.get('siteTitle')
+                    gen_table_name = os.environ['USER_GENERATIONS_TABLE_NAME']
+                    gen_table = storage.table(gen_table_name)
+                    gen_item = {
+                        'userId': user_id,
+                        'timestamp': timestamp,
+                        'jobId': job_id,
+                        'resultUrl': result_url,
+                        'itemUrl': item_url,
+                        'siteUrl': site_url,
+                        'siteTitle': site_title
+                    }
+                    if renditions:
+                        gen_item['renditions'] = renditions
+                    if len(item_urls) > 1:
+                        gen_item['itemUrls'] = item_urls
+                    tracer.timed('generation_write', gen_table.put_item, Item=gen_item)
+                except Exception as e:
+                    log.error('Failed to save generation history', error=e)
+
+                try:
+                    user_table = storage.table(os.environ['USER_TABLE_NAME'])
+                    tracer.timed('slot_release', ratelimit.release_slot, user_table, user_id, job_id)
+                except Exception as e:
+                    log.error('Failed to release in-flight slot', userId=user_id, error=e)
+
+            finish_batch(table, event)
+            kick_scheduler(released=1)
+            return {'status': 'COMPLETED', 'resultUrl': result_url, 'renditions': renditions}
+
+        # 3. Legacy/Fallback (If passed raw AI result, not used anymore but kept for safety)
+        if 'aiResult' in event:
+            ai_result = event['aiResult'] 
+            bucket_name = os.environ['BUCKET_NAME']
+            
+            s3_key = f"results/{job_id}.json"
+            storage.get_s3_client().put_object(
+                Bucket=bucket_name,
+                Key=s3_key,
+                Body=json.dumps(ai_result),
+                ContentType='application/json'
+            )
+            
+            result_url = storage.s3_url(bucket_name, s3_key)
+    
+            mark_job_completed(table, job_id, result_url, datetime.datetime.utcnow().isoformat())
+            return {'status': 'COMPLETED', 'resultUrl': result_url}
+
+    except Exception as e:
+        log.error('Saver failed', error=e)
+        raise e
+
+
@@ -0,0 +1,134 @@
+"""
+SchedulerFunction: starts queued try-on jobs in weighted fair lane order
+
+Runs every minute and whenever the dispatcher queues a job or the saver
+finishes one (core.scheduling.kick_scheduler). Reserved concurrency 1 makes
+it the only consumer of the lane queues.
+"""
+import json
+import os
+import time
+from collections import deque
+
+from core import storage
+from core.jobs import claim_job, release_job
+from core.log import get_logger
+from core.profiling import Profiler
+from core.scheduling import LANES, WeightedFairScheduler, free_slots, lane_weights, queue_url
+from core.telemetry import Tracer
+
+log = get_logger('scheduler')
+profiler = Profiler('scheduler')
+tracer = Tracer('scheduler')
+
+# SQS returns at most this many messages per receive
+RECEIVE_BATCH = 10
+
+# A message whose job has no record after this long is left over from a
+# dispatch that failed and refunded; younger ones wait for the record
+ORPHAN_SECONDS = 60
+
+# Kept across warm invocations so the lane rotation resumes where it stopped
+_scheduler = None
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = WeightedFairScheduler(lane_weights())
+    return _scheduler
+
+def job_table():
+    return storage.table(os.environ['TABLE_NAME'])
+
+def receive(lane, count):
+    response = storage.get_sqs_client().receive_message(
+        QueueUrl=queue_url(lane),
+        MaxNumberOfMessages=min(count, RECEIVE_BATCH),
+        AttributeNames=['SentTimestamp'],
+        WaitTimeSeconds=0
+    )
+    return response.get('Messages', [])
+
+def delete(lane, message):
+    storage.get_sqs_client().delete_message(QueueUrl=queue_url(lane), ReceiptHandle=message['ReceiptHandle'])
+
+def release(backlog):
+    """Make received but unstarted messages visible again right away."""
+    for lane, messages in backlog.items():
+        for message in messages:
+            storage.get_sqs_client().change_message_visibility(
+                QueueUrl=queue_url(lane),
+                ReceiptHandle=message['ReceiptHandle'],
+                VisibilityTimeout=0
+            )
+
+def start_job(lane, message, waiting):
+    """
+    Start one queued job; returns True if an execution was started. A
+    message whose record may still be landing goes to `waiting`, released
+    with the backlog once the pass ends.
+    """
+    body = message['Body']
+    job_id = json.loads(body)['jobId']
+    wait_ms = time.time() * 1000 - int(message['Attributes']['SentTimestamp'])
+    claimed = claim_job(job_table(), job_id)
+    if claimed is None and wait_ms < ORPHAN_SECONDS * 1000:
+        # The dispatcher's record write may still be landing
+        waiting[lane].append(message)
+        return False
+    if not claimed:
+        log.info('Dropping queued job', jobId=job_id, lane=lane, hasRecord=claimed is False)
+        delete(lane, message)
+        return False
+
+    try:
+        storage.get_sfn_client().start_execution(
+            stateMachineArn=os.environ['STATE_MACHINE_ARN'],
+            name=job_id,
+            input=body
+        )
+    except Exception as e:
+        log.error('Failed to start job', jobId=job_id, lane=lane, error=e)
+        release_job(job_table(), job_id)
+        return False
+    delete(lane, message)
+    tracer.record(f"queue_wait_{lane}", wait_ms)
+    log.info('Started job', jobId=job_id, lane=lane, waitMs=round(wait_ms))
+    return True
+
+def refill(backlog, drained, count):
+    """Receive for every lane whose backlog is empty and not yet drained."""
+    for lane in LANES:
+        if not backlog[lane] and lane not in drained:
+            backlog[lane].extend(receive(lane, count))
+            if not backlog[lane]:
+                drained.add(lane)
+
+@profiler.handler
+@log.handler
+@tracer.handler
+def handler(event, context):
+    """
+    Start as many queued jobs as there are free slots, choosing each one's
+    lane with the weighted fair scheduler. Messages received but not started
+    go back to their queue.
+    """
+    slots = free_slots(int((event or {}).get('released', 0)))
+    scheduler = get_scheduler()
+    backlog = {lane: deque() for lane in LANES}
+    waiting = {lane: [] for lane in LANES}
+    drained = set()
+    started = 0
+    try:
+        while slots > 0:
+            refill(backlog, drained, slots)
+            lane = scheduler.next([lane for lane in LANES if backlog[lane]])
+            if lane is None:
+                break
+            if start_job(lane, backlog[lane].popleft(), waiting):
+                slots -= 1
+                started += 1
+    finally:
+        release(backlog)
+        release(waiting)
+    return {'started': started}
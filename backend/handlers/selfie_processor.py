@@ -0,0 +1,115 @@
+"""
+SelfieProcessorFunction: server-side selfie thumbnails and model-ready copies
+
+Invoked asynchronously by POST /user/images once an upload is confirmed, or
+manually to backfill images that predate it:
+
+    {"backfill": true, "limit": 500}
+
+A backfill returns how many images it found and processed; invoke it again
+until `remaining` is 0.
+"""
+import os
+
+from core import storage
+from core.log import get_logger
+from core.profiling import Profiler
+from core.renditions import CACHE_CONTROL, render, rendition_key
+from core.selfies import selfie_table, to_api, update_selfie
+
+log = get_logger('selfie_processor')
+profiler = Profiler('selfie_processor')
+
+# name -> (longest side in pixels, JPEG quality). 'thumb' is for image lists,
+# shown at 48px (96px covers high-density screens); 'model' bounds what the
+# generator downloads and sends to Gemini as image/jpeg.
+SELFIE_VARIANTS = {
+    'thumb': (96, 75),
+    'model': (1024, 88),
+}
+
+# Image attributes each variant is recorded under
+VARIANT_FIELDS = {
+    'thumb': ('thumbnailS3Key', 'thumbnailUrl'),
+    'model': ('modelS3Key', 'modelUrl'),
+}
+
+@profiler.handler
+@log.handler
+def handler(event, context):
+    """
+    Process one confirmed upload ({"userId", "image"}) or run a backfill.
+    """
+    if event.get('backfill'):
+        return backfill(event.get('limit'))
+    return {'processed': process_image(event['userId'], event['image'])}
+
+def process_image(user_id, image):
+    """
+    Write the variants of one selfie and record them on its item.
+
+    Returns False if the image was deleted while it was being processed.
+    """
+    bucket_name = os.environ['BUCKET_NAME']
+    s3 = storage.get_s3_client()
+
+    source = s3.get_object(Bucket=bucket_name, Key=image['s3Key'])['Body'].read()
+    fields = {}
+    for name, body in render(source, 'JPEG', SELFIE_VARIANTS).items():
+        key = rendition_key(image['s3Key'], name, 'JPEG')
+        s3.put_object(
+            Bucket=bucket_name,
+            Key=key,
+            Body=body,
+            ContentType='image/jpeg',
+            CacheControl=CACHE_CONTROL
+        )
+        key_field, url_field = VARIANT_FIELDS[name]
+        fields[key_field] = key
+        fields[url_field] = storage.s3_url(bucket_name, key)
+
+    previous = update_selfie(user_id, image['id'], fields)
+    if previous is None:
+        # Deleted meanwhile; do not leave the variants behind
+        for name in SELFIE_VARIANTS:
+            s3.delete_object(Bucket=bucket_name, Key=fields[VARIANT_FIELDS[name][0]])
+        return False
+
+    # Thumbnails uploaded by older extension versions are superseded
+    old_thumbnail = previous.get('thumbnailS3Key')
+    if old_thumbnail and old_thumbnail != fields['thumbnailS3Key']:
+        s3.delete_object(Bucket=bucket_name, Key=old_thumbnail)
+    return True
+
+def images_to_backfill(selfies):
+    """(userId, image) for every selfie without server-generated variants."""
+    scan_args = {'FilterExpression': 'attribute_not_exists(modelS3Key)'}
+    while True:
+        page = selfies.scan(**scan_args)
+        for item in page.get('Items', []):
+            yield item['userId'], to_api(item)
+        if 'LastEvaluatedKey' not in page:
+            return
+        scan_args['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+def backfill(limit=None):
+    """Process images missing variants on a worker pool."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    pending = list(images_to_backfill(selfie_table()))
+    batch = pending[:limit] if limit else pending
+    workers = int(os.environ.get('SELFIE_WORKERS', '4'))
+
+    def safe_process(job):
+        user_id, image = job
+        try:
+            return process_image(user_id, image)
+        except Exception as e:
+            log.error('Failed to process image', imageId=image.get('id'), userId=user_id, error=e)
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        processed = sum(pool.map(safe_process, batch))
+
+    log.info('Backfill finished', processed=processed, batch=len(batch))
+    return {'found': len(pending), 'processed': processed, 'remaining': len(pending) - processed}
@@ -0,0 +1,51 @@
+"""
+StatusFunction: GET /status/{jobId}
+"""
+import datetime
+import os
+
+from core import http, storage
+from core.jobs import get_job, is_terminal
+from core.log import get_logger
+from core.profiling import Profiler
+from core.warmup import DYNAMODB, Warmup
+
+log = get_logger('status')
+profiler = Profiler('status')
+warmup = Warmup('status', DYNAMODB)
+
+# A finished job's status never changes, so clients and proxies may keep it;
+# anything else must be asked again on the next poll
+TERMINAL_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+PENDING_CACHE_CONTROL = 'no-store'
+
+@warmup.handler
+@profiler.handler
+@log.handler
+def handler(event, context):
+    """
+    Triggered by GET /status/{jobId}
+    Checks the job status (see core.jobs.get_job for the in-process caching);
+    404 for unknown jobs and batch records.
+    """
+    try:
+        job_id = event['pathParameters']['jobId']
+        table = storage.table(os.environ['TABLE_NAME'])
+
+        item = get_job(table, job_id)
+
+        # The record is written before its jobId is handed out, so a missing
+        # one is unknown; batch records (userId, pairs) are for their owner
+        # only, through GET /try-on/batch/{batchId}
+        if not item or item.get('kind') == 'batch':
+            return http.response(404, {'error': 'Job not found'}, {'Cache-Control': PENDING_CACHE_CONTROL})
+
+        # Update timestamp to reflect current server time as requested
+        item['timestamp'] = datetime.datetime.utcnow().isoformat()
+
+        cache_control = TERMINAL_CACHE_CONTROL if is_terminal(item) else PENDING_CACHE_CONTROL
+        return http.response(200, item, {'Cache-Control': cache_control})
+
+    except Exception as e:
+        log.error('Status check failed', error=e)
+        return http.error(500, str(e))
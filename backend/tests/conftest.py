@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so core modules can be imported
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import telemetry  # noqa: E402
+
+@pytest.fixture(autouse=True)
+def memory_exporter(monkeypatch):
+    """Keep every handler's EMF record in memory instead of printing it."""
+    exporter = telemetry.MemoryExporter()
+    monkeypatch.setattr(telemetry, 'exporter', exporter)
+    return exporter
@@ -13,7 +13,7 @@ def resource(service_name, *args, **kwargs):
     class DummyTable:
         def __init__(self):
             self.store = {}
-        def get_item(self, Key):
+        def get_item(self, Key, **kwargs):
             return {'Item': self.store.get(Key.get('userId'))}
         def put_item(self, Item):
             self.store[Item['userId']] = Item
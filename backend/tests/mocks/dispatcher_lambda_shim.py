@@ -1,3 +1,4 @@
 # Re-export the Lambda functions for test imports
 
-from backend.dispatcher_lambda import dispatcher_handler, get_user_id_from_token, get_user_info_from_token
+from handlers.dispatcher import handler as dispatcher_handler
+from core.auth import get_user_id_from_token, get_user_info_from_token
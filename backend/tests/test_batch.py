@@ -0,0 +1,195 @@
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so handlers can import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from botocore.exceptions import ClientError
+from core import ratelimit, storage
+from core.batches import batch_status
+from handlers import batch, saver
+
+def conditional_check_failed(item=None):
+    response = {'Error': {'Code': 'ConditionalCheckFailedException'}}
+    if item:
+        response['Item'] = item
+    return ClientError(response, 'UpdateItem')
+
+class Users:
+    """One profile: charges, refunds and slot releases by expression."""
+    def __init__(self, item):
+        self.item = item
+    def get_item(self, Key, **kwargs):
+        return {'Item': dict(self.item)}
+    def update_item(self, UpdateExpression, ExpressionAttributeValues, **kwargs):
+        values, item = ExpressionAttributeValues, self.item
+        slots = item.setdefault('inFlightJobs', set())
+        if UpdateExpression.startswith('set credits = if_not_exists'):
+            if item['credits'] < values[':dec'] or len(slots) >= values[':max_in_flight']:
+                raise conditional_check_failed(dict(item))
+            item['credits'] -= values[':dec']
+            slots.update(values[':job'])
+            return {'Attributes': dict(item)}
+        if ':slot_id' in values and values[':slot_id'] not in slots:
+            raise conditional_check_failed()
+        if ':inc' in values:
+            item['credits'] += values[':inc']
+        slots.difference_update(values.get(':job', ()))
+        return {}
+
+class Jobs:
+    def __init__(self, fail_put=()):
+        self.items = {}
+        self.fail_put = fail_put
+    def put_item(self, Item, **kwargs):
+        if Item['jobId'] in self.fail_put:
+            raise Exception('DynamoDB unavailable')
+        self.items[Item['jobId']] = Item
+    def get_item(self, Key, **kwargs):
+        return {'Item': self.items.get(Key['jobId'])}
+    def update_item(self, Key, ExpressionAttributeValues, **kwargs):
+        item = self.items[Key['jobId']]
+        if 'pendingJobs' in kwargs['UpdateExpression']:
+            if ExpressionAttributeValues[':job_id'] not in item.get('pendingJobs', ()):
+                raise conditional_check_failed()
+            item['pendingJobs'] = item['pendingJobs'] - ExpressionAttributeValues[':job']
+            if not item['pendingJobs']:
+                del item['pendingJobs']
+            return {'Attributes': {k: v for k, v in item.items() if k == 'pendingJobs'}}
+        if ':r' in ExpressionAttributeValues:
+            item.update(status=ExpressionAttributeValues[':s'], resultUrl=ExpressionAttributeValues[':r'])
+            return {}
+        if item['status'] != ExpressionAttributeValues[':processing']:
+            raise conditional_check_failed()
+        item.update(status=ExpressionAttributeValues[':s'], error=ExpressionAttributeValues[':e'])
+        return {}
+
+class Selfies:
+    def get_item(self, Key, **kwargs):
+        if Key['imageId'] == 'missing':
+            return {}
+        return {'Item': {'userId': Key['userId'], 'imageId': Key['imageId'], 's3Url': f"https://s3/{Key['imageId']}.jpg"}}
+
+class DynamoDB:
+    def __init__(self, users, jobs):
+        self.tables = {'Users': users, 'Jobs': jobs, 'Selfies': Selfies(), 'Generations': Jobs()}
+    def Table(self, name):
+        return self.tables[name]
+
+class SQS:
+    def __init__(self, fail_for=()):
+        self.messages = []
+        self.fail_for = fail_for
+    def send_message(self, QueueUrl, MessageBody):
+        body = json.loads(MessageBody)
+        if body['itemUrl'] in self.fail_for:
+            raise Exception('SQS unavailable')
+        self.messages.append(body)
+
+class Lambda:
+    def invoke(self, **kwargs):
+        pass
+
+ENV = {
+    'USER_TABLE_NAME': 'Users', 'USER_SELFIES_TABLE_NAME': 'Selfies', 'TABLE_NAME': 'Jobs',
+    'USER_GENERATIONS_TABLE_NAME': 'Generations', 'PAID_QUEUE_URL': 'paid', 'FREE_QUEUE_URL': 'free',
+    'SCHEDULER_FUNCTION': 'scheduler', 'TRY_ON_MAX_IN_FLIGHT': '1'
+}
+
+def request(method, path, body=None):
+    # As deployed: the HTTP API's named stage prefixes rawPath
+    return {
+        'rawPath': f"/prod{path}",
+        'headers': {'x-user-id': 'u1'},
+        'requestContext': {'stage': 'prod', 'http': {'method': method}},
+        'body': json.dumps(body) if body is not None else None
+    }
+
+def pairs(*item_names, selfie='s1'):
+    return {'pairs': [{'selfieId': selfie, 'itemUrl': f"https://shop/{name}.jpg"} for name in item_names]}
+
+@patch.dict(os.environ, ENV)
+class BatchHandlerTests(unittest.TestCase):
+    def setUp(self):
+        ratelimit._known_tat.clear()
+        self.users = Users({'userId': 'u1', 'credits': 5})
+        self.jobs = Jobs()
+        self.sqs = SQS()
+
+    def call(self, handler, event):
+        with patch.object(storage, 'dynamodb', DynamoDB(self.users, self.jobs)), \
+             patch.object(storage, 'sqs_client', self.sqs), \
+             patch.object(storage, 'lambda_client', Lambda()):
+            return handler(event, None)
+
+    def test_batch_charges_once_and_queues_a_job_per_pair(self):
+        response = self.call(batch.handler, request('POST', '/try-on/batch', pairs('a', 'b', 'c')))
+        body = json.loads(response['body'])
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(self.users.item['credits'], 2)
+        # The whole batch holds one in-flight slot
+        self.assertEqual(self.users.item['inFlightJobs'], {body['batchId']})
+        self.assertEqual([m['jobId'] for m in self.sqs.messages], body['jobIds'])
+        self.assertEqual({m['batchId'] for m in self.sqs.messages}, {body['batchId']})
+        self.assertEqual(self.jobs.items[body['batchId']]['pendingJobs'], set(body['jobIds']))
+
+    def test_last_finished_job_frees_the_slot_and_status_reports_each_pair(self):
+        body = json.loads(self.call(batch.handler, request('POST', '/try-on/batch', pairs('a', 'b')))['body'])
+        first, second = body['jobIds']
+        for job_id, event in ((first, {'resultUrl': 'https://r/1.png'}), (second, {'status': 'FAILED', 'creditCost': 1})):
+            self.jobs.items[job_id]['status'] = 'PROCESSING'
+            self.call(saver.handler, dict(event, jobId=job_id, userId='u1', batchId=body['batchId']))
+            # A repeated delivery of the same result changes nothing
+            self.call(saver.handler, dict(event, jobId=job_id, userId='u1', batchId=body['batchId']))
+
+        self.assertEqual(self.users.item['inFlightJobs'], set())
+        # Finishing keeps the record's other fields
+        self.assertEqual(self.jobs.items[first]['userId'], 'u1')
+        self.assertEqual(self.jobs.items[first]['batchId'], body['batchId'])
+        response = self.call(batch.handler, request('GET', f"/try-on/batch/{body['batchId']}"))
+        status = json.loads(response['body'])
+        self.assertEqual(status['status'], 'COMPLETED')
+        self.assertEqual(status['counts'], {'COMPLETED': 1, 'FAILED': 1, 'PROCESSING': 0})
+        self.assertEqual([item['itemUrl'] for item in status['items']], ['https://shop/a.jpg', 'https://shop/b.jpg'])
+
+    def test_pairs_that_cannot_be_queued_are_refunded(self):
+        self.sqs = SQS(fail_for={'https://shop/b.jpg'})
+        body = json.loads(self.call(batch.handler, request('POST', '/try-on/batch', pairs('a', 'b')))['body'])
+
+        self.assertEqual(len(body['failedJobIds']), 1)
+        self.assertEqual(self.users.item['credits'], 4)
+        self.assertEqual(self.users.item['inFlightJobs'], {body['batchId']})
+
+    def test_rejects_unknown_selfie_and_unaffordable_batch(self):
+        response = self.call(batch.handler, request('POST', '/try-on/batch', pairs('a', selfie='missing')))
+        self.assertEqual(response['statusCode'], 404)
+        self.assertEqual(self.users.item['credits'], 5)
+        self.assertEqual(self.users.item['inFlightJobs'], set())
+
+        response = self.call(batch.handler, request('POST', '/try-on/batch', pairs(*'abcdef')))
+        self.assertEqual(response['statusCode'], 402)
+
+        response = self.call(batch.handler, request('POST', '/try-on/batch', pairs(*'abcdefghijk')))
+        self.assertEqual(response['statusCode'], 400)
+
+    def test_other_users_batch_is_not_found(self):
+        self.jobs.items['b1'] = {'jobId': 'b1', 'kind': 'batch', 'userId': 'u2', 'pairs': []}
+        response = self.call(batch.handler, request('GET', '/try-on/batch/b1'))
+        self.assertEqual(response['statusCode'], 404)
+
+class BatchStatusTests(unittest.TestCase):
+    def test_unwritten_job_counts_as_failed(self):
+        record = {'jobId': 'b1', 'pairs': [{'jobId': 'j1'}, {'jobId': 'j2'}]}
+        status = batch_status(record, [{'status': 'PROCESSING'}, None])
+        self.assertEqual(status['status'], 'PROCESSING')
+        self.assertEqual(status['items'][1]['status'], 'FAILED')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so core modules can be imported
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import storage
+from core.account import delete_generations, purge_account
+from core.bulk import batch_delete, delete_s3_keys
+from handlers import profile
+
+class BatchS3:
+    def __init__(self, objects=(), page_size=2):
+        self.objects = sorted(objects)
+        self.page_size = page_size
+        self.batches = []
+    def delete_objects(self, Bucket, Delete):
+        keys = [o['Key'] for o in Delete['Objects']]
+        self.batches.append(keys)
+        self.objects = [k for k in self.objects if k not in keys]
+        return {}
+    def list_objects_v2(self, Bucket, Prefix, ContinuationToken=0):
+        matching = [k for k in self.objects if k.startswith(Prefix)]
+        page = matching[ContinuationToken:ContinuationToken + self.page_size]
+        more = ContinuationToken + self.page_size < len(matching)
+        response = {'Contents': [{'Key': k} for k in page], 'IsTruncated': more}
+        if more:
+            response['NextContinuationToken'] = ContinuationToken + self.page_size
+        return response
+
+class BatchDynamoDB:
+    """batch_write_item that leaves the last item of each first request unprocessed."""
+    def __init__(self, tables=None, throttle=True):
+        self.tables = tables or {}
+        self.throttle = throttle
+        self.calls = []
+    def Table(self, name):
+        return self.tables[name]
+    def batch_write_item(self, RequestItems):
+        (name, requests), = RequestItems.items()
+        self.calls.append(len(requests))
+        if self.throttle and len(requests) > 1:
+            requests, unprocessed = requests[:-1], requests[-1:]
+        else:
+            unprocessed = []
+        for r in requests:
+            self.tables[name].delete(r['DeleteRequest']['Key'])
+        return {'UnprocessedItems': {name: unprocessed} if unprocessed else {}}
+
+class GenerationsTable:
+    def __init__(self, items, page_size=2):
+        self.items = list(items)
+        self.page_size = page_size
+        self.deleted = []
+    def query(self, ExclusiveStartKey=None, **kwargs):
+        start = ExclusiveStartKey['index'] if ExclusiveStartKey else 0
+        page = self.items[start:start + self.page_size]
+        response = {'Items': page}
+        if start + self.page_size < len(self.items):
+            response['LastEvaluatedKey'] = {'index': start + self.page_size}
+        return response
+    def delete(self, key):
+        self.deleted.append(key)
+    def delete_item(self, Key):
+        self.deleted.append(Key)
+
+def generation(n):
+    return {'userId': 'u1', 'timestamp': f"t{n}", 'jobId': f"job-{n}",
+            'resultUrl': f"https://bucket.s3.amazonaws.com/results/u1/job-{n}.png",
+            'renditions': {'thumb': f"https://bucket.s3.amazonaws.com/results/u1/job-{n}.thumb.webp"}}
+
+class BulkPrimitiveTests(unittest.TestCase):
+    def test_s3_keys_go_in_batches_of_1000(self):
+        s3 = BatchS3()
+        delete_s3_keys(s3, 'bucket', [f"k{i}" for i in range(2500)])
+        self.assertEqual([len(b) for b in s3.batches], [1000, 1000, 500])
+
+    def test_unprocessed_items_are_retried(self):
+        table = GenerationsTable([])
+        db = BatchDynamoDB({'T': table})
+        failed = batch_delete(db, 'T', [{'id': i} for i in range(30)], base_delay=0)
+
+        self.assertEqual(failed, [])
+        self.assertEqual(sorted(k['id'] for k in table.deleted), list(range(30)))
+        self.assertEqual(db.calls, [25, 1, 5, 1])
+
+@patch.dict(os.environ, {'USER_GENERATIONS_TABLE_NAME': 'Gen', 'TABLE_NAME': 'Jobs', 'USER_TABLE_NAME': 'Users',
+                              'USER_SELFIES_TABLE_NAME': 'Selfies'})
+class AccountDeletionTests(unittest.TestCase):
+    def run_with(self, fn, *args, s3=None, **kwargs):
+        self.gen = GenerationsTable([generation(n) for n in range(5)])
+        # The index also holds a failed job and a batch record, which have no generation
+        self.jobs = GenerationsTable([{'jobId': j, 'userId': 'u1'} for j in ('job-0', 'failed-1', 'batch-1')])
+        self.users = GenerationsTable([])
+        self.selfies = GenerationsTable([{'userId': 'u1', 'imageId': 'a', 's3Key': 'uploads/u1/a.png'}])
+        tables = {'Gen': self.gen, 'Jobs': self.jobs, 'Users': self.users, 'Selfies': self.selfies}
+        db = BatchDynamoDB(tables, throttle=False)
+        self.s3 = s3 or BatchS3()
+        with patch.object(storage, 'dynamodb', db), patch.object(storage, 's3_client', self.s3):
+            return fn(*args, **kwargs)
+
+    def test_delete_selected_generations_across_pages(self):
+        result = self.run_with(delete_generations, 'u1', 'bucket', ['job-0', 'job-3'])
+
+        self.assertEqual(result, {'deleted': 2, 'failed': 0})
+        self.assertEqual(sorted(k['timestamp'] for k in self.gen.deleted), ['t0', 't3'])
+        deleted_keys = sorted(k for batch in self.s3.batches for k in batch)
+        self.assertEqual(deleted_keys, ['results/u1/job-0.png', 'results/u1/job-0.thumb.webp',
+                                        'results/u1/job-3.png', 'results/u1/job-3.thumb.webp'])
+
+    def test_purge_removes_everything_then_profile(self):
+        s3 = BatchS3(['uploads/u1/a.png', 'uploads/u1/a.thumb.jpg', 'results/u1/x.png', 'uploads/u2/keep.png'])
+        result = self.run_with(purge_account, 'u1', 'bucket', s3=s3)
+
+        self.assertTrue(result['complete'])
+        self.assertEqual(result['generationsDeleted'], 5)
+        deleted_jobs = {k['jobId'] for k in self.jobs.deleted}
+        self.assertEqual(deleted_jobs, {f"job-{n}" for n in range(5)} | {'failed-1', 'batch-1'})
+        self.assertEqual(s3.objects, ['uploads/u2/keep.png'])
+        self.assertEqual(self.selfies.deleted, [{'userId': 'u1', 'imageId': 'a'}])
+        self.assertEqual(self.users.deleted, [{'userId': 'u1'}])
+
+@patch.dict(os.environ, {'USER_SELFIES_TABLE_NAME': 'Selfies', 'BUCKET_NAME': 'bucket'})
+class SelfieDeletionTests(unittest.TestCase):
+    def call(self, method, path, body, deleted):
+        event = {
+            'rawPath': path, 'headers': {'x-user-id': 'u1'},
+            'requestContext': {'http': {'method': method}}, 'body': json.dumps(body)
+        }
+        self.s3 = BatchS3(['uploads/u1/a.png'])
+        selfie = {'id': 'a', 's3Key': 'uploads/u1/a.png'}
+        with patch.object(storage, 's3_client', self.s3), \
+             patch.object(profile, 'list_selfies', return_value=[selfie]), \
+             patch.object(profile, 'get_selfie', return_value=selfie), \
+             patch.object(profile, 'delete_selfies', return_value=deleted):
+            return profile.handler(event, None)['statusCode']
+
+    def test_objects_stay_when_the_items_were_deleted_meanwhile(self):
+        self.assertEqual(self.call('POST', '/user/images/delete', {'fileIds': ['a']}, False), 409)
+        self.assertEqual(self.s3.objects, ['uploads/u1/a.png'])
+        self.assertEqual(self.call('DELETE', '/user/images/a', None, False), 404)
+        self.assertEqual(self.s3.objects, ['uploads/u1/a.png'])
+
+        self.assertEqual(self.call('POST', '/user/images/delete', {'fileIds': ['a']}, True), 200)
+        self.assertEqual(self.s3.objects, [])
+
+if __name__ == '__main__':
+    unittest.main()
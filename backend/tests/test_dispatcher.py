@@ -5,32 +5,59 @@ from unittest.mock import patch, MagicMock
 
 import sys
 
-# Add mocks directory to path so imports of boto3/botocore work
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so handlers can import core modules
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Import the functions to test using package import
-from backend.dispatcher_lambda import dispatcher_handler, get_user_id_from_token, get_user_info_from_token
+from botocore.exceptions import ClientError
+from core import ratelimit, storage, telemetry
+from core.auth import get_user_id_from_token, get_user_info_from_token
+from core.telemetry import MemoryExporter
+from handlers import status
+from handlers.dispatcher import handler as dispatcher_handler
+
+def conditional_check_failed(item=None):
+    response = {'Error': {'Code': 'ConditionalCheckFailedException'}}
+    if item:
+        response['Item'] = item
+    return ClientError(response, 'UpdateItem')
 
 # Simple dummy DynamoDB implementation
 class DummyTable:
     def __init__(self):
         self.store = {}
-    def get_item(self, Key):
+    def get_item(self, Key, **kwargs):
         user_id = Key.get('userId')
         return {'Item': self.store.get(user_id)}
-    def put_item(self, Item):
+    def put_item(self, Item, **kwargs):
+        if kwargs.get('ConditionExpression') == 'attribute_not_exists(userId)' and Item['userId'] in self.store:
+            raise conditional_check_failed(self.store[Item['userId']])
         self.store[Item['userId']] = Item
     def update_item(self, **kwargs):
         key = kwargs.get('Key', {})
         uid = key.get('userId')
         item = self.store.get(uid, {})
         expr = kwargs.get('UpdateExpression', '')
+        condition = kwargs.get('ConditionExpression', '')
         # Handle credit decrement
         if 'set credits = if_not_exists(credits, :start) - :dec' in expr:
+            if 'attribute_exists(userId)' in condition and uid not in self.store:
+                raise conditional_check_failed()
             start = kwargs['ExpressionAttributeValues'].get(':start', 0)
             dec = kwargs['ExpressionAttributeValues'].get(':dec', 1)
+            in_flight = item.get('inFlightJobs', set())
+            if item.get('credits', start) < dec or len(in_flight) >= kwargs['ExpressionAttributeValues'][':max_in_flight']:
+                raise conditional_check_failed(item)
             credits = item.get('credits', start) - dec
             item['credits'] = credits
+            item['inFlightJobs'] = in_flight | kwargs['ExpressionAttributeValues'][':job']
+            self.store[uid] = item
+            return {'Attributes': dict(item)}
+        # Handle refund
+        elif 'set credits = credits + :inc' in expr:
+            item['credits'] = item['credits'] + kwargs['ExpressionAttributeValues'][':inc']
+            item['inFlightJobs'] = item.get('inFlightJobs', set()) - kwargs['ExpressionAttributeValues'][':job']
         # Handle generic SET updates for email/name
         elif expr.startswith('SET'):
             names = kwargs.get('ExpressionAttributeNames', {})
@@ -42,19 +69,71 @@ class DummyTable:
                 if value_key in values:
                     item[attr_name] = values[value_key]
         self.store[uid] = item
+        return {}
+
+class DummySelfieTable:
+    def __init__(self):
+        self.store = {}
+    def get_item(self, Key, **kwargs):
+        return {'Item': self.store.get((Key['userId'], Key['imageId']))}
+    def put_item(self, Item, **kwargs):
+        self.store[(Item['userId'], Item['imageId'])] = Item
+
+SELFIE = {'userId': 'test-user-id', 'imageId': 'selfie-123', 's3Url': 'https://s3/selfie.jpg'}
 
 class DummyDynamoDB:
     def __init__(self):
-        self.tables = {}
+        self.tables = {'Selfies': DummySelfieTable()}
     def Table(self, name):
         if name not in self.tables:
             self.tables[name] = DummyTable()
         return self.tables[name]
 
-# Dummy Step Functions client
+# Dummy SQS client holding the lane queues
+class DummySQS:
+    def __init__(self, fail_send=False):
+        self.fail_send = fail_send
+        self.messages = []
+    def send_message(self, QueueUrl, MessageBody):
+        if self.fail_send:
+            raise Exception('SQS unavailable')
+        self.messages.append((QueueUrl, json.loads(MessageBody)))
+        return {'MessageId': str(len(self.messages))}
+
+class DummyLambda:
+    def __init__(self):
+        self.invocations = []
+    def invoke(self, **kwargs):
+        self.invocations.append(kwargs)
+
+class DummyJobTable:
+    def __init__(self, fail_put=False):
+        self.fail_put = fail_put
+        self.jobs = {}
+    def put_item(self, Item, **kwargs):
+        if self.fail_put:
+            raise Exception('DynamoDB unavailable')
+        self.jobs[Item['jobId']] = Item
+    def update_item(self, **kwargs):
+        if kwargs['UpdateExpression'] == 'remove startedAt':
+            self.jobs[kwargs['Key']['jobId']].pop('startedAt')
+            return
+        values = kwargs['ExpressionAttributeValues']
+        self.jobs[kwargs['Key']['jobId']].update(status=values[':s'], error=values[':e'])
+
 class DummySFN:
-    def start_execution(self, **kwargs):
-        return {'executionArn': 'arn:aws:states:execution:test'}
+    """`running` executions; start_execution fails with fail_start."""
+    def __init__(self, running=0, fail_start=False):
+        self.running = running
+        self.fail_start = fail_start
+        self.started = []
+    def list_executions(self, maxResults, **kwargs):
+        return {'executions': [{}] * min(self.running, maxResults)}
+    def start_execution(self, name, input, **kwargs):
+        if self.fail_start:
+            raise Exception('Step Functions unavailable')
+        self.started.append(json.loads(input))
+        return {'executionArn': f"arn:execution:{name}"}
 
 class DispatcherHandlerTests(unittest.TestCase):
     @patch('urllib.request.urlopen')
@@ -71,12 +150,13 @@ class DispatcherHandlerTests(unittest.TestCase):
 
         # Set up dummy DynamoDB and Step Functions
         db_instance = DummyDynamoDB()
-        sfn_instance = DummySFN()
+        sqs_instance = DummySQS()
 
         # Mock environment variables
         os.environ['USER_TABLE_NAME'] = 'Users'
+        os.environ['USER_SELFIES_TABLE_NAME'] = 'Selfies'
         os.environ['TABLE_NAME'] = 'Jobs'
-        os.environ['STATE_MACHINE_ARN'] = 'arn:aws:states:us-east-1:123456789012:stateMachine:TestStateMachine'
+        os.environ.update(PAID_QUEUE_URL='paid-queue', FREE_QUEUE_URL='free-queue', SCHEDULER_FUNCTION='scheduler')
 
         event = {
             'headers': {'Authorization': 'Bearer fake-token'},
@@ -87,8 +167,9 @@ class DispatcherHandlerTests(unittest.TestCase):
             })
         }
 
-        with patch('backend.dispatcher_lambda.dynamodb', db_instance), \
-             patch('backend.dispatcher_lambda.sfn_client', sfn_instance):
+        with patch('core.storage.dynamodb', db_instance), \
+             patch('core.storage.sqs_client', sqs_instance), \
+             patch('core.storage.lambda_client', DummyLambda()):
             
             response = dispatcher_handler(event, None)
             
@@ -123,15 +204,16 @@ class DispatcherHandlerTests(unittest.TestCase):
             'userId': 'test-user-id',
             'credits': 5,
             'email': 'test@example.com',
-            'name': 'Test User',
-            'images': [{'id': 'selfie-123', 's3Url': 'https://s3/selfie.jpg'}]
+            'name': 'Test User'
         })
+        db_instance.Table('Selfies').put_item(SELFIE)
         
-        sfn_instance = DummySFN()
+        sqs_instance = DummySQS()
 
         os.environ['USER_TABLE_NAME'] = 'Users'
+        os.environ['USER_SELFIES_TABLE_NAME'] = 'Selfies'
         os.environ['TABLE_NAME'] = 'Jobs'
-        os.environ['STATE_MACHINE_ARN'] = 'arn:aws:states:us-east-1:123456789012:stateMachine:TestStateMachine'
+        os.environ.update(PAID_QUEUE_URL='paid-queue', FREE_QUEUE_URL='free-queue', SCHEDULER_FUNCTION='scheduler')
 
         event = {
             'headers': {'Authorization': 'Bearer fake-token'},
@@ -142,15 +224,205 @@ class DispatcherHandlerTests(unittest.TestCase):
             })
         }
 
-        with patch('backend.dispatcher_lambda.dynamodb', db_instance), \
-             patch('backend.dispatcher_lambda.sfn_client', sfn_instance):
+        with patch('core.storage.dynamodb', db_instance), \
+             patch('core.storage.sqs_client', sqs_instance), \
+             patch('core.storage.lambda_client', DummyLambda()):
 
             response = dispatcher_handler(event, None)
             body = json.loads(response['body'])
             
             self.assertEqual(response['statusCode'], 200)
             self.assertIn('jobId', body)
-            self.assertIn('executionArn', body)
+            self.assertEqual(body['lane'], 'free')
+            [(queue, message)] = sqs_instance.messages
+            self.assertEqual(queue, 'free-queue')
+            self.assertEqual(message['jobId'], body['jobId'])
+
+    def _run_dispatcher_for_stored_user(self, profile, selfie_id='selfie-123', sqs=None, job_table=None, lambda_client=None, item_urls=None, sfn=None):
+        db_instance = DummyDynamoDB()
+        db_instance.Table('Users').put_item(profile)
+        db_instance.Table('Selfies').put_item(dict(SELFIE, userId=profile['userId']))
+        if job_table:
+            db_instance.tables['Jobs'] = job_table
+
+        os.environ['USER_TABLE_NAME'] = 'Users'
+        os.environ['USER_SELFIES_TABLE_NAME'] = 'Selfies'
+        os.environ['TABLE_NAME'] = 'Jobs'
+        os.environ.update(PAID_QUEUE_URL='paid-queue', FREE_QUEUE_URL='free-queue', SCHEDULER_FUNCTION='scheduler')
+
+        event = {
+            'headers': {'x-user-id': profile['userId']},
+            'body': json.dumps({'itemUrl': 'https://example.com/item.jpg', 'selfieId': selfie_id}
+                               if item_urls is None else {'itemUrls': item_urls, 'selfieId': selfie_id})
+        }
+        # Without a state machine every job goes through its lane
+        direct = {'STATE_MACHINE_ARN': 'arn:sm', 'MAX_RUNNING_JOBS': '4'} if sfn else {}
+        with patch('core.storage.dynamodb', db_instance), \
+             patch('core.storage.sqs_client', sqs or DummySQS()), \
+             patch('core.storage.lambda_client', lambda_client or DummyLambda()), \
+             patch('core.storage.sfn_client', sfn), \
+             patch.dict(os.environ, direct):
+            response = dispatcher_handler(event, None)
+        return response, db_instance.Table('Users').store[profile['userId']]
+
+    def test_dispatcher_rejects_user_without_credits(self):
+        response, stored_user = self._run_dispatcher_for_stored_user({
+            'userId': 'broke-user',
+            'credits': 0
+        })
+
+        self.assertEqual(response['statusCode'], 402)
+        self.assertEqual(json.loads(response['body'])['code'], 'INSUFFICIENT_CREDITS')
+        self.assertEqual(stored_user['credits'], 0)
+
+    def test_dispatcher_refunds_credit_for_unknown_selfie(self):
+        response, stored_user = self._run_dispatcher_for_stored_user({
+            'userId': 'test-user-id',
+            'credits': 3
+        }, selfie_id='other-selfie')
+
+        self.assertEqual(response['statusCode'], 404)
+        self.assertEqual(stored_user['credits'], 3)
+        self.assertEqual(stored_user['inFlightJobs'], set())
+
+    def test_dispatcher_charges_one_credit_per_outfit_item(self):
+        sqs = DummySQS()
+        urls = ['https://example.com/top.jpg', 'https://example.com/trousers.jpg']
+        response, stored_user = self._run_dispatcher_for_stored_user({
+            'userId': 'outfit-user',
+            'credits': 3
+        }, sqs=sqs, item_urls=urls)
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(stored_user['credits'], 1)
+        [(_, message)] = sqs.messages
+        self.assertEqual(message['itemUrls'], urls)
+        self.assertEqual(message['itemUrl'], urls[0])
+        self.assertEqual(message['creditCost'], 2)
+
+    def test_dispatcher_rejects_outfit_the_user_cannot_afford_or_too_large(self):
+        urls = [f"https://example.com/{n}.jpg" for n in range(4)]
+        response, stored_user = self._run_dispatcher_for_stored_user({
+            'userId': 'outfit-user',
+            'credits': 2
+        }, item_urls=urls[:3])
+        self.assertEqual(response['statusCode'], 402)
+        self.assertEqual(stored_user['credits'], 2)
+
+        response, _ = self._run_dispatcher_for_stored_user({
+            'userId': 'outfit-user',
+            'credits': 9
+        }, item_urls=urls)
+        self.assertEqual(response['statusCode'], 400)
+
+    def test_dispatcher_returns_429_when_too_many_jobs_in_flight(self):
+        response, stored_user = self._run_dispatcher_for_stored_user({
+            'userId': 'busy-user',
+            'credits': 3,
+            'inFlightJobs': {'j1', 'j2', 'j3'}
+        })
+
+        self.assertEqual(response['statusCode'], 429)
+        self.assertEqual(json.loads(response['body'])['code'], 'TOO_MANY_IN_FLIGHT')
+        self.assertEqual(response['headers']['Retry-After'], str(ratelimit.IN_FLIGHT_RETRY_SECONDS))
+        self.assertEqual(stored_user['credits'], 3)
+
+    def test_dispatcher_rejects_rate_limited_user_from_memory(self):
+        sqs = DummySQS()
+        with patch.dict(ratelimit._known_tat, {'eager-user': 10**10}):
+            response, stored_user = self._run_dispatcher_for_stored_user({
+                'userId': 'eager-user',
+                'credits': 3
+            }, sqs=sqs)
+
+        self.assertEqual(response['statusCode'], 429)
+        self.assertEqual(json.loads(response['body'])['code'], 'RATE_LIMITED')
+        self.assertGreater(int(response['headers']['Retry-After']), 0)
+        self.assertEqual(stored_user['credits'], 3)
+        self.assertEqual(sqs.messages, [])
+
+    def test_dispatcher_times_stages_and_passes_trace_to_workflow(self):
+        sqs = DummySQS()
+        exporter = MemoryExporter()
+        with patch.object(telemetry, 'exporter', exporter):
+            response, _ = self._run_dispatcher_for_stored_user({
+                'userId': 'test-user-id',
+                'credits': 3
+            }, sqs=sqs)
+
+        self.assertEqual(response['statusCode'], 200)
+        record, = exporter.records
+        self.assertEqual(record['jobId'], json.loads(response['body'])['jobId'])
+        for stage in ('token_validation', 'charge_credit', 'selfie_read', 'job_write', 'enqueue', 'total'):
+            self.assertEqual(len(exporter.durations(stage)), 1, stage)
+        self.assertEqual(sqs.messages[0][1]['trace'], {'traceId': record['traceId'], 'spanId': record['spanId']})
+
+    def test_dispatcher_queues_paying_user_on_paid_lane_and_kicks_scheduler(self):
+        sqs, lambda_client, job_table = DummySQS(), DummyLambda(), DummyJobTable()
+        response, _ = self._run_dispatcher_for_stored_user({
+            'userId': 'test-user-id',
+            'credits': 3,
+            'processed_payments': ['order-1']
+        }, sqs=sqs, job_table=job_table, lambda_client=lambda_client)
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(json.loads(response['body'])['lane'], 'paid')
+        self.assertEqual(sqs.messages[0][0], 'paid-queue')
+        [job] = job_table.jobs.values()
+        self.assertEqual((job['status'], job['lane']), ('PROCESSING', 'paid'))
+        [kick] = lambda_client.invocations
+        self.assertEqual((kick['FunctionName'], kick['InvocationType']), ('scheduler', 'Event'))
+
+    def test_dispatcher_starts_job_directly_while_a_slot_is_free(self):
+        sqs, sfn, lambda_client, job_table = DummySQS(), DummySFN(running=3), DummyLambda(), DummyJobTable()
+        response, _ = self._run_dispatcher_for_stored_user({
+            'userId': 'test-user-id',
+            'credits': 3
+        }, sqs=sqs, job_table=job_table, lambda_client=lambda_client, sfn=sfn)
+
+        body = json.loads(response['body'])
+        self.assertEqual(body['executionArn'], f"arn:execution:{body['jobId']}")
+        self.assertEqual(sfn.started[0]['jobId'], body['jobId'])
+        # Recorded as started, so the scheduler never claims it
+        self.assertIn('startedAt', job_table.jobs[body['jobId']])
+        self.assertEqual((sqs.messages, lambda_client.invocations), ([], []))
+
+    def test_dispatcher_queues_when_every_slot_is_taken_or_the_start_fails(self):
+        for sfn in (DummySFN(running=4), DummySFN(fail_start=True)):
+            sqs, job_table = DummySQS(), DummyJobTable()
+            response, _ = self._run_dispatcher_for_stored_user({
+                'userId': 'test-user-id',
+                'credits': 3
+            }, sqs=sqs, job_table=job_table, sfn=sfn)
+
+            body = json.loads(response['body'])
+            self.assertNotIn('executionArn', body)
+            self.assertEqual(sqs.messages[0][1]['jobId'], body['jobId'])
+            self.assertNotIn('startedAt', job_table.jobs[body['jobId']])
+
+    def test_dispatcher_marks_job_failed_when_job_cannot_be_queued(self):
+        job_table = DummyJobTable()
+        response, stored_user = self._run_dispatcher_for_stored_user({
+            'userId': 'test-user-id',
+            'credits': 3
+        }, sqs=DummySQS(fail_send=True), job_table=job_table)
+
+        self.assertEqual(response['statusCode'], 500)
+        self.assertEqual(stored_user['credits'], 3)
+        [job] = job_table.jobs.values()
+        self.assertEqual(job['status'], 'FAILED')
+
+    def test_dispatcher_refunds_when_job_record_fails(self):
+        # The queued message has no record to claim; the scheduler drops it
+        sqs = DummySQS()
+        response, stored_user = self._run_dispatcher_for_stored_user({
+            'userId': 'test-user-id',
+            'credits': 3
+        }, sqs=sqs, job_table=DummyJobTable(fail_put=True))
+
+        self.assertEqual(response['statusCode'], 500)
+        self.assertEqual(stored_user['credits'], 3)
+        self.assertEqual(len(sqs.messages), 1)
 
     @patch('urllib.request.urlopen')
     def test_get_user_id_from_token_fallback(self, mock_urlopen):
@@ -174,5 +446,22 @@ class DispatcherHandlerTests(unittest.TestCase):
         self.assertEqual(info['email'], 'info@example.com')
         self.assertEqual(info['name'], 'Info User')
 
+class LazyClientTests(unittest.TestCase):
+    def test_status_handler_builds_only_dynamodb(self):
+        fake_boto3 = MagicMock()
+        fake_boto3.client.return_value.get_item.return_value = {}
+        os.environ['TABLE_NAME'] = 'Jobs'
+
+        with patch.object(storage, 'boto3', fake_boto3), \
+             patch.object(storage, 'dynamodb', None), \
+             patch.object(storage, 'dynamodb_client', None), \
+             patch.object(storage, 'sfn_client', None), \
+             patch.object(storage, 's3_client', None):
+            status.handler({'pathParameters': {'jobId': 'job-1'}}, None)
+            status.handler({'pathParameters': {'jobId': 'job-2'}}, None)
+
+        fake_boto3.client.assert_called_once_with('dynamodb')
+        fake_boto3.resource.assert_not_called()
+
 if __name__ == '__main__':
     unittest.main()
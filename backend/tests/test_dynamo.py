@@ -0,0 +1,103 @@
+import os
+import unittest
+from decimal import Decimal
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so core modules can be imported
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from botocore.exceptions import ClientError
+from core.dynamo import Resource, deserialize_item, serialize, serialize_item
+
+PROFILE = {
+    'userId': 'u1', 'credits': 5, 'ratio': 0.5, 'active': True, 'note': None,
+    'renditions': {'thumb': 'https://bucket/t.webp'}, 'tags': ['a', 'b'],
+}
+
+class RecordingClient:
+    """Low-level client that records requests and answers with canned responses."""
+    def __init__(self, responses=None, error=None):
+        self.responses = responses or {}
+        self.error = error
+        self.requests = []
+    def __getattr__(self, operation):
+        def call(**request):
+            self.requests.append((operation, request))
+            if self.error:
+                raise self.error
+            return dict(self.responses.get(operation, {}))
+        return call
+
+class MarshallingTests(unittest.TestCase):
+    def test_nested_values(self):
+        self.assertEqual(
+            serialize({'n': 1, 'ok': True, 'tags': ['x'], 'none': None}),
+            {'M': {'n': {'N': '1'}, 'ok': {'BOOL': True}, 'tags': {'L': [{'S': 'x'}]}, 'none': {'NULL': True}}}
+        )
+
+    def test_round_trip_gives_plain_numbers(self):
+        item = deserialize_item(serialize_item(PROFILE))
+        self.assertEqual(item, PROFILE)
+        self.assertIs(type(item['credits']), int)
+
+    def test_sets_become_string_or_number_sets(self):
+        self.assertEqual(serialize({'j2', 'j1'}), {'SS': ['j1', 'j2']})
+        self.assertEqual(serialize({2, 1}), {'NS': ['1', '2']})
+
+    def test_values_dynamodb_rejects_fail_here(self):
+        for value in (set(), {'inFlightJobs': set()}, float('inf'), float('nan'), Decimal('NaN'), {1.5, float('-inf')}):
+            with self.assertRaises(ValueError):
+                serialize(value)
+
+class TableTests(unittest.TestCase):
+    def test_requests_are_typed_and_responses_plain(self):
+        client = RecordingClient({'update_item': {'Attributes': {'credits': {'N': '4'}}}})
+        table = Resource(client).Table('Users')
+
+        response = table.update_item(
+            Key={'userId': 'u1'},
+            UpdateExpression='set credits = credits - :dec',
+            ExpressionAttributeValues={':dec': 1},
+            ReturnValues='UPDATED_NEW'
+        )
+
+        operation, request = client.requests[0]
+        self.assertEqual(request['TableName'], 'Users')
+        self.assertEqual(request['Key'], {'userId': {'S': 'u1'}})
+        self.assertEqual(request['ExpressionAttributeValues'], {':dec': {'N': '1'}})
+        self.assertEqual(response['Attributes'], {'credits': 4})
+
+    def test_query_pages_are_decoded(self):
+        client = RecordingClient({'query': {
+            'Items': [serialize_item(PROFILE)],
+            'LastEvaluatedKey': {'userId': {'S': 'u1'}, 'timestamp': {'S': 't1'}}
+        }})
+        response = Resource(client).Table('Gen').query(KeyConditionExpression='userId = :u',
+                                                      ExpressionAttributeValues={':u': 'u1'})
+        self.assertEqual(response['Items'], [PROFILE])
+        self.assertEqual(response['LastEvaluatedKey'], {'userId': 'u1', 'timestamp': 't1'})
+
+    def test_old_item_on_condition_failure_is_decoded(self):
+        error = ClientError({'Error': {'Code': 'ConditionalCheckFailedException'},
+                             'Item': {'credits': {'N': '0'}}}, 'UpdateItem')
+        table = Resource(RecordingClient(error=error)).Table('Users')
+        with self.assertRaises(ClientError) as raised:
+            table.update_item(Key={'userId': 'u1'}, ReturnValuesOnConditionCheckFailure='ALL_OLD')
+        self.assertEqual(raised.exception.response['Item'], {'credits': 0})
+
+    def test_batch_write_round_trips_unprocessed_keys(self):
+        client = RecordingClient({'batch_write_item': {
+            'UnprocessedItems': {'Gen': [{'DeleteRequest': {'Key': {'userId': {'S': 'u1'}}}}]}
+        }})
+        response = Resource(client).batch_write_item(RequestItems={
+            'Gen': [{'DeleteRequest': {'Key': {'userId': 'u1'}}}]
+        })
+        self.assertEqual(client.requests[0][1]['RequestItems']['Gen'][0]['DeleteRequest']['Key'],
+                         {'userId': {'S': 'u1'}})
+        self.assertEqual(response['UnprocessedItems'], {'Gen': [{'DeleteRequest': {'Key': {'userId': 'u1'}}}]})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import io
+import json
+import os
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so core modules can be imported
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import log as log_module
+from core.log import MAX_LIST_ITEMS, MAX_STRING_CHARS, REDACTED, get_logger
+
+class LoggerTests(unittest.TestCase):
+    def setUp(self):
+        self.stdout = io.StringIO()
+        patcher = patch.object(sys, 'stdout', self.stdout)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(log_module._invocation.update, {'requestId': None, 'sampled': True})
+
+    def records(self):
+        return [json.loads(line) for line in self.stdout.getvalue().splitlines()]
+
+    def test_writes_one_json_line_with_fields_and_request_id(self):
+        log = get_logger('status')
+        log.start_invocation(SimpleNamespace(aws_request_id='req-1'))
+        log.info('Served job', jobId='j1', reads=2)
+
+        self.assertEqual(self.records(), [{
+            'level': 'INFO', 'logger': 'status', 'message': 'Served job',
+            'requestId': 'req-1', 'jobId': 'j1', 'reads': 2,
+        }])
+
+    def test_truncates_long_strings_and_lists(self):
+        get_logger('generator').info('Response', body='x' * 5000, parts=list(range(100)))
+
+        record = self.records()[0]
+        self.assertTrue(record['body'].startswith('x' * MAX_STRING_CHARS))
+        self.assertLess(len(record['body']), MAX_STRING_CHARS + 40)
+        self.assertEqual(len(record['parts']), MAX_LIST_ITEMS + 1)
+        self.assertEqual(record['parts'][-1], f"[{100 - MAX_LIST_ITEMS} more items]")
+
+    def test_redacts_sensitive_fields_at_any_depth(self):
+        headers = {'Sign': 'abc', 'Authorization': 'Bearer t', 'Content-Type': 'application/json'}
+        get_logger('payment_webhook').warning('Webhook', headers=headers, token='t')
+
+        record = self.records()[0]
+        self.assertEqual(record['headers'], {
+            'Sign': REDACTED, 'Authorization': REDACTED, 'Content-Type': 'application/json'
+        })
+        self.assertEqual(record['token'], REDACTED)
+
+    def test_keeps_fields_that_only_contain_sign(self):
+        get_logger('profile').info('Saved', design='a', assigned='b', signature='c')
+
+        record = self.records()[0]
+        self.assertEqual((record['design'], record['assigned'], record['signature']), ('a', 'b', REDACTED))
+
+    def test_formats_exceptions(self):
+        get_logger('generator').error('Failed', error=ValueError('bad input'))
+        self.assertEqual(self.records()[0]['error'], 'ValueError: bad input')
+
+    def test_level_filter(self):
+        with patch.dict(os.environ, {'LOG_LEVEL': 'WARNING'}):
+            log = get_logger('saver')
+        log.info('dropped')
+        log.debug('dropped')
+        log.warning('kept')
+
+        self.assertEqual([r['message'] for r in self.records()], ['kept'])
+
+    def test_sampled_out_invocation_keeps_only_warnings_and_errors(self):
+        with patch.dict(os.environ, {'LOG_SAMPLE_RATE_DISPATCHER': '0'}):
+            log = get_logger('dispatcher')
+            log.start_invocation(SimpleNamespace(aws_request_id='req-2'))
+        log.info('dropped')
+        log.error('kept')
+
+        self.assertEqual([r['message'] for r in self.records()], ['kept'])
+
+    def test_sample_rate_falls_back_to_global_setting(self):
+        with patch.dict(os.environ, {'LOG_SAMPLE_RATE': '0.25'}):
+            self.assertEqual(get_logger('status').sample_rate(), 0.25)
+
+    def test_handler_decorator_starts_invocation(self):
+        log = get_logger('status')
+
+        @log.handler
+        def handler(event, context):
+            log.info('inside')
+            return 'ok'
+
+        self.assertEqual(handler({}, SimpleNamespace(aws_request_id='req-3')), 'ok')
+        self.assertEqual(self.records()[0]['requestId'], 'req-3')
+
+if __name__ == '__main__':
+    unittest.main()
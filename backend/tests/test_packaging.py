@@ -0,0 +1,30 @@
+import os
+import unittest
+
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'tools'))
+
+from package_handler import handler_files, template_handlers
+
+def shipped(spec):
+    return {os.path.relpath(path, BACKEND_DIR) for path in handler_files(spec)}
+
+class PackagingTests(unittest.TestCase):
+    def test_every_template_handler_resolves(self):
+        handlers = template_handlers()
+        self.assertIn('StatusFunction', handlers)
+        for spec in handlers.values():
+            module = spec.rsplit('.', 1)[0].replace('.', os.sep) + '.py'
+            self.assertIn(module, shipped(spec))
+
+    def test_status_ships_only_its_closure(self):
+        files = shipped('handlers.status.handler')
+        self.assertIn(os.path.join('core', 'storage.py'), files)
+        self.assertNotIn(os.path.join('handlers', 'generator.py'), files)
+        self.assertNotIn(os.path.join('core', 'prodamus.py'), files)
+        self.assertNotIn(os.path.join('core', 'profiles.py'), files)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so handlers can import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from botocore.exceptions import ClientError
+from core import prodamus, storage
+from handlers import payment_consumer, payment_webhook
+
+SECRET = 'test-secret'
+
+class Profiles:
+    """Applies add_purchased_credits' idempotent update; `fail_for` users raise."""
+    def __init__(self, fail_for=()):
+        self.items = {}
+        self.fail_for = fail_for
+    def update_item(self, Key, ExpressionAttributeValues, **kwargs):
+        if Key['userId'] in self.fail_for:
+            raise ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'UpdateItem')
+        item = self.items.setdefault(Key['userId'], {'credits': 5, 'processed_payments': []})
+        if ExpressionAttributeValues[':pid'] in item['processed_payments']:
+            raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'UpdateItem')
+        item['credits'] += ExpressionAttributeValues[':inc']
+        item['processed_payments'] += ExpressionAttributeValues[':new_pid_list']
+        return {}
+
+class DynamoDB:
+    def __init__(self, profiles):
+        self.profiles = profiles
+    def Table(self, name):
+        return self.profiles
+
+class SQS:
+    def __init__(self, fail=False):
+        self.messages = []
+        self.fail = fail
+    def send_message(self, QueueUrl, MessageBody):
+        if self.fail:
+            raise Exception('SQS unavailable')
+        self.messages.append(json.loads(MessageBody))
+
+def payment(order_id, user='u1', sku='starter'):
+    return {'order_id': order_id, 'payment_status': 'success', 'customer_extra': user, 'sku': sku, 'sum': '800'}
+
+def delivery(data, signature=None):
+    return {
+        'headers': {'Sign': signature or prodamus.sign(data, SECRET), 'content-type': 'application/json'},
+        'body': json.dumps(data)
+    }
+
+@patch.dict(os.environ, {'PRODAMUS_SECRET_KEY': SECRET, 'USER_TABLE_NAME': 'Users'})
+class PaymentWebhookTests(unittest.TestCase):
+    def setUp(self):
+        self.profiles = Profiles()
+        self.sqs = SQS()
+
+    def call(self, event):
+        with patch.object(storage, 'dynamodb', DynamoDB(self.profiles)), \
+             patch.object(storage, 'sqs_client', self.sqs):
+            response = payment_webhook.handler(event, None)
+        return response['statusCode'], response['body']
+
+    @patch.dict(os.environ, {'PAYMENT_QUEUE_URL': 'payments'})
+    def test_verified_payment_is_queued_and_acknowledged(self):
+        self.assertEqual(self.call(delivery(payment('o-1'))), (200, 'Accepted'))
+        self.assertEqual(self.sqs.messages, [payment('o-1')])
+        self.assertEqual(self.profiles.items, {})
+
+        self.assertEqual(self.call(delivery(payment('o-2'), signature='0' * 64))[0], 403)
+        self.assertEqual(len(self.sqs.messages), 1)
+
+    @patch.dict(os.environ, {'PAYMENT_QUEUE_URL': 'payments'})
+    def test_failed_enqueue_asks_prodamus_to_retry(self):
+        self.sqs = SQS(fail=True)
+        self.assertEqual(self.call(delivery(payment('o-1')))[0], 500)
+
+    def test_without_a_queue_credits_before_answering(self):
+        self.assertEqual(self.call(delivery(payment('o-1'))), (200, 'Success'))
+        self.assertEqual(self.call(delivery(payment('o-1'))), (200, 'Already processed'))
+        self.assertEqual(self.profiles.items['u1']['credits'], 30)
+
+@patch.dict(os.environ, {'USER_TABLE_NAME': 'Users'})
+class PaymentConsumerTests(unittest.TestCase):
+    def test_reports_only_failed_records_and_credits_each_payment_once(self):
+        profiles = Profiles(fail_for={'u3'})
+        records = [
+            {'messageId': 'm1', 'body': json.dumps(payment('o-1'))},
+            {'messageId': 'm2', 'body': json.dumps(payment('o-1'))},
+            {'messageId': 'm3', 'body': json.dumps(payment('o-2', user='u2', sku='standard'))},
+            {'messageId': 'm4', 'body': json.dumps(payment('o-3', user='u3'))},
+            {'messageId': 'm5', 'body': 'not json'},
+        ]
+        with patch.object(storage, 'dynamodb', DynamoDB(profiles)):
+            response = payment_consumer.handler({'Records': records}, None)
+
+        self.assertEqual(response, {'batchItemFailures': [{'itemIdentifier': 'm4'}, {'itemIdentifier': 'm5'}]})
+        self.assertEqual(profiles.items['u1']['credits'], 30)
+        self.assertEqual(profiles.items['u2']['credits'], 65)
+
+if __name__ == '__main__':
+    unittest.main()
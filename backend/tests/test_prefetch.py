@@ -0,0 +1,175 @@
+import json
+import os
+import socket
+import unittest
+from unittest.mock import patch
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so handlers can import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from botocore.exceptions import ClientError
+from core import item_cache, ratelimit, storage
+from handlers import prefetch
+
+ENV = {'USER_TABLE_NAME': 'Users', 'BUCKET_NAME': 'bucket', 'PREFETCH_RATE_LIMIT': '2', 'PREFETCH_RATE_WINDOW_SECONDS': '60'}
+
+def resolves_to(*addresses):
+    return lambda host, port: [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (address, port)) for address in addresses]
+
+class Users:
+    """Profiles; evaluates admit()'s prefetchTat conditions the way DynamoDB would."""
+    def __init__(self, **items):
+        self.items = items
+    def update_item(self, Key, ExpressionAttributeValues, **kwargs):
+        values, item = ExpressionAttributeValues, self.items.get(Key['userId'])
+        if item is None:
+            raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'UpdateItem')
+        tat = item.get('prefetchTat')
+        if ':restart' in values:
+            admitted = tat is None or tat <= values[':now']
+        else:
+            admitted = tat is not None and values[':now'] <= tat <= values[':latest']
+        if not admitted:
+            raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}, 'Item': dict(item)}, 'UpdateItem')
+        item['prefetchTat'] = values[':restart'] if ':restart' in values else tat + values[':interval']
+        return {'Attributes': {'prefetchTat': item['prefetchTat']}}
+
+class DynamoDB:
+    def __init__(self, users):
+        self.users = users
+    def Table(self, name):
+        return self.users
+
+class S3:
+    def __init__(self):
+        self.objects = {}
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+        return {}
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = Body
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+        return {'Body': type('Body', (), {'read': lambda self: b'cached'})()}
+
+def request(item_url, user='u1'):
+    return {'headers': {'x-user-id': user}, 'body': json.dumps({'itemUrl': item_url})}
+
+class ItemCacheTests(unittest.TestCase):
+    def test_cache_key_is_stable_per_url(self):
+        key = item_cache.cache_key('https://shop/a.jpg')
+        self.assertTrue(key.startswith('item-cache/') and key.endswith('.jpg'))
+        self.assertEqual(key, item_cache.cache_key('https://shop/a.jpg'))
+        self.assertNotEqual(key, item_cache.cache_key('https://shop/b.jpg'))
+
+    def test_only_public_http_hosts_are_allowed(self):
+        with patch('socket.getaddrinfo', resolves_to('93.184.216.34')):
+            item_cache.validate_url('https://shop.example/a.jpg')
+        for url in ('file:///etc/passwd', 'ftp://shop.example/a.jpg', 'https:///a.jpg'):
+            with self.assertRaises(ValueError):
+                item_cache.validate_url(url)
+        for address in ('10.0.0.5', '169.254.169.254', '127.0.0.1'):
+            with patch('socket.getaddrinfo', resolves_to('93.184.216.34', address)), self.assertRaises(ValueError):
+                item_cache.validate_url('https://shop.example/a.jpg')
+
+class Response:
+    def __init__(self, status, headers=None, body=b''):
+        self.status, self.headers, self.body = status, headers or {}, body
+    def getheader(self, name, default=None):
+        return self.headers.get(name, default)
+    def read(self, amount):
+        return self.body[:amount]
+    def close(self):
+        pass
+
+HOSTS = {'shop.example': '93.184.216.34', 'cdn.example': '93.184.216.35', 'internal.example': '10.0.0.5'}
+
+def resolve(host, port):
+    return resolves_to(HOSTS[host])(host, port)
+
+class DownloadTests(unittest.TestCase):
+    def download(self, url, responses):
+        fetched = []
+        def fetch(url, address):
+            fetched.append((url, address))
+            return responses.pop(0)
+        with patch('socket.getaddrinfo', resolve), patch.object(item_cache, '_fetch', fetch):
+            return item_cache.download(url), fetched
+
+    def test_every_hop_is_checked_and_fetched_from_the_checked_address(self):
+        redirect = Response(302, {'Location': 'https://cdn.example/a.jpg'})
+        image = Response(200, {'Content-Type': 'image/jpeg'}, b'jpeg')
+        body, fetched = self.download('https://shop.example/a.jpg', [redirect, image])
+        self.assertEqual(body, b'jpeg')
+        self.assertEqual(fetched, [('https://shop.example/a.jpg', '93.184.216.34'), ('https://cdn.example/a.jpg', '93.184.216.35')])
+
+    def test_redirect_to_a_private_host_is_refused(self):
+        redirect = Response(301, {'Location': 'http://internal.example/latest/meta-data'})
+        with self.assertRaises(ValueError):
+            self.download('https://shop.example/a.jpg', [redirect])
+
+    def test_http_hosts_are_resolved_on_port_80(self):
+        ports = []
+        def getaddrinfo(host, port):
+            ports.append(port)
+            return resolve(host, port)
+        with patch('socket.getaddrinfo', getaddrinfo):
+            item_cache.validate_url('http://shop.example/a.jpg')
+            item_cache.validate_url('https://shop.example/a.jpg')
+            item_cache.validate_url('http://shop.example:8080/a.jpg')
+        self.assertEqual(ports, [80, 443, 8080])
+
+    def test_connection_goes_to_the_pinned_address(self):
+        connection = item_cache.PinnedHTTPConnection('shop.example', '93.184.216.34', port=80, timeout=5)
+        with patch('socket.create_connection') as create_connection:
+            connection.connect()
+        create_connection.assert_called_once_with(('93.184.216.34', 80), 5)
+        self.assertEqual(connection.host, 'shop.example')
+
+@patch.dict(os.environ, ENV)
+class PrefetchHandlerTests(unittest.TestCase):
+    def setUp(self):
+        ratelimit.PREFETCH.known.clear()
+        prefetch.prefetches.clear()
+        self.users = Users(u1={'userId': 'u1'})
+        self.s3 = S3()
+        self.download = lambda url: b'source'
+
+    def call(self, event):
+        with patch.object(storage, 'dynamodb', DynamoDB(self.users)), \
+             patch.object(storage, 's3_client', self.s3), \
+             patch.object(item_cache, 'download', lambda url: self.download(url)), \
+             patch('core.renditions.render', lambda source, fmt, variants: {'model': b'bounded'}):
+            response = prefetch.handler(event, None)
+        return response['statusCode'], json.loads(response['body'])
+
+    def test_miss_is_stored_and_then_served_from_the_cache(self):
+        status, body = self.call(request('https://shop/a.jpg'))
+        self.assertEqual((status, body['cached'], body['bytes']), (200, False, 7))
+        self.assertEqual(self.s3.objects[item_cache.cache_key('https://shop/a.jpg')], b'bounded')
+
+        prefetch.prefetches.clear()
+        status, body = self.call(request('https://shop/a.jpg'))
+        self.assertEqual((status, body['cached']), (200, True))
+
+    def test_prefetches_past_the_rate_limit_are_refused(self):
+        for n in range(2):
+            self.assertEqual(self.call(request(f"https://shop/{n}.jpg"))[0], 200)
+        status, body = self.call(request('https://shop/2.jpg'))
+        self.assertEqual((status, body['code']), (429, 'RATE_LIMITED'))
+        self.assertEqual(len(self.s3.objects), 2)
+
+    def test_unknown_user_and_bad_input(self):
+        self.assertEqual(self.call(request('https://shop/a.jpg', user='nobody'))[0], 404)
+        self.assertEqual(self.call({'headers': {'x-user-id': 'u1'}, 'body': '{}'})[0], 400)
+
+        def not_an_image(url):
+            raise ValueError('Not an image: text/html')
+        self.download = not_an_image
+        self.assertEqual(self.call(request('https://shop/page.html'))[0], 422)
@@ -0,0 +1,127 @@
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so handlers can import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from botocore.exceptions import ClientError
+from core import storage
+from core.presign import MAX_SELFIE_BYTES, MAX_THUMBNAIL_BYTES, selfie_upload
+from handlers import profile
+
+class SigningS3:
+    """Records presigned POST and PUT requests; signing never leaves the process."""
+    def __init__(self):
+        self.posts = []
+        self.puts = []
+    def generate_presigned_post(self, **kw):
+        self.posts.append(kw)
+        return {'url': 'https://bucket.s3.amazonaws.com/', 'fields': {'key': kw['Key'], 'policy': 'p'}}
+    def generate_presigned_url(self, operation, Params, **kw):
+        self.puts.append(Params)
+        return f"https://bucket.s3.amazonaws.com/{Params['Key']}?signature=s"
+
+class UploadedS3:
+    """Object sizes by key, as head_object reports them."""
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.deleted = []
+    def head_object(self, Bucket, Key):
+        if Key not in self.sizes:
+            raise ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+        return {'ContentLength': self.sizes[Key]}
+    def delete_object(self, Bucket, Key):
+        self.deleted.append(Key)
+
+class NoTables:
+    def Table(self, name):
+        return None
+
+def request(path, body):
+    return {
+        'rawPath': path,
+        'headers': {'x-user-id': 'u1'},
+        'requestContext': {'http': {'method': 'POST'}},
+        'body': json.dumps(body)
+    }
+
+class SelfieUploadTests(unittest.TestCase):
+    def test_policy_limits_size_and_type(self):
+        s3 = SigningS3()
+        result = selfie_upload(s3, 'bucket', 'u1', 'me.png', 'image/png')
+
+        conditions = s3.posts[0]['Conditions']
+        self.assertIn(['content-length-range', 1, MAX_SELFIE_BYTES], conditions)
+        self.assertIn({'Content-Type': 'image/png'}, conditions)
+        self.assertTrue(result['s3Key'].startswith(f"uploads/u1/{result['fileId']}-"))
+        self.assertNotIn('thumbnailUpload', result)
+
+    def test_thumbnail_gets_smaller_limit(self):
+        s3 = SigningS3()
+        result = selfie_upload(s3, 'bucket', 'u1', 'me.jpg', 'image/jpeg', include_thumbnail=True)
+        self.assertEqual(result['thumbnailUpload']['maxBytes'], MAX_THUMBNAIL_BYTES)
+
+    def test_rejects_unsupported_type(self):
+        with self.assertRaises(ValueError):
+            selfie_upload(SigningS3(), 'bucket', 'u1', 'me.gif', 'image/gif')
+
+@patch.dict(os.environ, {'USER_TABLE_NAME': 'Users', 'BUCKET_NAME': 'bucket'})
+class UploadUrlRouteTests(unittest.TestCase):
+    def call(self, path, body):
+        s3 = SigningS3()
+        with patch.object(storage, 's3_client', s3), patch.object(storage, 'dynamodb', NoTables()):
+            response = profile.handler(request(path, body), None)
+        return response['statusCode'], json.loads(response['body']), s3
+
+    def test_batch_issues_all_uploads_in_one_call(self):
+        files = [{'filename': f"{i}.jpg", 'contentType': 'image/jpeg'} for i in range(3)]
+        status, body, s3 = self.call('/user/images/upload-urls', {'files': files})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(len(body['uploads']), 3)
+        self.assertEqual(len({u['fileId'] for u in body['uploads']}), 3)
+        self.assertEqual(len(s3.posts), 3)
+
+    def test_batch_limits_file_count(self):
+        files = [{'filename': f"{i}.jpg"} for i in range(6)]
+        status, _, s3 = self.call('/user/images/upload-urls', {'files': files})
+        self.assertEqual(status, 400)
+        self.assertEqual(s3.posts, [])
+
+    def test_single_upload_keeps_the_presigned_put_shape(self):
+        status, body, s3 = self.call('/user/images/upload-url',
+                                     {'filename': 'me.jpg', 'contentType': 'image/jpeg', 'includeThumbnail': True})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(set(body), {'uploadUrl', 's3Key', 'fileId', 'thumbnailUploadUrl', 'thumbnailS3Key'})
+        self.assertEqual(body['uploadUrl'], f"https://bucket.s3.amazonaws.com/{body['s3Key']}?signature=s")
+        self.assertEqual([put['ContentType'] for put in s3.puts], ['image/jpeg', 'image/jpeg'])
+        self.assertEqual(s3.posts, [])
+
+    def test_single_upload_rejects_bad_type(self):
+        status, body, _ = self.call('/user/images/upload-url', {'filename': 'a.svg', 'contentType': 'image/svg+xml'})
+        self.assertEqual(status, 400)
+        self.assertIn('Unsupported', body['error'])
+
+    def test_confirm_rejects_oversize_and_missing_uploads(self):
+        s3 = UploadedS3({'uploads/u1/big.png': MAX_SELFIE_BYTES + 1, 'uploads/u1/ok.png': 1000,
+                         'uploads/u1/thumb.png': MAX_THUMBNAIL_BYTES + 1})
+        confirm = {'name': 'me', 'fileId': 'f1'}
+        with patch.object(storage, 's3_client', s3):
+            big = profile.handler(request('/user/images', dict(confirm, s3Key='uploads/u1/big.png')), None)
+            thumb = profile.handler(request('/user/images', dict(
+                confirm, s3Key='uploads/u1/ok.png', thumbnailS3Key='uploads/u1/thumb.png')), None)
+            missing = profile.handler(request('/user/images', dict(confirm, s3Key='uploads/u1/none.png')), None)
+
+        self.assertEqual([r['statusCode'] for r in (big, thumb, missing)], [400, 400, 400])
+        self.assertIn('too large', json.loads(big['body'])['error'])
+        self.assertEqual(s3.deleted, ['uploads/u1/big.png', 'uploads/u1/thumb.png'])
+
+if __name__ == '__main__':
+    unittest.main()
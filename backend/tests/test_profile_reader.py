@@ -0,0 +1,65 @@
+import os
+import unittest
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so core modules can be imported
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.profiles import ProfileReader, PROFILE_CONTACT_VIEW, PROFILE_SUMMARY_VIEW
+
+class RecordingTable:
+    """Profile table stub that records every get_item call."""
+    def __init__(self, items=None):
+        self.items = items or {}
+        self.calls = []
+    def get_item(self, Key, **kwargs):
+        self.calls.append(kwargs)
+        return {'Item': self.items.get(Key['userId'])}
+
+class ProfileReaderTests(unittest.TestCase):
+    def test_read_is_projected_to_view(self):
+        table = RecordingTable({'u1': {'userId': 'u1', 'email': 'a@b.c'}})
+        item = ProfileReader(table).get('u1', PROFILE_CONTACT_VIEW)
+
+        self.assertEqual(item['email'], 'a@b.c')
+        call = table.calls[0]
+        projected = {call['ExpressionAttributeNames'][p] for p in call['ProjectionExpression'].split(', ')}
+        self.assertEqual(projected, {'userId', 'email'})
+        self.assertFalse(call['ConsistentRead'])
+
+    def test_memo_serves_repeated_and_narrower_reads(self):
+        table = RecordingTable({'u1': {'userId': 'u1', 'credits': 3, 'images': []}})
+        reader = ProfileReader(table)
+        reader.get('u1', PROFILE_SUMMARY_VIEW)
+        reader.get('u1', PROFILE_SUMMARY_VIEW)
+        reader.get('u1', ('userId', 'credits'))
+        self.assertEqual(len(table.calls), 1)
+
+    def test_strong_read_is_not_served_from_eventual_memo(self):
+        table = RecordingTable({'u1': {'userId': 'u1', 'credits': 3}})
+        reader = ProfileReader(table)
+        reader.get('u1', PROFILE_SUMMARY_VIEW)
+        reader.get('u1', PROFILE_SUMMARY_VIEW, consistent=True)
+        reader.get('u1', PROFILE_SUMMARY_VIEW)
+        self.assertEqual([c['ConsistentRead'] for c in table.calls], [False, True])
+
+    def test_wider_view_refetches_union(self):
+        table = RecordingTable({'u1': {'userId': 'u1', 'email': 'a@b.c', 'credits': 3}})
+        reader = ProfileReader(table)
+        reader.get('u1', PROFILE_CONTACT_VIEW)
+        reader.get('u1', ('userId', 'credits'))
+        names = set(table.calls[1]['ExpressionAttributeNames'].values())
+        self.assertEqual(names, {'userId', 'email', 'credits'})
+
+    def test_missing_profile_is_memoized(self):
+        table = RecordingTable()
+        reader = ProfileReader(table)
+        self.assertIsNone(reader.get('nobody', PROFILE_CONTACT_VIEW))
+        self.assertIsNone(reader.get('nobody', PROFILE_SUMMARY_VIEW))
+        self.assertEqual(len(table.calls), 1)
+
+if __name__ == '__main__':
+    unittest.main()
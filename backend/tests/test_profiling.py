@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so core modules can be imported
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import storage
+from core.profiling import Profiler
+
+CONTEXT = SimpleNamespace(aws_request_id='req-1')
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+class RecordingS3:
+    def __init__(self):
+        self.keys = []
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.keys.append((Bucket, Key))
+
+class ProfilerTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        env = patch.dict(os.environ, {'PROFILE_DIR': self.dir.name})
+        env.start()
+        self.addCleanup(env.stop)
+        for name in ('PROFILE_HANDLERS', 'PROFILE_BUCKET', 'PROFILE_HEADER_SAMPLE_RATE'):
+            os.environ.pop(name, None)
+
+        profiler = Profiler('status')
+
+        @profiler.handler
+        def handler(event, context):
+            return busy(20000)
+
+        self.handler = handler
+
+    def written(self):
+        directory = os.path.join(self.dir.name, 'status')
+        return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+    def test_off_by_default(self):
+        self.assertEqual(self.handler({'headers': {'X-Profile': '1'}}, CONTEXT), busy(20000))
+        self.assertEqual(self.written(), [])
+
+    def test_listed_handler_writes_stats_stacks_and_summary(self):
+        os.environ['PROFILE_HANDLERS'] = 'generator, status'
+        self.assertEqual(self.handler({}, CONTEXT), busy(20000))
+
+        self.assertEqual(self.written(), ['req-1.folded', 'req-1.prof', 'req-1.txt'])
+        with open(os.path.join(self.dir.name, 'status', 'req-1.folded')) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(any('busy (test_profiling.py' in line for line in lines))
+        for line in lines:
+            stack, micros = line.rsplit(' ', 1)
+            self.assertTrue(stack)
+            self.assertGreaterEqual(int(micros), 1)
+        with open(os.path.join(self.dir.name, 'status', 'req-1.txt')) as f:
+            self.assertIn('peak traced memory', f.read())
+
+    def test_header_is_honoured_only_when_sampled(self):
+        event = {'headers': {'x-profile': '1'}}
+        os.environ['PROFILE_HEADER_SAMPLE_RATE'] = '1'
+        self.handler(event, CONTEXT)
+        self.assertEqual(len(self.written()), 3)
+
+    def test_writes_to_s3_when_bucket_configured(self):
+        os.environ.update(PROFILE_HANDLERS='*', PROFILE_BUCKET='profiles-bucket')
+        s3 = RecordingS3()
+        with patch.object(storage, 's3_client', s3):
+            self.handler({}, CONTEXT)
+
+        self.assertEqual(sorted(s3.keys), [
+            ('profiles-bucket', 'profiles/status/req-1.folded'),
+            ('profiles-bucket', 'profiles/status/req-1.prof'),
+            ('profiles-bucket', 'profiles/status/req-1.txt'),
+        ])
+        self.assertEqual(self.written(), [])
+
+    def test_write_failure_does_not_fail_invocation(self):
+        os.environ.update(PROFILE_HANDLERS='*', PROFILE_DIR=os.path.join(self.dir.name, 'file'))
+        open(os.path.join(self.dir.name, 'file'), 'w').close()
+
+        self.assertEqual(self.handler({}, CONTEXT), busy(20000))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+import datetime
+import os
+import unittest
+from unittest.mock import Mock, patch
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so core modules can be imported
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from botocore.exceptions import ClientError
+from core import ratelimit, slots, storage
+from core.profiles import charge_try_on_credit, refund_credit
+from handlers import saver
+
+LIMITS = {'TRY_ON_RATE_LIMIT': '4', 'TRY_ON_RATE_WINDOW_SECONDS': '60', 'TRY_ON_MAX_IN_FLIGHT': '2'}
+
+class FakeProfiles:
+    """One profile; evaluates the charge's conditions the way DynamoDB would."""
+    def __init__(self, item):
+        self.item = item
+        self.calls = 0
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues, **kwargs):
+        self.calls += 1
+        values, item = ExpressionAttributeValues, self.item
+        if UpdateExpression.startswith('delete'):
+            item.get('inFlightJobs', set()).difference_update(values[':job'])
+            return {}
+        if UpdateExpression.startswith('set credits = credits + :inc'):
+            if 'ConditionExpression' in kwargs and values[':slot_id'] not in item.get('inFlightJobs', ()):
+                raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'UpdateItem')
+            item['credits'] += values[':inc']
+            item.get('inFlightJobs', set()).difference_update(values[':job'])
+            return {}
+        tat = item.get('rateTat')
+        if ':restart' in values:
+            rate_ok = tat is None or tat <= values[':now']
+        else:
+            rate_ok = tat is not None and values[':now'] <= tat <= values[':latest']
+        slots_ok = len(item.get('inFlightJobs', ())) < values[':max_in_flight']
+        if item.get('credits', 5) < values[':dec'] or not slots_ok or not rate_ok:
+            old = dict(item, inFlightJobs=sorted(item.get('inFlightJobs', ())))
+            raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}, 'Item': old}, 'UpdateItem')
+        item['credits'] = item.get('credits', 5) - values[':dec']
+        item['rateTat'] = values[':restart'] if ':restart' in values else tat + values[':interval']
+        item.setdefault('inFlightJobs', set()).update(values[':job'])
+        return {'Attributes': dict(item, inFlightJobs=sorted(item['inFlightJobs']))}
+
+class Tables:
+    def __init__(self, **tables):
+        self.tables = tables
+    def Table(self, name):
+        return self.tables[name]
+
+class FakeJobs:
+    """Job records by id; the reclaimer's conditional writes check status and startedAt."""
+    def __init__(self, *records):
+        self.items = {record['jobId']: record for record in records}
+    def get_item(self, Key, **kwargs):
+        item = self.items.get(Key['jobId'])
+        return {'Item': dict(item)} if item else {}
+    def update_item(self, Key, ExpressionAttributeValues, ConditionExpression, **kwargs):
+        item, values = self.items[Key['jobId']], ExpressionAttributeValues
+        started_changed = 'startedAt' in ConditionExpression and item.get('startedAt') != values.get(':started')
+        if item['status'] != values[':processing'] or started_changed:
+            raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'UpdateItem')
+        item.update(status=values[':s'], error=values[':e'])
+
+def job(job_id, status='PROCESSING', minutes_ago=0, **fields):
+    when = datetime.datetime.utcnow() - datetime.timedelta(minutes=minutes_ago)
+    return dict({'jobId': job_id, 'userId': 'u1', 'status': status, 'creditCost': 1, 'timestamp': when.isoformat()}, **fields)
+
+def charge(table, job_id, now):
+    with patch('time.time', return_value=now):
+        return charge_try_on_credit(table, 'u1', job_id)
+
+@patch.dict(os.environ, LIMITS)
+class RateLimitTests(unittest.TestCase):
+    def setUp(self):
+        ratelimit._known_tat.clear()
+
+    def test_burst_up_to_limit_then_one_per_interval(self):
+        table = FakeProfiles({'userId': 'u1', 'credits': 50})
+        for n in range(4):
+            charge(table, f"j{n}", 1000.0)
+            refund_credit(table, 'u1', f"j{n}")
+        with self.assertRaises(ClientError) as ctx:
+            charge(table, 'j4', 1000.0)
+        limited = ratelimit.rejection(ctx.exception.response['Item'], 1000.0)
+        self.assertEqual(limited, ratelimit.Rejection('RATE_LIMITED', 15))
+        # One interval (60 / 4 s) later a single request fits again
+        charge(table, 'j5', 1015.0)
+
+    def test_stale_local_guess_is_retried_once_with_stored_value(self):
+        table = FakeProfiles({'userId': 'u1', 'credits': 5, 'rateTat': 1030.0})
+        charge(table, 'j1', 1000.0)
+        self.assertEqual(table.calls, 2)
+        self.assertEqual(table.item['rateTat'], 1045.0)
+        # The container now knows the stored value and needs a single call
+        refund_credit(table, 'u1', 'j1')
+        table.calls = 0
+        charge(table, 'j2', 1000.0)
+        self.assertEqual(table.calls, 1)
+
+    def test_in_flight_cap_until_a_slot_is_released(self):
+        table = FakeProfiles({'userId': 'u1', 'credits': 5})
+        charge(table, 'j1', 1000.0)
+        charge(table, 'j2', 1000.0)
+        with self.assertRaises(ClientError) as ctx:
+            charge(table, 'j3', 1000.0)
+        self.assertEqual(ratelimit.rejection(ctx.exception.response['Item'], 1000.0).code, 'TOO_MANY_IN_FLIGHT')
+
+        ratelimit.release_slot(table, 'u1', 'j1')
+        ratelimit.release_slot(table, 'u1', 'j1')
+        charge(table, 'j3', 1000.0)
+        self.assertEqual(table.item['inFlightJobs'], {'j2', 'j3'})
+
+    def test_warm_container_rejects_from_memory(self):
+        ratelimit.remember('u1', 1100.0)
+        self.assertEqual(ratelimit.local_rejection('u1', 1000.0), ratelimit.Rejection('RATE_LIMITED', 55))
+        self.assertIsNone(ratelimit.local_rejection('u1', 1060.0))
+        self.assertIsNone(ratelimit.local_rejection('someone-else', 1000.0))
+
+    def test_memory_is_bounded_and_never_moves_back(self):
+        with patch.object(ratelimit, 'LOCAL_USERS', 2):
+            ratelimit.remember('a', 10.0)
+            ratelimit.remember('a', 5.0)
+            ratelimit.remember('b', 1.0)
+            ratelimit.remember('c', 1.0)
+        self.assertIsNone(ratelimit.known_tat('a'))
+        ratelimit.remember('b', 0.5)
+        self.assertEqual(ratelimit.known_tat('b'), 1.0)
+
+@patch.dict(os.environ, LIMITS)
+class StaleSlotTests(unittest.TestCase):
+    def setUp(self):
+        ratelimit._known_tat.clear()
+
+    def charge(self, table, jobs, job_id):
+        with patch('time.time', return_value=1000.0):
+            return slots.charge_reclaiming(table, jobs, 'u1', job_id)
+
+    def test_finished_and_stale_jobs_give_their_slots_back(self):
+        table = FakeProfiles({'userId': 'u1', 'credits': 3, 'inFlightJobs': {'done', 'lost'}})
+        jobs = FakeJobs(job('done', 'COMPLETED'), job('lost', minutes_ago=45, startedAt='2020-01-01T00:00:00'))
+        self.charge(table, jobs, 'j3')
+        self.assertEqual(table.item['inFlightJobs'], {'j3'})
+        self.assertEqual(jobs.items['lost']['status'], 'FAILED')
+        # The lost job's credit came back, the new one was charged
+        self.assertEqual(table.item['credits'], 3)
+
+    def test_live_and_just_dispatched_jobs_keep_their_slots(self):
+        table = FakeProfiles({'userId': 'u1', 'credits': 3, 'inFlightJobs': {'queued', 'landing'}})
+        jobs = FakeJobs(job('queued', minutes_ago=5))
+        with self.assertRaises(ClientError) as ctx:
+            self.charge(table, jobs, 'j3')
+        self.assertEqual(ratelimit.rejection(ctx.exception.response['Item'], 1000.0).code, 'TOO_MANY_IN_FLIGHT')
+        self.assertEqual(jobs.items['queued']['status'], 'PROCESSING')
+        self.assertEqual(table.item['credits'], 3)
+
+    def test_failed_job_is_refunded_once(self):
+        table = FakeProfiles({'userId': 'u1', 'credits': 0, 'inFlightJobs': {'failed'}})
+        jobs = FakeJobs(job('failed', 'FAILED', creditCost=2))
+        self.assertEqual(slots.reclaim_stale_slots(table, jobs, 'u1', ['failed']), 1)
+        self.assertEqual(slots.reclaim_stale_slots(table, jobs, 'u1', ['failed']), 0)
+        self.assertEqual(table.item['credits'], 2)
+
+    @patch.dict(os.environ, {'TABLE_NAME': 'Jobs', 'USER_TABLE_NAME': 'Users', 'SCHEDULER_FUNCTION': 'scheduler'})
+    def test_job_failed_by_the_reclaimer_and_the_saver_is_refunded_once(self):
+        table = FakeProfiles({'userId': 'u1', 'credits': 0, 'inFlightJobs': {'lost'}})
+        jobs = FakeJobs(job('lost', minutes_ago=45, creditCost=2))
+        self.assertEqual(slots.reclaim_stale_slots(table, jobs, 'u1', ['lost']), 1)
+
+        # The execution fails after all, and JobFailed is retried
+        event = {'jobId': 'lost', 'userId': 'u1', 'status': 'FAILED', 'creditCost': 2, 'error': 'boom'}
+        with patch.object(storage, 'dynamodb', Tables(Jobs=jobs, Users=table)), \
+             patch.object(storage, 'lambda_client', Mock()):
+            saver.handler(event, None)
+            saver.handler(event, None)
+        self.assertEqual(table.item['credits'], 2)
+
+    def test_batch_slot_is_freed_once_none_of_its_jobs_is_live(self):
+        table = FakeProfiles({'userId': 'u1', 'credits': 0, 'inFlightJobs': {'b1'}})
+        batch = dict(job('b1', minutes_ago=45), kind='batch', pendingJobs=['x1', 'x2'])
+        jobs = FakeJobs(batch, job('x1', 'COMPLETED'), job('x2', minutes_ago=5))
+        self.assertEqual(slots.reclaim_stale_slots(table, jobs, 'u1', ['b1']), 0)
+
+        jobs.items['x2'] = job('x2', minutes_ago=45)
+        self.assertEqual(slots.reclaim_stale_slots(table, jobs, 'u1', ['b1']), 1)
+        self.assertEqual(jobs.items['x2']['status'], 'FAILED')
+        self.assertEqual(table.item, dict(table.item, credits=1, inFlightJobs=set()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import io
+import os
+import unittest
+from unittest.mock import patch
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so handlers can import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import storage
+from core.renditions import CACHE_CONTROL, rendition_key
+from handlers import renditions, saver
+
+RESULT_URL = 'https://bucket.s3.amazonaws.com/results/u1/job-1.png'
+
+class DummyS3:
+    def __init__(self, fail_get=False):
+        self.puts = []
+        self.fail_get = fail_get
+    def get_object(self, Bucket, Key):
+        if self.fail_get:
+            raise RuntimeError('NoSuchKey')
+        return {'Body': io.BytesIO(b'png-bytes')}
+    def put_object(self, **kw):
+        self.puts.append(kw)
+
+class RecordingTable:
+    def __init__(self):
+        self.items = []
+        self.updates = []
+    def put_item(self, Item, **kwargs):
+        self.items.append(Item)
+    def update_item(self, **kwargs):
+        self.updates.append(kwargs)
+
+class RecordingDynamoDB:
+    def __init__(self):
+        self.tables = {}
+    def Table(self, name):
+        return self.tables.setdefault(name, RecordingTable())
+
+def fake_render(source, fmt):
+    return {'primary': b'p' * 10, 'thumb': b't'}
+
+@patch.dict(os.environ, {'BUCKET_NAME': 'bucket'})
+class RenditionHandlerTests(unittest.TestCase):
+    def run_handler(self, s3):
+        event = {'jobId': 'job-1', 'userId': 'u1', 'resultUrl': RESULT_URL}
+        with patch('core.storage.s3_client', s3):
+            return renditions.handler(event, None)
+
+    def test_rendition_key(self):
+        self.assertEqual(rendition_key('results/u1/job-1.png', 'thumb', 'WEBP'), 'results/u1/job-1.thumb.webp')
+
+    @patch('handlers.renditions.render', fake_render)
+    @patch('handlers.renditions.pick_format', lambda preferred: 'WEBP')
+    def test_writes_renditions_next_to_result(self):
+        s3 = DummyS3()
+        result = self.run_handler(s3)
+
+        self.assertEqual(result['renditions'], {
+            'primary': 'https://bucket.s3.amazonaws.com/results/u1/job-1.primary.webp',
+            'thumb': 'https://bucket.s3.amazonaws.com/results/u1/job-1.thumb.webp',
+        })
+        self.assertEqual({p['ContentType'] for p in s3.puts}, {'image/webp'})
+        self.assertEqual({p['CacheControl'] for p in s3.puts}, {CACHE_CONTROL})
+
+    @patch('handlers.renditions.pick_format', lambda preferred: None)
+    def test_no_encoder_keeps_png_only(self):
+        s3 = DummyS3()
+        self.assertEqual(self.run_handler(s3)['renditions'], {})
+        self.assertEqual(s3.puts, [])
+
+    @patch('handlers.renditions.pick_format', lambda preferred: 'WEBP')
+    def test_failure_does_not_fail_job(self):
+        self.assertEqual(self.run_handler(DummyS3(fail_get=True))['renditions'], {})
+
+@patch.dict(os.environ, {'TABLE_NAME': 'Jobs', 'USER_GENERATIONS_TABLE_NAME': 'Generations', 'USER_TABLE_NAME': 'Users'})
+class SaverRenditionTests(unittest.TestCase):
+    def test_saver_records_renditions(self):
+        db = RecordingDynamoDB()
+        thumbs = {'primary': 'https://b/p.webp', 'thumb': 'https://b/t.webp'}
+        event = {'jobId': 'job-1', 'userId': 'u1', 'resultUrl': RESULT_URL, 'renditions': thumbs}
+        with patch.object(storage, 'dynamodb', db):
+            saver.handler(event, None)
+
+        [job_write] = db.tables['Jobs'].updates
+        self.assertEqual(job_write['ExpressionAttributeValues'][':rn'], thumbs)
+        self.assertNotIn('Item', job_write)
+        self.assertEqual(db.tables['Generations'].items[0]['renditions'], thumbs)
+        # The finished job's in-flight slot is freed on the profile
+        self.assertEqual(db.tables['Users'].updates[0]['ExpressionAttributeValues'], {':job': {'job-1'}})
+
+    def test_saver_omits_empty_renditions(self):
+        db = RecordingDynamoDB()
+        event = {'jobId': 'job-1', 'userId': 'u1', 'resultUrl': RESULT_URL, 'renditions': {}}
+        with patch.object(storage, 'dynamodb', db):
+            saver.handler(event, None)
+
+        [job_write] = db.tables['Jobs'].updates
+        self.assertNotIn('renditions', job_write['UpdateExpression'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import base64
+import json
+import os
+import unittest
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so core modules can be imported
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.gemini_stream import InlineImageDecoder, iter_inline_image
+from core.uploads import upload_stream
+
+IMAGE = bytes(range(256)) * 40
+
+def gemini_response(image=IMAGE, **part_extra):
+    part = {'inlineData': {'mimeType': 'image/png', 'data': base64.b64encode(image).decode('ascii')}}
+    part.update(part_extra)
+    return json.dumps({
+        'candidates': [{'content': {'parts': [
+            {'text': 'here "you" go {[,]}', 'thoughtSignature': 'x' * 5000},
+            part
+        ]}}],
+        'usageMetadata': {'data': 'not the image'}
+    }).encode('utf-8')
+
+def decode_in_chunks(raw, size):
+    decoder = InlineImageDecoder()
+    out = b''.join(decoder.feed(raw[i:i + size]) for i in range(0, len(raw), size))
+    decoder.close()
+    return out
+
+class RecordingS3:
+    def __init__(self, fail_part=None):
+        self.calls = []
+        self.fail_part = fail_part
+    def put_object(self, **kw):
+        self.calls.append(('put_object', kw))
+    def create_multipart_upload(self, **kw):
+        self.calls.append(('create', kw))
+        return {'UploadId': 'up-1'}
+    def upload_part(self, **kw):
+        self.calls.append(('part', kw))
+        if kw['PartNumber'] == self.fail_part:
+            raise RuntimeError('part failed')
+        return {'ETag': f"etag-{kw['PartNumber']}"}
+    def complete_multipart_upload(self, **kw):
+        self.calls.append(('complete', kw))
+    def abort_multipart_upload(self, **kw):
+        self.calls.append(('abort', kw))
+
+class InlineImageDecoderTests(unittest.TestCase):
+    def test_decodes_image_at_any_chunk_boundary(self):
+        raw = gemini_response()
+        for size in (1, 3, 7, 4096, len(raw)):
+            self.assertEqual(decode_in_chunks(raw, size), IMAGE)
+
+    def test_escaped_slashes_and_missing_padding(self):
+        data = base64.b64encode(b'\xff\xfe\xfd\xfc').decode('ascii').rstrip('=').replace('/', '\\/')
+        raw = ('{"candidates":[{"content":{"parts":[{"inlineData":{"data":"%s"}}]}}]}' % data).encode()
+        self.assertEqual(decode_in_chunks(raw, 2), b'\xff\xfe\xfd\xfc')
+
+    def test_stops_reading_after_image(self):
+        raw = gemini_response() + b'x' * 100000
+        reads = []
+        def read(n):
+            chunk = raw[len(reads) * n:(len(reads) + 1) * n]
+            reads.append(n)
+            return chunk
+        self.assertEqual(b''.join(iter_inline_image(read, chunk_size=1024)), IMAGE)
+        self.assertLess(len(reads) * 1024, len(raw) - 90000)
+
+    def test_missing_image_raises_with_response_head(self):
+        raw = json.dumps({'promptFeedback': {'blockReason': 'SAFETY'}}).encode()
+        with self.assertRaisesRegex(ValueError, 'SAFETY'):
+            decode_in_chunks(raw, 5)
+
+    def test_truncated_image_raises(self):
+        raw = gemini_response()[:8000]
+        with self.assertRaisesRegex(ValueError, 'ended inside'):
+            decode_in_chunks(raw, 100)
+
+class UploadStreamTests(unittest.TestCase):
+    def test_small_body_uses_single_put(self):
+        s3 = RecordingS3()
+        size = upload_stream(s3, 'b', 'k', [b'ab', b'cd'], 'image/png', part_size=10)
+        self.assertEqual(size, 4)
+        self.assertEqual([c[0] for c in s3.calls], ['put_object'])
+        self.assertEqual(s3.calls[0][1]['Body'], b'abcd')
+
+    def test_large_body_uses_multipart(self):
+        s3 = RecordingS3()
+        upload_stream(s3, 'b', 'k', [b'a' * 7, b'b' * 7, b'c' * 3], 'image/png', part_size=5)
+        self.assertEqual([c[0] for c in s3.calls], ['create', 'part', 'part', 'part', 'complete'])
+        bodies = [c[1]['Body'] for c in s3.calls if c[0] == 'part']
+        self.assertEqual(b''.join(bodies), b'a' * 7 + b'b' * 7 + b'c' * 3)
+        self.assertTrue(all(len(b) >= 5 for b in bodies[:-1]))
+        parts = s3.calls[-1][1]['MultipartUpload']['Parts']
+        self.assertEqual([p['PartNumber'] for p in parts], [1, 2, 3])
+
+    def test_failed_part_aborts_upload(self):
+        s3 = RecordingS3(fail_part=2)
+        with self.assertRaises(RuntimeError):
+            upload_stream(s3, 'b', 'k', [b'a' * 6, b'b' * 6], 'image/png', part_size=5)
+        self.assertEqual(s3.calls[-1][0], 'abort')
+
+    def test_failed_stream_writes_nothing(self):
+        s3 = RecordingS3()
+        def chunks():
+            raise ValueError('No image found')
+            yield b''
+        with self.assertRaises(ValueError):
+            upload_stream(s3, 'b', 'k', chunks(), 'image/png')
+        self.assertEqual(s3.calls, [])
+
+if __name__ == '__main__':
+    unittest.main()
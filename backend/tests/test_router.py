@@ -0,0 +1,80 @@
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so handlers can import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import http, storage
+from core.router import Router
+from handlers import profile
+
+class RouterTests(unittest.TestCase):
+    def setUp(self):
+        self.router = Router()
+        for method, template in [('POST', '/user/images/delete'), ('DELETE', '/user/images/{fileId}'),
+                                 ('POST', '/user/images'), ('PATCH', '/user/images/{fileId}')]:
+            self.router.route(method, template)(lambda e, u, _m=method, _t=template, **p: (_m, _t, p))
+
+    def test_literal_route_wins_over_template(self):
+        route, _ = self.router.match('POST', '/user/images/delete')
+        self.assertEqual(route(None, None), ('POST', '/user/images/delete', {}))
+
+    def test_template_extracts_parameters(self):
+        _, params = self.router.match('PATCH', '/user/images/abc-123/')
+        self.assertEqual(params, {'fileId': 'abc-123'})
+
+    def test_method_and_segments_must_match(self):
+        self.assertIsNone(self.router.match('GET', '/user/images')[0])
+        self.assertIsNone(self.router.match('DELETE', '/user/images/a/b')[0])
+        self.assertIsNone(self.router.match('POST', '/user/images-x')[0])
+
+class StagePathTests(unittest.TestCase):
+    def event(self, raw_path, stage):
+        return {'rawPath': raw_path, 'requestContext': {'stage': stage, 'http': {'method': 'GET'}}}
+
+    def test_named_stage_is_stripped_before_matching(self):
+        self.assertEqual(http.get_path(self.event('/prod/user/images', 'prod')), '/user/images')
+        self.assertEqual(http.get_path(self.event('/user/images', '$default')), '/user/images')
+        # Only a whole leading segment is the stage
+        self.assertEqual(http.get_path(self.event('/production/x', 'prod')), '/production/x')
+
+class CountingDynamoDB:
+    def __init__(self):
+        self.tables = []
+    def Table(self, name):
+        self.tables.append(name)
+        return None
+
+@patch.dict(os.environ, {'USER_TABLE_NAME': 'Users', 'BUCKET_NAME': 'bucket'})
+class ProfileRoutingTests(unittest.TestCase):
+    def call(self, method, path, body=None, stage=None):
+        db = CountingDynamoDB()
+        event = {
+            'rawPath': f"/{stage}{path}" if stage else path,
+            'headers': {'x-user-id': 'u1'},
+            'requestContext': {'stage': stage or '$default', 'http': {'method': method}},
+            'body': json.dumps(body or {})
+        }
+        with patch.object(storage, 'dynamodb', db):
+            response = profile.handler(event, None)
+        return response['statusCode'], db.tables
+
+    def test_unknown_route_is_404_without_building_tables(self):
+        self.assertEqual(self.call('GET', '/user/nothing'), (404, []))
+
+    def test_routes_match_under_the_deployed_stage(self):
+        self.assertEqual(self.call('POST', '/user/images/delete', {}, stage='prod'), (400, []))
+        self.assertEqual(self.call('GET', '/user/nothing', stage='prod'), (404, []))
+
+    def test_validation_errors_build_no_tables(self):
+        self.assertEqual(self.call('POST', '/user/images/delete', {}), (400, []))
+        self.assertEqual(self.call('PATCH', '/user/images/abc', {}), (400, []))
+
+if __name__ == '__main__':
+    unittest.main()
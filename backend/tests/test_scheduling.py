@@ -0,0 +1,208 @@
+import json
+import os
+import time
+import unittest
+from unittest.mock import patch
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so core modules can be imported
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from botocore.exceptions import ClientError
+from core import storage
+from core.scheduling import WeightedFairScheduler, lane_for, lane_weights
+from handlers import lane_dead_letter, scheduler
+
+class WeightedFairSchedulerTests(unittest.TestCase):
+    def test_shares_follow_weights_while_both_lanes_wait(self):
+        wfs = WeightedFairScheduler({'paid': 3, 'free': 1})
+        picks = [wfs.next(['paid', 'free']) for _ in range(400)]
+        self.assertEqual(picks.count('paid'), 300)
+        self.assertEqual(picks.count('free'), 100)
+
+    def test_free_lane_never_waits_more_than_paid_weight_picks(self):
+        wfs = WeightedFairScheduler({'paid': 3, 'free': 1})
+        gaps, since_free = [], 0
+        for _ in range(1000):
+            if wfs.next(['paid', 'free']) == 'free':
+                gaps.append(since_free)
+                since_free = 0
+            else:
+                since_free += 1
+        self.assertLessEqual(max(gaps), 3)
+
+    def test_only_ready_lanes_are_picked(self):
+        wfs = WeightedFairScheduler({'paid': 3, 'free': 1})
+        self.assertEqual({wfs.next(['free']) for _ in range(5)}, {'free'})
+        self.assertIsNone(wfs.next([]))
+
+    def test_lane_from_payment_history(self):
+        self.assertEqual(lane_for({'credits': 4}), 'free')
+        self.assertEqual(lane_for({'processed_payments': ['p1']}), 'paid')
+        self.assertEqual(lane_for({'purchasedCredits': 50}), 'paid')
+        self.assertEqual(lane_for(None), 'free')
+
+    def test_weights_from_environment(self):
+        with patch.dict(os.environ, {'LANE_WEIGHTS': 'paid=5,free=2'}):
+            self.assertEqual(lane_weights(), {'paid': 5, 'free': 2})
+
+def message(job_id, age_seconds=0):
+    sent = int((time.time() - age_seconds) * 1000)
+    return {
+        'Body': json.dumps({'jobId': job_id}),
+        'ReceiptHandle': f"rh-{job_id}",
+        'Attributes': {'SentTimestamp': str(sent)},
+    }
+
+class FakeSQS:
+    def __init__(self, queues):
+        self.queues = queues
+        self.deleted = []
+        self.released = []
+    def receive_message(self, QueueUrl, MaxNumberOfMessages, **kwargs):
+        queue = self.queues[QueueUrl]
+        batch, self.queues[QueueUrl] = queue[:MaxNumberOfMessages], queue[MaxNumberOfMessages:]
+        return {'Messages': batch}
+    def delete_message(self, QueueUrl, ReceiptHandle):
+        self.deleted.append(ReceiptHandle)
+    def change_message_visibility(self, QueueUrl, ReceiptHandle, VisibilityTimeout):
+        self.released.append(ReceiptHandle)
+
+class FakeSFN:
+    def __init__(self, running=0):
+        self.running = running
+        self.started = []
+    def list_executions(self, maxResults, **kwargs):
+        return {'executions': [{}] * min(self.running, maxResults)}
+    def start_execution(self, name, **kwargs):
+        self.started.append(name)
+
+class FakeJobs:
+    """Job records keyed by id; claim via the conditional update."""
+    def __init__(self, jobs):
+        self.jobs = jobs
+    def update_item(self, Key, UpdateExpression, **kwargs):
+        job = self.jobs.get(Key['jobId'])
+        if UpdateExpression.startswith('remove'):
+            job.pop('startedAt', None)
+            return {}
+        if not job or 'startedAt' in job or job['status'] != 'PROCESSING':
+            error = {'Error': {'Code': 'ConditionalCheckFailedException'}}
+            if job:
+                error['Item'] = job
+            raise ClientError(error, 'UpdateItem')
+        job['startedAt'] = kwargs['ExpressionAttributeValues'][':t']
+        return {}
+
+class FakeDynamoDB:
+    def __init__(self, jobs):
+        self.jobs = jobs
+    def Table(self, name):
+        return self.jobs
+
+class SchedulerHandlerTests(unittest.TestCase):
+    def run_scheduler(self, queues, jobs, running=0, released=0):
+        self.sqs, self.sfn = FakeSQS(queues), FakeSFN(running)
+        env = {'PAID_QUEUE_URL': 'paid', 'FREE_QUEUE_URL': 'free', 'TABLE_NAME': 'Jobs',
+               'STATE_MACHINE_ARN': 'arn:sm', 'MAX_RUNNING_JOBS': '4', 'LANE_WEIGHTS': 'paid=3,free=1'}
+        with patch.dict(os.environ, env), \
+             patch.object(scheduler, '_scheduler', None), \
+             patch.object(storage, 'sqs_client', self.sqs), \
+             patch.object(storage, 'sfn_client', self.sfn), \
+             patch.object(storage, 'dynamodb', FakeDynamoDB(FakeJobs(jobs))):
+            return scheduler.handler({'released': released}, None)
+
+    def test_fills_free_slots_in_weighted_order_and_returns_the_rest(self):
+        ids = ['p1', 'p2', 'p3', 'p4', 'f1', 'f2']
+        jobs = {i: {'jobId': i, 'status': 'PROCESSING'} for i in ids}
+        result = self.run_scheduler({
+            'paid': [message('p1'), message('p2'), message('p3'), message('p4')],
+            'free': [message('f1'), message('f2')],
+        }, jobs, running=1, released=1)
+
+        self.assertEqual(result, {'started': 4})
+        self.assertEqual(self.sfn.started, ['p1', 'p2', 'f1', 'p3'])
+        self.assertEqual(sorted(self.sqs.deleted), ['rh-f1', 'rh-p1', 'rh-p2', 'rh-p3'])
+        self.assertEqual(sorted(self.sqs.released), ['rh-f2', 'rh-p4'])
+        self.assertIn('startedAt', jobs['f1'])
+
+    def test_no_free_slot_starts_nothing(self):
+        result = self.run_scheduler({'paid': [message('p1')], 'free': []},
+                                    {'p1': {'jobId': 'p1', 'status': 'PROCESSING'}}, running=4)
+        self.assertEqual(result, {'started': 0})
+        self.assertEqual(self.sfn.started, [])
+
+    def test_drops_redelivered_and_orphaned_messages_keeps_young_ones(self):
+        jobs = {'done': {'jobId': 'done', 'status': 'COMPLETED'}, 'ok': {'jobId': 'ok', 'status': 'PROCESSING'}}
+        result = self.run_scheduler({
+            'paid': [],
+            'free': [message('done'), message('orphan', age_seconds=120), message('young'), message('ok')],
+        }, jobs)
+
+        self.assertEqual(result, {'started': 1})
+        self.assertEqual(self.sfn.started, ['ok'])
+        self.assertEqual(sorted(self.sqs.deleted), ['rh-done', 'rh-ok', 'rh-orphan'])
+        # Back on the queue at once rather than after the visibility timeout
+        self.assertIn('rh-young', self.sqs.released)
+
+class DeadLetterTables:
+    """Jobs (with one batch) and a profile, behind one Table(name)."""
+    def __init__(self, jobs, profile):
+        self.jobs, self.profile = jobs, profile
+    def Table(self, name):
+        return self if name == 'Jobs' else self.Profiles(self.profile)
+    def update_item(self, Key, ExpressionAttributeValues, ConditionExpression, **kwargs):
+        job, values = self.jobs[Key['jobId']], ExpressionAttributeValues
+        if 'pendingJobs' in ConditionExpression:
+            if values[':job_id'] not in job['pendingJobs']:
+                raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'UpdateItem')
+            job['pendingJobs'] -= values[':job']
+            return {'Attributes': {'pendingJobs': job['pendingJobs']} if job['pendingJobs'] else {}}
+        if job['status'] != 'PROCESSING' or 'startedAt' in job:
+            raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'UpdateItem')
+        job.update(status=values[':s'], error=values[':e'])
+        return {}
+
+    class Profiles:
+        def __init__(self, profile):
+            self.profile = profile
+        def update_item(self, ExpressionAttributeValues, **kwargs):
+            values = ExpressionAttributeValues
+            if ':slot_id' in values and values[':slot_id'] not in self.profile['inFlightJobs']:
+                raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'UpdateItem')
+            self.profile['credits'] += values.get(':inc', 0)
+            self.profile['inFlightJobs'] -= values.get(':job', set())
+            return {}
+
+class LaneDeadLetterTests(unittest.TestCase):
+    def test_unstarted_jobs_are_failed_and_refunded(self):
+        jobs = {
+            'j1': {'jobId': 'j1', 'status': 'PROCESSING'},
+            'j2': {'jobId': 'j2', 'status': 'PROCESSING', 'startedAt': 't'},
+            'x1': {'jobId': 'x1', 'status': 'PROCESSING'},
+            'b1': {'jobId': 'b1', 'kind': 'batch', 'pendingJobs': {'x1'}},
+        }
+        profile = {'credits': 0, 'inFlightJobs': {'j1', 'j2', 'b1'}}
+        bodies = [
+            {'jobId': 'j1', 'userId': 'u1', 'creditCost': 2, 'batchId': None},
+            {'jobId': 'j2', 'userId': 'u1', 'creditCost': 1, 'batchId': None},
+            {'jobId': 'x1', 'userId': 'u1', 'creditCost': 1, 'batchId': 'b1'},
+        ]
+        records = [{'messageId': f"m{n}", 'body': json.dumps(body)} for n, body in enumerate(bodies)]
+        records.append({'messageId': 'bad', 'body': 'not json'})
+        env = {'TABLE_NAME': 'Jobs', 'USER_TABLE_NAME': 'Users'}
+        with patch.dict(os.environ, env), patch.object(storage, 'dynamodb', DeadLetterTables(jobs, profile)):
+            response = lane_dead_letter.handler({'Records': records}, None)
+
+        self.assertEqual(response, {'batchItemFailures': [{'itemIdentifier': 'bad'}]})
+        self.assertEqual(jobs['j1']['status'], 'FAILED')
+        # A job started after all keeps running and keeps its slot
+        self.assertEqual(jobs['j2']['status'], 'PROCESSING')
+        self.assertEqual(jobs['x1']['status'], 'FAILED')
+        self.assertEqual(profile, {'credits': 3, 'inFlightJobs': {'j2'}})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import io
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so handlers can import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from botocore.exceptions import ClientError
+from core import storage
+from handlers import profile, selfie_processor
+
+def image(image_id, **extra):
+    item = {'id': image_id, 'name': image_id, 's3Key': f"uploads/u1/{image_id}-me.png",
+            's3Url': f"https://bucket.s3.amazonaws.com/uploads/u1/{image_id}-me.png"}
+    item.update(extra)
+    return item
+
+class SelfiesTable:
+    """Selfie items keyed by (userId, imageId), honouring the existence condition."""
+    def __init__(self, items, pages=1):
+        self.items = {(i['userId'], i['imageId']): i for i in items}
+        self.pages = pages
+    def update_item(self, Key, UpdateExpression, ConditionExpression, ExpressionAttributeNames,
+                    ExpressionAttributeValues, ReturnValues):
+        item = self.items.get((Key['userId'], Key['imageId']))
+        if item is None:
+            raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'UpdateItem')
+        old = {}
+        for placeholder, field in ExpressionAttributeNames.items():
+            if field in item:
+                old[field] = item[field]
+            item[field] = ExpressionAttributeValues[':' + placeholder[1:]]
+        return {'Attributes': old}
+    def scan(self, **kwargs):
+        keys = sorted(k for k, i in self.items.items() if 'modelS3Key' not in i)
+        per_page = max(1, len(self.items) // self.pages)
+        start = kwargs.get('ExclusiveStartKey', 0)
+        response = {'Items': [dict(self.items[k]) for k in keys[start:start + per_page]]}
+        if start + per_page < len(keys):
+            response['LastEvaluatedKey'] = start + per_page
+        return response
+
+def selfie_item(user_id, image_id, **extra):
+    item = {k: v for k, v in image(image_id, **extra).items() if k != 'id'}
+    item.update(userId=user_id, imageId=image_id)
+    return item
+
+class DummyDynamoDB:
+    def __init__(self, table):
+        self.table = table
+    def Table(self, name):
+        return self.table
+
+class DummyS3:
+    def __init__(self):
+        self.puts = []
+        self.deleted = []
+    def get_object(self, Bucket, Key):
+        return {'Body': io.BytesIO(b'original')}
+    def put_object(self, **kw):
+        self.puts.append(kw['Key'])
+    def delete_object(self, Bucket, Key):
+        self.deleted.append(Key)
+
+def fake_render(source, fmt, renditions):
+    return {name: b'jpeg' for name in renditions}
+
+@patch.dict(os.environ, {'BUCKET_NAME': 'bucket', 'USER_SELFIES_TABLE_NAME': 'Selfies'})
+@patch('handlers.selfie_processor.render', fake_render)
+class SelfieProcessorTests(unittest.TestCase):
+    def run_with(self, table, event):
+        s3 = DummyS3()
+        with patch.object(storage, 'dynamodb', DummyDynamoDB(table)), patch.object(storage, 's3_client', s3):
+            return selfie_processor.handler(event, None), s3
+
+    def test_records_variants_and_replaces_client_thumbnail(self):
+        old = image('a', thumbnailS3Key='uploads/u1/a-thumb-me.png')
+        table = SelfiesTable([selfie_item('u1', 'a', thumbnailS3Key='uploads/u1/a-thumb-me.png')])
+
+        result, s3 = self.run_with(table, {'userId': 'u1', 'image': old})
+
+        stored = table.items[('u1', 'a')]
+        self.assertTrue(result['processed'])
+        self.assertEqual(stored['thumbnailS3Key'], 'uploads/u1/a-me.thumb.jpg')
+        self.assertEqual(stored['modelUrl'], 'https://bucket.s3.amazonaws.com/uploads/u1/a-me.model.jpg')
+        self.assertEqual(s3.deleted, ['uploads/u1/a-thumb-me.png'])
+
+    def test_deleted_image_cleans_up_variants(self):
+        table = SelfiesTable([])
+
+        result, s3 = self.run_with(table, {'userId': 'u1', 'image': image('a')})
+
+        self.assertFalse(result['processed'])
+        self.assertEqual(sorted(s3.deleted), sorted(s3.puts))
+
+    def test_backfill_processes_unprocessed_images_across_pages(self):
+        table = SelfiesTable([
+            selfie_item('u1', 'a'),
+            selfie_item('u2', 'b'),
+            selfie_item('u3', 'c', modelS3Key='uploads/u3/c-me.model.jpg'),
+        ], pages=3)
+
+        result, _ = self.run_with(table, {'backfill': True})
+
+        self.assertEqual(result, {'found': 2, 'processed': 2, 'remaining': 0})
+        self.assertIn('modelS3Key', table.items[('u2', 'b')])
+
+    def test_backfill_limit_reports_remaining(self):
+        table = SelfiesTable([selfie_item('u1', 'a'), selfie_item('u1', 'b')])
+        result, _ = self.run_with(table, {'backfill': True, 'limit': 1})
+        self.assertEqual(result['remaining'], 1)
+
+class ConfirmUploadTests(unittest.TestCase):
+    @patch.dict(os.environ, {'SELFIE_PROCESSOR_FUNCTION': 'processor'})
+    def test_confirm_starts_processing_asynchronously(self):
+        calls = []
+        class DummyLambda:
+            def invoke(self, **kw):
+                calls.append(kw)
+        with patch.object(storage, 'lambda_client', DummyLambda()):
+            profile.start_selfie_processing('u1', image('a'))
+
+        self.assertEqual(calls[0]['InvocationType'], 'Event')
+        self.assertEqual(json.loads(calls[0]['Payload'])['image']['id'], 'a')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import unittest
+from unittest.mock import patch
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so core modules can be imported
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from botocore.exceptions import ClientError
+from core import dynamo, storage
+from core.dynamo import serialize
+from core.selfies import MAX_IMAGES, add_selfie, delete_selfies, get_selfie, migrate_legacy_images
+
+class TransactClient:
+    """transact_write_items over one profile, evaluating the conditions core.selfies uses."""
+    def __init__(self, legacy=None):
+        self.count = None
+        self.legacy = legacy
+        self.selfies = {}
+
+    def _check(self, op):
+        condition = op.get('ConditionExpression', '')
+        if 'imageCount < :max' in condition:
+            if self.legacy is not None and 'attribute_not_exists(images)' in condition:
+                return False
+            return self.count is None or self.count < int(op['ExpressionAttributeValues'][':max']['N'])
+        if condition == 'attribute_exists(images)':
+            return self.legacy is not None
+        if condition == 'attribute_not_exists(imageId)':
+            return op['Item']['imageId']['S'] not in self.selfies
+        if condition == 'attribute_exists(imageId)':
+            return op['Key']['imageId']['S'] in self.selfies
+        return True
+
+    def get_item(self, TableName, Key, **kwargs):
+        if TableName == 'Selfies':
+            item = self.selfies.get(Key['imageId']['S'])
+            return {'Item': item} if item else {}
+        return {'Item': {'images': serialize(self.legacy)}} if self.legacy is not None else {}
+
+    def transact_write_items(self, TransactItems):
+        ops = [(kind, op) for item in TransactItems for kind, op in item.items()]
+        if not all(self._check(op) for _, op in ops):
+            raise ClientError({'Error': {'Code': 'TransactionCanceledException'}}, 'TransactWriteItems')
+        for kind, op in ops:
+            if kind == 'Put':
+                self.selfies[op['Item']['imageId']['S']] = op['Item']
+            elif kind == 'Delete':
+                del self.selfies[op['Key']['imageId']['S']]
+            else:
+                self.count = (self.count or 0) + int(op['ExpressionAttributeValues'][':delta']['N'])
+                if 'REMOVE images' in op['UpdateExpression']:
+                    self.legacy = None
+
+def image(image_id):
+    return {'id': image_id, 'name': image_id, 's3Url': f"https://bucket.s3.amazonaws.com/uploads/u1/{image_id}.png"}
+
+@patch.dict(os.environ, {'USER_TABLE_NAME': 'Users', 'USER_SELFIES_TABLE_NAME': 'Selfies'})
+class SelfieTransactionTests(unittest.TestCase):
+    def run_with(self, client, fn, *args):
+        with patch.object(storage, 'dynamodb_client', client), \
+             patch.object(storage, 'dynamodb', dynamo.Resource(client)):
+            return fn(*args)
+
+    def test_add_stops_at_the_limit(self):
+        client = TransactClient()
+        added = [self.run_with(client, add_selfie, 'u1', image(str(n))) for n in range(MAX_IMAGES + 1)]
+
+        self.assertEqual(added, [True] * MAX_IMAGES + [False])
+        self.assertEqual(client.count, MAX_IMAGES)
+        self.assertEqual(len(client.selfies), MAX_IMAGES)
+
+    def test_delete_uncounts_and_refuses_missing_images(self):
+        client = TransactClient()
+        for n in range(3):
+            self.run_with(client, add_selfie, 'u1', image(str(n)))
+
+        self.assertTrue(self.run_with(client, delete_selfies, 'u1', [image('0'), image('1')]))
+        self.assertFalse(self.run_with(client, delete_selfies, 'u1', [image('1'), image('2')]))
+        self.assertEqual(client.count, 1)
+        self.assertEqual(list(client.selfies), ['2'])
+
+    def test_migration_keeps_order_and_runs_once(self):
+        legacy = [image('b'), image('a')]
+        client = TransactClient(legacy=legacy)
+
+        self.assertTrue(self.run_with(client, migrate_legacy_images, 'u1', legacy))
+        self.assertFalse(self.run_with(client, migrate_legacy_images, 'u1', legacy))
+
+        created = sorted(client.selfies, key=lambda i: client.selfies[i]['createdAt']['S'])
+        self.assertEqual(created, ['b', 'a'])
+        self.assertEqual(client.count, 2)
+        self.assertIsNone(client.legacy)
+
+    def test_legacy_images_count_before_an_add(self):
+        legacy = [image(str(n)) for n in range(MAX_IMAGES)]
+        client = TransactClient(legacy=legacy)
+
+        self.assertFalse(self.run_with(client, add_selfie, 'u1', image('extra')))
+        # Migrated on the way, and the limit held
+        self.assertIsNone(client.legacy)
+        self.assertEqual(client.count, MAX_IMAGES)
+
+        client = TransactClient(legacy=[image('old')])
+        self.assertTrue(self.run_with(client, add_selfie, 'u1', image('new')))
+        self.assertEqual(client.count, 2)
+
+    def test_selfie_on_a_legacy_profile_is_found(self):
+        client = TransactClient(legacy=[image('a')])
+
+        self.assertEqual(self.run_with(client, get_selfie, 'u1', 'a')['id'], 'a')
+        self.assertIsNone(client.legacy)
+        self.assertIsNone(self.run_with(client, get_selfie, 'u1', 'missing'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import os
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so core modules can be imported
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import auth
+from core.jobs import get_job
+from core.singleflight import SingleFlight
+
+WORKERS = 16
+
+class GatedFetch:
+    """Counts calls and blocks them until every worker has asked."""
+    def __init__(self, result='value', error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.release = threading.Event()
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        return self.result
+
+def run_concurrently(flight, key, fetch):
+    """Call flight.do from WORKERS threads at once; returns results or exceptions."""
+    started = threading.Barrier(WORKERS + 1)
+    def call():
+        started.wait()
+        try:
+            return flight.do(key, fetch)
+        except Exception as e:
+            return e
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        futures = [pool.submit(call) for _ in range(WORKERS)]
+        started.wait()
+        # Give every worker time to join the flight before it lands
+        threading.Event().wait(0.05)
+        fetch.release.set()
+        return [f.result() for f in futures]
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+class SingleFlightTests(unittest.TestCase):
+    def test_concurrent_callers_share_one_fetch(self):
+        fetch = GatedFetch()
+        results = run_concurrently(SingleFlight(), 'k', fetch)
+        self.assertEqual(fetch.calls, 1)
+        self.assertEqual(results, ['value'] * WORKERS)
+
+    def test_failure_reaches_every_waiter_and_is_not_kept(self):
+        flight = SingleFlight(ttl=60)
+        fetch = GatedFetch(error=RuntimeError('down'))
+        results = run_concurrently(flight, 'k', fetch)
+
+        self.assertEqual(fetch.calls, 1)
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertEqual(flight.do('k', lambda: 'retried'), 'retried')
+
+    def test_result_is_kept_for_the_ttl(self):
+        clock = FakeClock()
+        flight = SingleFlight(ttl=1, clock=clock)
+        calls = []
+        fetch = lambda: calls.append(1) or len(calls)  # noqa: E731
+
+        self.assertEqual(flight.do('k', fetch), 1)
+        clock.now = 0.5
+        self.assertEqual(flight.do('k', fetch), 1)
+        self.assertEqual(flight.do('other', fetch), 2)
+        clock.now = 1.0
+        self.assertEqual(flight.do('k', fetch), 3)
+
+    def test_zero_ttl_only_coalesces_in_flight(self):
+        flight = SingleFlight()
+        self.assertEqual([flight.do('k', lambda: n) for n in range(2)], [0, 1])
+
+    def test_ttl_can_depend_on_the_result(self):
+        clock = FakeClock()
+        flight = SingleFlight(ttl=60, clock=clock)
+        self.assertEqual(flight.do('k', lambda: 5, ttl=lambda n: n), 5)
+        clock.now = 4
+        self.assertEqual(flight.do('k', lambda: 6, ttl=lambda n: n), 5)
+        clock.now = 5
+        self.assertEqual(flight.do('k', lambda: 7, ttl=lambda n: n), 7)
+
+class TokenLookupTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = patch.object(auth, '_google_lookups', SingleFlight(ttl=auth.TOKEN_TTL_SECONDS, clock=self.clock))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def user_id(self, answers):
+        event = {'headers': {'Authorization': 'Bearer t1'}}
+        with patch.object(auth, '_token_info', side_effect=answers) as lookup:
+            user_id = auth.get_user_id_from_token(event)
+        return user_id, lookup.call_count
+
+    def test_answer_is_not_reused_past_the_token_expiry(self):
+        self.assertEqual(self.user_id([{'sub': 'u1', 'expires_in': '10'}]), ('u1', 1))
+        self.clock.now = 9
+        self.assertEqual(self.user_id([]), ('u1', 0))
+        self.clock.now = 10
+        self.assertEqual(self.user_id([{'sub': 'u1', 'expires_in': '3599'}]), ('u1', 1))
+
+    def test_failed_lookups_are_not_reused(self):
+        self.assertEqual(self.user_id([{'error': 'invalid_token'}]), (None, 1))
+        self.assertEqual(self.user_id([RuntimeError('down')]), (None, 1))
+        self.assertEqual(self.user_id([{'sub': 'u1', 'expires_in': '3599'}]), ('u1', 1))
+
+class JobReadTests(unittest.TestCase):
+    def test_parallel_polls_share_one_get_item(self):
+        gate = GatedFetch(result={'Item': {'jobId': 'j1', 'status': 'COMPLETED'}})
+        class JobTable:
+            name = 'Jobs-parallel-polls'
+            def get_item(self, Key):
+                return gate()
+        table = JobTable()
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            futures = [pool.submit(get_job, table, 'j1') for _ in range(WORKERS)]
+            threading.Event().wait(0.05)
+            gate.release.set()
+            items = [f.result() for f in futures]
+
+        self.assertEqual(gate.calls, 1)
+        self.assertTrue(all(item['status'] == 'COMPLETED' for item in items))
+        # Each caller gets its own copy to modify
+        self.assertEqual(len({id(item) for item in items}), WORKERS)
+
+if __name__ == '__main__':
+    unittest.main()
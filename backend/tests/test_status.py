@@ -0,0 +1,87 @@
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so handlers can import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import jobs, storage
+from core.singleflight import SingleFlight
+from handlers import status
+
+class JobTable:
+    def __init__(self, name, item=None):
+        self.name = name
+        self.item = item
+        self.reads = 0
+    def get_item(self, Key):
+        self.reads += 1
+        return {'Item': dict(self.item)} if self.item else {}
+
+class OneTable:
+    def __init__(self, table):
+        self.table = table
+    def Table(self, name):
+        return self.table
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+class StatusCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = patch.object(jobs, '_job_reads', SingleFlight(ttl=jobs.JOB_TTL_SECONDS, clock=self.clock))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def poll(self, table, times=1):
+        with patch.object(storage, 'dynamodb', OneTable(table)), patch.dict(os.environ, {'TABLE_NAME': table.name}):
+            responses = []
+            for _ in range(times):
+                responses.append(status.handler({'pathParameters': {'jobId': 'j1'}}, None))
+                self.clock.now += 5
+        return responses
+
+    def test_finished_job_is_read_once_and_cacheable(self):
+        table = JobTable('Jobs-finished', {'jobId': 'j1', 'status': 'COMPLETED', 'resultUrl': 'r'})
+        responses = self.poll(table, times=3)
+
+        self.assertEqual(table.reads, 1)
+        self.assertIn('immutable', responses[-1]['headers']['Cache-Control'])
+        self.assertEqual(json.loads(responses[-1]['body'])['resultUrl'], 'r')
+
+    def test_pending_job_is_read_again_after_the_ttl(self):
+        table = JobTable('Jobs-pending', {'jobId': 'j1', 'status': 'PROCESSING'})
+        responses = self.poll(table, times=2)
+
+        self.assertEqual(table.reads, 2)
+        self.assertEqual(responses[0]['headers']['Cache-Control'], 'no-store')
+
+    def test_missing_job_is_not_found_and_not_cached(self):
+        table = JobTable('Jobs-missing')
+        [response] = self.poll(table)
+        self.assertEqual(response['statusCode'], 404)
+        self.assertEqual(response['headers']['Cache-Control'], 'no-store')
+
+        # Written just after the miss: the next poll, within the TTL, sees it
+        self.clock.now -= 5
+        table.item = {'jobId': 'j1', 'status': 'FAILED', 'error': 'boom'}
+        [response] = self.poll(table)
+        self.assertEqual(json.loads(response['body'])['status'], 'FAILED')
+
+    def test_batch_record_is_not_served(self):
+        table = JobTable('Jobs-batch', {'jobId': 'j1', 'kind': 'batch', 'userId': 'u1', 'pairs': []})
+        [response] = self.poll(table)
+        self.assertEqual(response['statusCode'], 404)
+        self.assertNotIn('u1', response['body'])
+
+if __name__ == '__main__':
+    unittest.main()
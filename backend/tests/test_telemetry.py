@@ -0,0 +1,110 @@
+import os
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so core modules can be imported
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import telemetry
+from core.telemetry import MemoryExporter, Tracer
+
+class TracerTests(unittest.TestCase):
+    def setUp(self):
+        self.exporter = MemoryExporter()
+        patcher = patch.object(telemetry, 'exporter', self.exporter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_handler_emits_one_emf_record_per_invocation(self):
+        tracer = Tracer('generator')
+
+        @tracer.handler
+        def handler(event, context):
+            tracer.annotate(jobId=event['jobId'])
+            with tracer.span('item_download'):
+                pass
+            return 'ok'
+
+        self.assertEqual(handler({'jobId': 'job-1'}, None), 'ok')
+
+        record, = self.exporter.records
+        emf = record['_aws']['CloudWatchMetrics'][0]
+        self.assertEqual(emf['Dimensions'], [['Function']])
+        self.assertEqual([m['Name'] for m in emf['Metrics']], ['item_download', 'total'])
+        self.assertEqual(record['Function'], 'generator')
+        self.assertEqual(record['jobId'], 'job-1')
+        self.assertIsInstance(record['item_download'], float)
+        self.assertEqual([s['name'] for s in record['spans']], ['item_download', 'total'])
+
+    def test_repeated_stage_keeps_every_value(self):
+        tracer = Tracer('generator')
+        tracer.start_invocation({})
+        for _ in range(3):
+            tracer.timed('gemini_request', lambda: None)
+        tracer.flush()
+
+        self.assertEqual(len(self.exporter.records[0]['gemini_request']), 3)
+        self.assertEqual(len(self.exporter.durations('gemini_request')), 3)
+
+    def test_continues_trace_from_event(self):
+        tracer = Tracer('saver')
+        tracer.start_invocation({'trace': {'traceId': 'abc', 'spanId': 'parent'}})
+        tracer.timed('job_write', lambda: None)
+        tracer.flush()
+
+        record = self.exporter.records[0]
+        self.assertEqual(record['traceId'], 'abc')
+        self.assertEqual(record['parentSpanId'], 'parent')
+        self.assertEqual(tracer.context(), {'traceId': 'abc', 'spanId': record['spanId']})
+
+    def test_failed_span_is_marked_and_record_still_flushed(self):
+        tracer = Tracer('saver')
+
+        @tracer.handler
+        def handler(event, context):
+            with tracer.span('job_write'):
+                raise RuntimeError('throttled')
+
+        with self.assertRaises(RuntimeError):
+            handler({}, None)
+
+        spans = self.exporter.records[0]['spans']
+        self.assertTrue(spans[0]['error'])
+        self.assertEqual(spans[1]['name'], 'total')
+
+    def test_new_invocation_resets_spans(self):
+        tracer = Tracer('saver')
+        tracer.start_invocation({})
+        tracer.timed('job_write', lambda: None)
+        first = tracer.trace_id
+        tracer.start_invocation({})
+        tracer.flush()
+
+        self.assertEqual(self.exporter.records, [])
+        self.assertNotEqual(tracer.trace_id, first)
+
+    def test_span_that_outlives_its_invocation_is_dropped(self):
+        tracer = Tracer('dispatcher')
+        release = threading.Event()
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            tracer.start_invocation({})
+            # Still running when the handler answers early
+            future = tracer.submit(pool, 'selfie_read', release.wait, 5)
+            tracer.flush()
+
+            tracer.start_invocation({})
+            tracer.timed('charge_credit', lambda: None)
+            release.set()
+            future.result()
+            tracer.flush()
+
+        self.assertEqual([s['name'] for s in self.exporter.records[-1]['spans']], ['charge_credit'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import json
+import os
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import sys
+
+# Add mocks directory to path so imports of boto3/botocore work,
+# and the backend directory so handlers can import core modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'mocks'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import auth, storage, warmup
+from core.warmup import Warmup
+from handlers import status
+
+class Lambda:
+    def __init__(self):
+        self.invocations = []
+    def invoke(self, FunctionName, Payload):
+        self.invocations.append((FunctionName, json.loads(Payload)))
+        return {'StatusCode': 200}
+
+class WarmupTests(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.requests = []
+
+    def step(self):
+        self.calls.append('step')
+
+    def failing_once(self):
+        if 'failed' not in self.calls:
+            self.calls.append('failed')
+            raise ConnectionError('DNS not ready')
+        self.calls.append('retried')
+
+    def wrapped(self, *steps):
+        @Warmup('test', *steps).handler
+        def handler(event, context):
+            self.requests.append(event)
+            return {'statusCode': 200}
+        return handler
+
+    def test_warmup_event_prepares_and_returns_before_the_handler(self):
+        handler = self.wrapped(self.step)
+        response = handler({'warmup': {}}, None)
+        handler({'warmup': {}}, None)
+
+        self.assertEqual((response['warm'], response['cold'], response['warmed']), (True, True, 1))
+        self.assertEqual(self.calls, ['step'])
+        self.assertEqual(self.requests, [])
+        self.assertEqual(handler({'warmup': 'yes'}, None), {'statusCode': 200})
+
+    def test_failed_step_is_retried_on_the_next_ping(self):
+        handler = self.wrapped(self.failing_once)
+        handler({'warmup': {}}, None)
+        handler({'warmup': {}}, None)
+        handler({'warmup': {}}, None)
+        self.assertEqual(self.calls, ['failed', 'retried'])
+
+    @patch.dict(os.environ, {'AWS_LAMBDA_FUNCTION_NAME': 'stack-status'})
+    def test_steps_run_at_init_in_lambda_and_pings_fan_out(self):
+        lambda_client = Lambda()
+        handler = self.wrapped(self.step)
+        self.assertEqual(self.calls, ['step'])
+
+        with patch.object(storage, 'lambda_client', lambda_client):
+            response = handler({'warmup': {'concurrency': 50}}, SimpleNamespace(function_name='stack-status'))
+
+        self.assertEqual(response['warmed'], warmup.MAX_CONCURRENCY)
+        self.assertEqual(len(lambda_client.invocations), warmup.MAX_CONCURRENCY - 1)
+        self.assertEqual(lambda_client.invocations[0], ('stack-status', {'warmup': {'concurrency': 1, 'holdMs': warmup.HOLD_MS}}))
+
+    def test_status_answers_pings_without_reading_jobs(self):
+        client = SimpleNamespace(meta=SimpleNamespace(endpoint_url='https://dynamodb.us-east-1.amazonaws.com'))
+        with patch.object(storage, 'dynamodb_client', client), \
+             patch.object(storage, 'dynamodb', SimpleNamespace()), \
+             patch('socket.getaddrinfo') as resolve:
+            response = status.handler({'warmup': {}}, None)
+        self.assertTrue(response['warm'])
+        resolve.assert_called_with('dynamodb.us-east-1.amazonaws.com', 443)
+
+class AuthPrewarmTests(unittest.TestCase):
+    def test_prewarm_keeps_one_tls_context(self):
+        with patch('socket.getaddrinfo') as resolve:
+            auth.prewarm()
+        resolve.assert_called_with(auth.GOOGLE_API_HOST, 443)
+        self.assertIs(auth._tls(), auth._tls())
+
+if __name__ == '__main__':
+    unittest.main()
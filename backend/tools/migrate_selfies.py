@@ -0,0 +1,49 @@
+"""
+Move every profile's legacy `images` list into the TryOnUserSelfies table.
+
+Every selfie read migrates its profile lazily when the selfie is not found
+(core.selfies.get_selfie), so this is optional; it saves those first
+requests the extra reads. Run it once after deploying:
+
+    USER_TABLE_NAME=TryOnUserProfiles USER_SELFIES_TABLE_NAME=TryOnUserSelfies \
+        python3 tools/migrate_selfies.py
+
+It is safe to repeat; profiles already migrated are skipped.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import storage  # noqa: E402
+from core.selfies import migrate_legacy_images  # noqa: E402
+
+
+def legacy_profiles(user_table):
+    """Yield (userId, images) for profiles that still hold an images list."""
+    scan_args = {
+        'ProjectionExpression': '#u, #i',
+        'FilterExpression': 'attribute_exists(#i)',
+        'ExpressionAttributeNames': {'#u': 'userId', '#i': 'images'}
+    }
+    while True:
+        page = user_table.scan(**scan_args)
+        for item in page.get('Items', []):
+            yield item['userId'], item['images']
+        if 'LastEvaluatedKey' not in page:
+            return
+        scan_args['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+
+def main():
+    user_table = storage.table(os.environ['USER_TABLE_NAME'])
+    migrated = images = 0
+    for user_id, legacy in legacy_profiles(user_table):
+        if migrate_legacy_images(user_id, legacy):
+            migrated += 1
+            images += len(legacy)
+    print(f"Migrated {images} images from {migrated} profiles")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Build the deployment artifact for one Lambda handler.
+
+Starting from the handler module, follows every import (including imports
+inside functions) that resolves to a module in this directory and copies
+only those files, with their parent packages. Standard library and
+third-party imports are left to the Lambda runtime.
+
+Used by the Makefile targets that `sam build` runs for each function:
+
+    python3 tools/package_handler.py handlers.status.handler "$(ARTIFACTS_DIR)"
+
+Without a destination it lists the files the handler would ship.
+"""
+import ast
+import os
+import re
+import shutil
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE_PATH = os.path.join(BACKEND_DIR, 'template.yaml')
+
+
+def module_path(name):
+    """Source file of a local module or package, or None if `name` is not local."""
+    base = os.path.join(BACKEND_DIR, *name.split('.'))
+    package_init = os.path.join(base, '__init__.py')
+    if os.path.isfile(package_init):
+        return package_init
+    if os.path.isfile(base + '.py'):
+        return base + '.py'
+    return None
+
+
+def imported_names(path, module_name):
+    """Every module name an import statement in `path` could refer to."""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), path)
+    is_package = path.endswith('__init__.py')
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                yield alias.name
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ''
+            if node.level:
+                package = module_name if is_package else module_name.rpartition('.')[0]
+                for _ in range(node.level - 1):
+                    package = package.rpartition('.')[0]
+                base = f"{package}.{base}".strip('.')
+            yield base
+            # `from core import storage` imports the submodule core.storage
+            for alias in node.names:
+                yield f"{base}.{alias.name}"
+
+
+def local_closure(module_name):
+    """Map of module name -> source path for everything `module_name` loads from this directory."""
+    found = {}
+    pending = [module_name]
+    while pending:
+        name = pending.pop()
+        parts = name.split('.')
+        # Importing a.b.c also runs a/__init__.py and a/b/__init__.py
+        for i in range(1, len(parts) + 1):
+            candidate = '.'.join(parts[:i])
+            if candidate in found:
+                continue
+            path = module_path(candidate)
+            if path is None:
+                continue
+            found[candidate] = path
+            pending.extend(imported_names(path, candidate))
+    return found
+
+
+def handler_files(handler_spec):
+    """Source files for a handler spec like 'handlers.status.handler'."""
+    module_name = handler_spec.rsplit('.', 1)[0]
+    if module_path(module_name) is None:
+        raise SystemExit(f"Handler module not found: {module_name}")
+    return sorted(local_closure(module_name).values())
+
+
+def package(handler_spec, destination):
+    for path in handler_files(handler_spec):
+        target = os.path.join(destination, os.path.relpath(path, BACKEND_DIR))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(path, target)
+
+
+def template_handlers(template_path=TEMPLATE_PATH):
+    """Map of function logical ID -> Handler from template.yaml."""
+    handlers = {}
+    resource = None
+    with open(template_path, encoding='utf-8') as f:
+        for line in f:
+            match = re.match(r'^  (\w+):\s*$', line)
+            if match:
+                resource = match.group(1)
+                continue
+            match = re.match(r'^\s+Handler:\s*(\S+)', line)
+            if match and resource:
+                handlers[resource] = match.group(1)
+    return handlers
+
+
+def main(argv):
+    if len(argv) not in (1, 2):
+        raise SystemExit(__doc__)
+    if len(argv) == 1:
+        for path in handler_files(argv[0]):
+            print(os.path.relpath(path, BACKEND_DIR))
+    else:
+        package(argv[0], argv[1])
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,127 @@
+"""
+Replay a burst of signed Prodamus webhook deliveries against an endpoint,
+to load-test POST /payment/webhook and the payment queue behind it.
+
+    sam local start-api &
+    PRODAMUS_SECRET_KEY=... python3 tools/replay_webhooks.py \\
+        --url http://127.0.0.1:3000/payment/webhook --deliveries 500 --concurrency 50
+
+Deliveries are synthesized successful payments for --users users, signed
+with PRODAMUS_SECRET_KEY; a --duplicates share of them repeats an earlier
+payment, the way Prodamus retries. --file replays recorded deliveries
+instead, one {"headers", "body"} JSON object per line, exactly as captured.
+Prints the answers by status, latency percentiles and the credits each user
+should have gained, to compare with the profiles once the queue drains.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.pricing import TARIFFS, tariff_price  # noqa: E402
+from core.prodamus import sign  # noqa: E402
+
+
+def synthesized(count, users, duplicates, secret_key, form):
+    """Signed deliveries and the credits each user should end up with."""
+    run = uuid.uuid4().hex[:8]
+    tariffs = list(TARIFFS.values())
+    payments, expected = [], Counter()
+    for n in range(count):
+        if payments and random.random() < duplicates:
+            payments.append(random.choice(payments))
+            continue
+        tariff = random.choice(tariffs)
+        payment = {
+            'order_id': f"replay-{run}-{n}",
+            'payment_id': f"replay-{run}-{n}",
+            'payment_status': 'success',
+            'customer_extra': f"replay-user-{n % users}",
+            'sku': tariff['sku'],
+            'sum': str(tariff_price(tariff, 'ru'))
+        }
+        payments.append(payment)
+        expected[payment['customer_extra']] += tariff['credits']
+
+    content_type = 'application/x-www-form-urlencoded' if form else 'application/json'
+    encode = urllib.parse.urlencode if form else json.dumps
+    deliveries = [{
+        'headers': {'Sign': sign(payment, secret_key), 'Content-Type': content_type},
+        'body': encode(payment)
+    } for payment in payments]
+    return deliveries, expected
+
+
+def recorded(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def deliver(url, delivery, timeout):
+    """POST one delivery; returns (status, milliseconds)."""
+    req = urllib.request.Request(url, data=delivery['body'].encode('utf-8'), headers=delivery['headers'], method='POST')
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception as e:
+        status = type(e).__name__
+    return status, (time.perf_counter() - started) * 1000
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[max(1, math.ceil(pct / 100.0 * len(ordered))) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', required=True, help='webhook endpoint, e.g. http://127.0.0.1:3000/payment/webhook')
+    parser.add_argument('--deliveries', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--duplicates', type=float, default=0.2, help='share of deliveries repeating an earlier payment')
+    parser.add_argument('--form', action='store_true', help='send form-encoded bodies instead of JSON')
+    parser.add_argument('--file', help='replay recorded deliveries (JSON lines) instead of synthesizing them')
+    parser.add_argument('--timeout', type=float, default=10.0)
+    args = parser.parse_args()
+
+    if args.file:
+        deliveries, expected = recorded(args.file), None
+    else:
+        secret_key = os.environ.get('PRODAMUS_SECRET_KEY')
+        if not secret_key:
+            parser.error('PRODAMUS_SECRET_KEY must be set to sign synthesized deliveries')
+        deliveries, expected = synthesized(args.deliveries, args.users, args.duplicates, secret_key, args.form)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda delivery: deliver(args.url, delivery, args.timeout), deliveries))
+    elapsed = time.perf_counter() - started
+
+    latencies = [ms for _, ms in results]
+    print(f"{len(results)} deliveries in {elapsed:.1f}s ({len(results) / elapsed:.0f}/s) at concurrency {args.concurrency}")
+    print('answers: ' + ', '.join(f"{status}: {n}" for status, n in sorted(Counter(s for s, _ in results).items(), key=str)))
+    print(f"latency p50={percentile(latencies, 50):.0f}ms p95={percentile(latencies, 95):.0f}ms "
+          f"p99={percentile(latencies, 99):.0f}ms max={max(latencies):.0f}ms")
+    if expected:
+        print(f"expected credits: {sum(expected.values())} over {len(expected)} users")
+        for user_id, credits in sorted(expected.items()):
+            print(f"  {user_id}: +{credits}")
+
+
+if __name__ == '__main__':
+    main()
@@ -262,11 +262,13 @@ function pollStatus(jobId, originalUrl, tabId) {
       if (data.status === 'COMPLETED') {
         clearInterval(intervalId);
 
-        // Send message to content script to replace image
+        // Send message to content script to replace image; prefer the
+        // compressed rendition over the full-size PNG when one exists
+        const renditions = data.renditions || {};
         chrome.tabs.sendMessage(tabId, {
           action: "REPLACE_IMAGE",
           originalUrl: originalUrl,
-          resultUrl: data.resultUrl
+          resultUrl: renditions.primary || data.resultUrl
         });
 
         chrome.notifications.create({
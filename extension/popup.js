@@ -211,22 +211,16 @@ document.addEventListener('DOMContentLoaded', () => {
         return;
       }
 
-      statusMsg.textContent = "Processing image...";
       uploadBtn.disabled = true;
 
       try {
-        // 0. Generate Thumbnail
-        const thumbnailBlob = await resizeImage(file, 48, 48);
-
-        // 1. Get Presigned URLs (Original + Thumbnail)
-        statusMsg.textContent = "Getting upload URLs...";
-        const res1 = await fetch(`${API_BASE_URL}/user/images/upload-url`, {
+        // 1. Get Presigned URL (the server makes the thumbnail)
+        statusMsg.textContent = "Getting upload URL...";
+        const res1 = await fetch(`${API_BASE_URL}/user/images/upload-urls`, {
           method: 'POST',
           headers: { 'Authorization': `Bearer ${token}`, 'Content-Type': 'application/json' },
           body: JSON.stringify({
-            filename: file.name,
-            contentType: file.type,
-            includeThumbnail: true
+            files: [{ filename: file.name, contentType: file.type }]
           })
         });
 
@@ -234,26 +228,23 @@ document.addEventListener('DOMContentLoaded', () => {
           throw new Error("Unauthorized. Please sign out and sign in again.");
         }
 
-        const data1 = await res1.json();
-        if (!res1.ok) throw new Error(data1.error || 'Failed to get upload URL');
+        const batch = await res1.json();
+        if (!res1.ok) throw new Error(batch.error || 'Failed to get upload URL');
+        const data1 = batch.uploads[0];
 
-        // 2. Upload to S3 (Original)
+        // 2. Upload to S3 (Original) with the presigned POST form; S3
+        // enforces the size and type limits in its policy
         statusMsg.textContent = "Uploading original...";
-        await fetch(data1.uploadUrl, {
-          method: 'PUT',
-          body: file,
-          headers: { 'Content-Type': file.type }
-        });
-
-        // 3. Upload to S3 (Thumbnail)
-        statusMsg.textContent = "Uploading thumbnail...";
-        await fetch(data1.thumbnailUploadUrl, {
-          method: 'PUT',
-          body: thumbnailBlob,
-          headers: { 'Content-Type': file.type }
-        });
+        const form = new FormData();
+        Object.entries(data1.upload.fields).forEach(([key, value]) => form.append(key, value));
+        form.append('file', file);
+        const res2 = await fetch(data1.upload.url, { method: 'POST', body: form });
+        if (!res2.ok) {
+          const maxMb = Math.round(data1.upload.maxBytes / (1024 * 1024));
+          throw new Error(`Upload rejected. Use a JPEG, PNG or WebP image under ${maxMb} MB.`);
+        }
 
-        // 4. Confirm
+        // 3. Confirm
         statusMsg.textContent = "Saving profile...";
         const res3 = await fetch(`${API_BASE_URL}/user/images`, {
           method: 'POST',
@@ -261,8 +252,7 @@ document.addEventListener('DOMContentLoaded', () => {
           body: JSON.stringify({
             name: name,
             s3Key: data1.s3Key,
-            fileId: data1.fileId,
-            thumbnailS3Key: data1.thumbnailS3Key
+            fileId: data1.fileId
           })
         });
 
@@ -418,46 +408,6 @@ document.addEventListener('DOMContentLoaded', () => {
     }
   }
 
-  function resizeImage(file, maxWidth, maxHeight) {
-    return new Promise((resolve, reject) => {
-      const img = document.createElement('img');
-      const reader = new FileReader();
-
-      reader.onload = function (e) {
-        img.src = e.target.result;
-        img.onload = function () {
-          const canvas = document.createElement('canvas');
-          let width = img.width;
-          let height = img.height;
-
-          // Calculate aspect ratio
-          if (width > height) {
-            if (width > maxWidth) {
-              height *= maxWidth / width;
-              width = maxWidth;
-            }
-          } else {
-            if (height > maxHeight) {
-              width *= maxHeight / height;
-              height = maxHeight;
-            }
-          }
-
-          canvas.width = width;
-          canvas.height = height;
-          const ctx = canvas.getContext('2d');
-          ctx.drawImage(img, 0, 0, width, height);
-
-          canvas.toBlob((blob) => {
-            resolve(blob);
-          }, file.type);
-        };
-      };
-      reader.onerror = reject;
-      reader.readAsDataURL(file);
-    });
-  }
-
   async function loadGeneratedImages(token) {
     const listDiv = document.getElementById('generated-images-list');
     listDiv.innerHTML = '<p class="text-gray-500 dark:text-gray-400">Loading...</p>';
@@ -494,8 +444,9 @@ document.addEventListener('DOMContentLoaded', () => {
             });
           }
 
+          const renditions = gen.renditions || {};
           div.innerHTML = `
-                    <img alt="Generated image" class="w-16 h-16 object-cover rounded-md cursor-pointer view-btn" src="${gen.resultUrl}">
+                    <img alt="Generated image" class="w-16 h-16 object-cover rounded-md cursor-pointer view-btn" src="${gen.thumbnailUrl || gen.resultUrl}">
                     <div class="flex-1 min-w-0">
                         <a href="${gen.siteUrl}" target="_blank" class="font-medium text-primary hover:underline line-clamp-2" title="${gen.siteTitle || 'View on site'}">${gen.siteTitle || 'View on site'}</a>
                         <p class="text-xs text-gray-500 dark:text-gray-400 mt-1">${timestamp}</p>
@@ -513,7 +464,7 @@ document.addEventListener('DOMContentLoaded', () => {
           // Attach event listeners
           div.querySelector('.view-btn').onclick = () => {
             modal.style.display = "block";
-            modalImg.src = gen.resultUrl;
+            modalImg.src = renditions.primary || gen.resultUrl;
           };
 
           div.querySelector('.delete-gen-btn').onclick = async () => {
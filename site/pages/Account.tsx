@@ -168,7 +168,7 @@ const Account: React.FC = () => {
                     <div className="grid-container">
                         {generations.map((gen) => (
                             <div key={gen.jobId} className="image-card">
-                                <img src={gen.resultUrl} alt={gen.siteTitle} />
+                                <img src={gen.thumbnailUrl ?? gen.resultUrl} alt={gen.siteTitle} />
                                 <div className="card-overlay" style={{bottom: '60px'}}>
                                      <button 
                                         className="action-btn" 
@@ -4,6 +4,7 @@ import { API_BASE_URL } from '../constants';
 export interface Generation {
     jobId: string;
     resultUrl: string;
+    thumbnailUrl?: string;
     itemUrl: string;
     siteUrl: string;
     siteTitle: string;